@@ -0,0 +1,46 @@
+"""add geocode_cache table
+
+Revision ID: 3b7d1e9a4c20
+Revises: ce20dc36c4e3
+Create Date: 2026-10-18 09:12:41.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7d1e9a4c20"
+down_revision: Union[str, Sequence[str], None] = "ce20dc36c4e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Durable geocode cache shared by all workers (resources/geo_cache.py)
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS geocode_cache (
+        query_key    text PRIMARY KEY,
+        lat          double precision NOT NULL,
+        lng          double precision NOT NULL,
+        created_at   timestamptz NOT NULL DEFAULT now(),
+        expires_at   timestamptz NOT NULL,
+        last_hit_at  timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+    # Eviction scans by expiry and by least-recent hit
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS idx_geocode_cache_expires_at
+      ON geocode_cache(expires_at);
+    """)
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS idx_geocode_cache_last_hit_at
+      ON geocode_cache(last_hit_at);
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_geocode_cache_last_hit_at;")
+    op.execute("DROP INDEX IF EXISTS idx_geocode_cache_expires_at;")
+    op.execute("DROP TABLE IF EXISTS geocode_cache;")
@@ -0,0 +1,32 @@
+"""add rate_limit_buckets table
+
+Revision ID: 8e2f4a6c1d53
+Revises: 3b7d1e9a4c20
+Create Date: 2026-10-18 11:40:07.502961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8e2f4a6c1d53"
+down_revision: Union[str, Sequence[str], None] = "3b7d1e9a4c20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Shared token buckets (resources/rate_limiter.py); guarded by pg_advisory_xact_lock
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        name        text PRIMARY KEY,
+        tokens      double precision NOT NULL,
+        updated_at  double precision NOT NULL   -- epoch seconds (DB clock)
+    );
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS rate_limit_buckets;")
@@ -0,0 +1,40 @@
+"""add idempotency_keys table
+
+Revision ID: a5d1c7e3f920
+Revises: f3c8a6d2b417
+Create Date: 2026-10-18 20:12:44.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a5d1c7e3f920"
+down_revision: Union[str, Sequence[str], None] = "f3c8a6d2b417"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Idempotency-Key responses for POST /book/ride and POST /quote (resources/idempotency.py)
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        scope            text        NOT NULL,           -- endpoint, e.g. "book.ride"
+        key              text        NOT NULL,           -- client's Idempotency-Key
+        fingerprint      text        NOT NULL,           -- sha256 of the request
+        status           text        NOT NULL,           -- pending | done
+        response_status  int,
+        response         jsonb,
+        created_at       timestamptz NOT NULL DEFAULT now(),
+        locked_until     timestamptz NOT NULL,           -- pending rows can be taken over after this
+        expires_at       timestamptz NOT NULL,
+        PRIMARY KEY (scope, key)
+    );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at_idx ON idempotency_keys (expires_at);")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS idempotency_keys;")
@@ -0,0 +1,44 @@
+"""add booking_queue table
+
+Revision ID: b8e4f2a6c913
+Revises: a5d1c7e3f920
+Create Date: 2026-10-18 21:05:19.640327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8e4f2a6c913"
+down_revision: Union[str, Sequence[str], None] = "a5d1c7e3f920"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Booking intake queue (BOOKING_INTAKE=queue; db/booking_queue.py), drained with SKIP LOCKED
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS booking_queue (
+        job_id        bigint      PRIMARY KEY,               -- jobs.id
+        state         jsonb       NOT NULL,                  -- start state for the booking flow
+        status        text        NOT NULL DEFAULT 'queued', -- queued | running | done | failed
+        attempts      int         NOT NULL DEFAULT 0,
+        available_at  timestamptz NOT NULL DEFAULT now(),    -- retry backoff
+        locked_until  timestamptz,                           -- running: reclaimable after this
+        result        jsonb,                                 -- rider-facing dispatch outcome
+        last_error    text,
+        created_at    timestamptz NOT NULL DEFAULT now(),
+        updated_at    timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS booking_queue_ready_idx
+        ON booking_queue (available_at)
+     WHERE status IN ('queued', 'running');
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS booking_queue;")
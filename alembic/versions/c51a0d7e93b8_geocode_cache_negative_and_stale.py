@@ -0,0 +1,39 @@
+"""geocode_cache: negative entries and stale-while-revalidate
+
+Revision ID: c51a0d7e93b8
+Revises: 8e2f4a6c1d53
+Create Date: 2026-10-18 13:05:52.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c51a0d7e93b8"
+down_revision: Union[str, Sequence[str], None] = "8e2f4a6c1d53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL lat/lng = negative entry (short TTL)
+    op.execute("ALTER TABLE geocode_cache ALTER COLUMN lat DROP NOT NULL;")
+    op.execute("ALTER TABLE geocode_cache ALTER COLUMN lng DROP NOT NULL;")
+    # expires_at = fresh until; stale_until = hard expiry (served stale while refreshing)
+    op.execute("ALTER TABLE geocode_cache ADD COLUMN IF NOT EXISTS stale_until timestamptz;")
+    op.execute("UPDATE geocode_cache SET stale_until = expires_at WHERE stale_until IS NULL;")
+    op.execute("ALTER TABLE geocode_cache ALTER COLUMN stale_until SET NOT NULL;")
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS idx_geocode_cache_stale_until
+      ON geocode_cache(stale_until);
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_geocode_cache_stale_until;")
+    op.execute("DELETE FROM geocode_cache WHERE lat IS NULL OR lng IS NULL;")
+    op.execute("ALTER TABLE geocode_cache DROP COLUMN IF EXISTS stale_until;")
+    op.execute("ALTER TABLE geocode_cache ALTER COLUMN lng SET NOT NULL;")
+    op.execute("ALTER TABLE geocode_cache ALTER COLUMN lat SET NOT NULL;")
@@ -0,0 +1,39 @@
+"""fare_rule_sets: versioned fare rules (FARE_RULES_SOURCE=db)
+
+Revision ID: d4a9e2b7f615
+Revises: c51a0d7e93b8
+Create Date: 2026-10-18 15:20:41.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a9e2b7f615"
+down_revision: Union[str, Sequence[str], None] = "c51a0d7e93b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One row per published version; workers use the newest active row
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS fare_rule_sets (
+      id          bigserial PRIMARY KEY,
+      version     text NOT NULL UNIQUE,
+      rules       jsonb NOT NULL,
+      active      boolean NOT NULL DEFAULT true,
+      created_at  timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS idx_fare_rule_sets_active_created
+      ON fare_rule_sets(created_at DESC, id DESC) WHERE active;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_fare_rule_sets_active_created;")
+    op.execute("DROP TABLE IF EXISTS fare_rule_sets;")
@@ -0,0 +1,41 @@
+"""zone_counters + jobs.open_zone: per-zone supply/demand for surge pricing
+
+Revision ID: e7b3c5a1d082
+Revises: d4a9e2b7f615
+Create Date: 2026-10-18 16:02:17.540936
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b3c5a1d082"
+down_revision: Union[str, Sequence[str], None] = "d4a9e2b7f615"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One row per zone, moved by +-1 deltas (fill with: python -m resources.surge rebuild)
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS zone_counters (
+      zone        integer PRIMARY KEY,
+      drivers     integer NOT NULL DEFAULT 0,
+      open_jobs   integer NOT NULL DEFAULT 0,
+      updated_at  timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+    # Pickup zone while the job waits for a driver; NULL otherwise
+    op.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS open_zone integer;")
+    op.execute("""
+    CREATE INDEX IF NOT EXISTS idx_jobs_open_zone
+      ON jobs(open_zone) WHERE open_zone IS NOT NULL;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_jobs_open_zone;")
+    op.execute("ALTER TABLE jobs DROP COLUMN IF EXISTS open_zone;")
+    op.execute("DROP TABLE IF EXISTS zone_counters;")
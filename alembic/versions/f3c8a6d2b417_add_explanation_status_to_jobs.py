@@ -0,0 +1,26 @@
+"""jobs.explanation_status: deferred LLM fare explanations
+
+Revision ID: f3c8a6d2b417
+Revises: e7b3c5a1d082
+Create Date: 2026-10-18 18:41:05.312604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c8a6d2b417"
+down_revision: Union[str, Sequence[str], None] = "e7b3c5a1d082"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # template | llm | pending (paraphrase still being generated); NULL on older rows
+    op.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS explanation_status text;")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE jobs DROP COLUMN IF EXISTS explanation_status;")
@@ -37,6 +37,7 @@ from routes.quote import router as quote_router
 from routes.auth import router as auth_router
 from routes.driver_pin import router as driver_pin_router
 from routes.job_pin import router as job_pin_router
+from routes.geo import router as geo_router
 
 # ------------------------------------------------------------
 # App with Swagger metadata
@@ -88,6 +89,33 @@ app.add_middleware(
 def health():
     return {"ok": True, "service": "backend"}
 
+# Close the pooled async geocoding client (resources/geo_async.py)
+@app.on_event("shutdown")
+async def _close_geocoder() -> None:
+    from resources.geo_async import aclose_async_geocoder
+    await aclose_async_geocoder()
+
+# Close the async Postgres pool (db/apg.py; async booking path)
+@app.on_event("shutdown")
+async def _close_async_db() -> None:
+    from db.apg import aclose_pool
+    await aclose_pool()
+
+# Booking intake workers (BOOKING_INTAKE=queue; dispatch/intake_worker.py)
+@app.on_event("startup")
+def _start_intake_workers() -> None:
+    from routes.book import INTAKE_QUEUE, dispatch_queued
+    if INTAKE_QUEUE:
+        from dispatch.intake_worker import start_workers
+        start_workers(dispatch_queued)
+
+@app.on_event("shutdown")
+def _stop_intake_workers() -> None:
+    from routes.book import INTAKE_QUEUE
+    if INTAKE_QUEUE:
+        from dispatch.intake_worker import stop_workers
+        stop_workers()
+
 # ------------------------------------------------------------
 # Register ALL routers (UNCHANGED ORDER; removed duplicate driver_router)
 # ------------------------------------------------------------
@@ -108,6 +136,7 @@ app.include_router(quote_router)
 app.include_router(auth_router)
 app.include_router(driver_pin_router)
 app.include_router(job_pin_router)
+app.include_router(geo_router)
 
 # ------------------------------------------------------------
 # Optional: JSON-ish logging (nice in Render/Heroku logs)
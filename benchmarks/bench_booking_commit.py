@@ -0,0 +1,163 @@
+# benchmarks/bench_booking_commit.py
+# --------------------------------------------------------------
+# POST /book/ride database cost: the step-by-step writes (create_job,
+# KNN, assign_job_to_driver, set_driver_availability + surge counter,
+# driver-PIN UPDATE) vs the single-statement commit
+# (BOOKING_COMMIT=single, db/booking_commit.py).
+#
+# Runs the real booking steps (routes/book.py: graph, pricing, dispatch)
+# against an in-process stand-in for the psycopg2 pool that charges a
+# fixed network round trip per statement and per COMMIT, and counts
+# pool checkouts, statements and round trips. Geocoding uses gazetteer
+# places (no network); the LLM is off. No database needed.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_booking_commit [--rtt-ms 0.5,2,5] [--bookings 200]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import db.booking_commit as booking_commit
+import db.driver_registry as driver_registry
+import db.writer as writer
+import resources.surge as surge
+import routes.book as book
+from resources.gazetteer import place_names
+from state import BookingInput
+
+_DRIVER = {"id": 7, "name": "Dana", "email": None, "vehicle": "Toyota Sienna", "plate": "TX-1234",
+           "lat": 32.85, "lng": -96.85, "meters": 900.0}
+
+
+class FakePool:
+    """get_conn() stand-in: every execute() and commit() costs one round trip."""
+
+    def __init__(self, rtt_sec: float) -> None:
+        self.rtt_sec = rtt_sec
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = self.statements = self.commits = 0
+
+    @property
+    def round_trips(self) -> int:
+        return self.statements + self.commits
+
+    def trip(self) -> None:
+        if self.rtt_sec:
+            time.sleep(self.rtt_sec)
+
+    @contextmanager
+    def get_conn(self):
+        self.checkouts += 1
+        yield _Conn(self)
+
+
+class _Conn:
+    def __init__(self, pool: FakePool) -> None:
+        self.pool = pool
+
+    def cursor(self, cursor_factory=None):
+        return _Cursor(self.pool, as_dict=cursor_factory is not None)
+
+    def commit(self) -> None:
+        self.pool.commits += 1
+        self.pool.trip()
+
+
+class _Cursor:
+    def __init__(self, pool: FakePool, as_dict: bool) -> None:
+        self.pool, self.as_dict, self.rows = pool, as_dict, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, sql: str, params=None) -> None:
+        self.pool.statements += 1
+        self.pool.trip()
+        self.rows = _respond(sql)
+
+    def fetchone(self):
+        row = self.rows[0] if self.rows else None
+        return row if row is None or self.as_dict else tuple(row.values())
+
+    def fetchall(self):
+        return self.rows if self.as_dict else [tuple(r.values()) for r in self.rows]
+
+
+def _respond(sql: str) -> List[Dict[str, Any]]:
+    if "WITH cand" in sql:                         # single-statement commit
+        return [{"job_id": 1, "open_zone": None, **{k: _DRIVER[k] for k in
+                 ("id", "name", "email", "vehicle", "plate", "lat", "lng")}}]
+    if "INSERT INTO jobs" in sql:                  # create_job
+        return [{"id": 1}]
+    if "home_base <->" in sql:                     # KNN
+        return [dict(_DRIVER)]
+    if "WITH prev" in sql:                         # assign_job_to_driver
+        return [{"open_zone": None}]
+    if "UPDATE drivers" in sql:                    # availability flip
+        return [{"lat": _DRIVER["lat"], "lng": _DRIVER["lng"]}]
+    return []                                      # counters, driver PIN
+
+
+def _install(pool: FakePool) -> None:
+    for mod in (writer, driver_registry, booking_commit, book):
+        mod.get_conn = pool.get_conn
+    surge.get_conn = None  # no background counter sync
+
+
+def _payloads(n: int) -> List[BookingInput]:
+    names = place_names()[:20]
+    return [
+        BookingInput(pickup_location=names[i % len(names)], dropoff_location=names[(i * 7 + 3) % len(names)],
+                     ride_time="now", rider_name="Bench", phone_number="214-555-0100")
+        for i in range(n)
+    ]
+
+
+def _run(label: str, fn, payloads, pool: FakePool) -> float:
+    fn(payloads[0])  # warm caches (geocodes, rules, graph)
+    pool.reset()
+    t = time.perf_counter()
+    states = [fn(p) for p in payloads]
+    ms = (time.perf_counter() - t) * 1e3 / len(payloads)
+    n = len(payloads)
+    assigned = sum(1 for s in states if s.get("driver_name"))
+    print(f"  {label:<8} {ms:8.2f} ms/booking   checkouts {pool.checkouts / n:4.1f}   "
+          f"statements {pool.statements / n:4.1f}   commits {pool.commits / n:4.1f}   "
+          f"round trips {pool.round_trips / n:4.1f}   assigned {assigned}/{n}")
+    return ms
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rtt-ms", default="0.5,2,5", help="comma-separated network round-trip times")
+    ap.add_argument("--bookings", type=int, default=200)
+    args = ap.parse_args()
+
+    payloads = _payloads(args.bookings)
+    ok = True
+    for rtt in [float(x) for x in args.rtt_ms.split(",")]:
+        pool = FakePool(rtt / 1e3)
+        _install(pool)
+        print(f"RTT {rtt:g} ms, {args.bookings} bookings")
+        steps = _run("steps", book._book, payloads, pool)
+        steps_trips = pool.round_trips
+        single = _run("single", book._book_single, payloads, pool)
+        print(f"  -> {steps_trips / max(pool.round_trips, 1):.1f}x fewer round trips, "
+              f"{steps / single:.2f}x faster")
+        ok = ok and pool.round_trips < steps_trips
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_distance.py
+# --------------------------------------------------------------
+# Compare per-pair geopy geodesic against the vectorized kernels in
+# resources/geo_distance.py: speed (one-to-many, many-to-many) and
+# worst-case error.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_distance [--drivers 5000] [--seed 7]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from resources.geo_distance import haversine_miles, lambert_miles, one_to_many, many_to_many
+
+# Rough DFW bounding box (lat, lng)
+DFW_BOX = ((32.55, 33.25), (-97.55, -96.55))
+
+
+def _random_points(rng: np.random.Generator, n: int, box=DFW_BOX):
+    (lat0, lat1), (lng0, lng1) = box
+    return rng.uniform(lat0, lat1, n), rng.uniform(lng0, lng1, n)
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _error_report(label: str, lat1, lng1, lat2, lng2) -> None:
+    ref = np.array([geodesic((a, b), (c, d)).miles for a, b, c, d in zip(lat1, lng1, lat2, lng2)])
+    for name, fn in (("lambert", lambert_miles), ("haversine", haversine_miles)):
+        got = fn(lat1, lng1, lat2, lng2)
+        abs_err = np.abs(got - ref)
+        rel_err = abs_err / np.maximum(ref, 1e-9)
+        print(
+            f"  {label:<22} {name:<9} max abs {abs_err.max():.6f} mi   "
+            f"max rel {rel_err.max():.2e}   (max dist {ref.max():.1f} mi)"
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drivers", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    # ---- speed: one pickup vs N drivers ----
+    lats, lngs = _random_points(rng, args.drivers)
+    plat, plng = 32.7767, -96.7970
+
+    t_loop = _timeit(lambda: [geodesic((plat, plng), (a, b)).miles for a, b in zip(lats, lngs)], repeat=1)
+    t_vec = _timeit(lambda: one_to_many(plat, plng, lats, lngs))
+    print(f"one-to-many ({args.drivers} drivers)")
+    print(f"  geodesic loop   {t_loop * 1e3:9.2f} ms")
+    print(f"  lambert kernel  {t_vec * 1e3:9.2f} ms   ({t_loop / t_vec:,.0f}x)")
+
+    # ---- speed: N x M matrix ----
+    n = 200
+    olat, olng = _random_points(rng, n)
+    dlat, dlng = _random_points(rng, n)
+    t_loop = _timeit(
+        lambda: [[geodesic((a, b), (c, d)).miles for c, d in zip(dlat, dlng)] for a, b in zip(olat, olng)],
+        repeat=1,
+    )
+    t_vec = _timeit(lambda: many_to_many(olat, olng, dlat, dlng))
+    print(f"many-to-many ({n}x{n})")
+    print(f"  geodesic loop   {t_loop * 1e3:9.2f} ms")
+    print(f"  lambert kernel  {t_vec * 1e3:9.2f} ms   ({t_loop / t_vec:,.0f}x)")
+
+    # ---- accuracy vs geodesic ----
+    print("error vs geopy geodesic")
+    a_lat, a_lng = _random_points(rng, 20000)
+    b_lat, b_lng = _random_points(rng, 20000)
+    _error_report("DFW trips", a_lat, a_lng, b_lat, b_lng)
+
+    conus = ((25.0, 49.0), (-124.0, -67.0))
+    a_lat, a_lng = _random_points(rng, 20000, conus)
+    b_lat, b_lng = _random_points(rng, 20000, conus)
+    _error_report("continental US", a_lat, a_lng, b_lat, b_lng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_explain.py
+# --------------------------------------------------------------
+# LLM fare explanations (resources/llm_explain.py) against the local
+# FakeFareLLM: cold calls under the deadline, timeouts falling back to
+# the template, cache hits across a fare bucket, and single-flight for
+# concurrent requests. No network, no API key.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_explain [--latency-ms 300] [--deadline 0.5] [--trips 200]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from resources import llm_explain
+from resources.llm_explain import CACHE, FakeFareLLM, llm_explanation
+
+
+def _trips(n: int):
+    return [(f"{100 + i} Main St Dallas", f"{200 + i} Elm St Dallas", Decimal("20.00") + i % 7) for i in range(n)]
+
+
+def _run(label: str, chain, trips, deadline: float) -> float:
+    t = time.perf_counter()
+    got = sum(1 for p, d, f in trips if llm_explanation(p, d, f, deadline, chain) is not None)
+    ms = (time.perf_counter() - t) * 1e3
+    print(f"  {label:<38} {ms / len(trips):8.2f} ms/trip   llm text {got}/{len(trips)}")
+    return ms
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--deadline", type=float, default=0.5)
+    ap.add_argument("--trips", type=int, default=200)
+    args = ap.parse_args()
+
+    fake = FakeFareLLM(args.latency_ms)
+    trips = _trips(args.trips)
+    few = trips[:10]
+    print(f"fake LLM latency {args.latency_ms:.0f} ms, deadline {args.deadline:.2f} s")
+
+    CACHE.clear()
+    _run("cold (one call each, within deadline)", fake, few, args.deadline)
+    _run("warm (cache hits)", fake, few, args.deadline)
+    # Same trips, another fare in the same bucket: cached sentence, new fare filled in
+    bucket = [(p, d, f + Decimal("0.37")) for p, d, f in few]
+    _run("warm, other fare in bucket", fake, bucket, args.deadline)
+    fare_ok = all(f"${f:.2f}" in (llm_explanation(p, d, f, args.deadline, fake) or "") for p, d, f in bucket)
+
+    # Concurrent requests for one trip share a single LLM call
+    CACHE.clear()
+    shared = FakeFareLLM(args.latency_ms)
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda _: llm_explanation(*trips[0], args.deadline, shared), range(16)))
+    print(f"  16 concurrent identical requests -> {shared.calls} LLM call(s)")
+
+    # Last: these calls keep running (and warm the cache) after the deadline
+    slow = FakeFareLLM(args.latency_ms * 10)
+    _run("timeout -> template", slow, trips[10:15], args.deadline)
+
+    print(f"stats: {llm_explain.explain_stats()['cache']}")
+    sys.exit(0 if fare_ok and shared.calls == 1 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_fare.py
+# --------------------------------------------------------------
+# Batch fare pricing (resources/fare_engine.fare_cents_array) vs the
+# scalar calculate_base_fare loop: speed, plus a randomized equivalence
+# check (exits 1 on any mismatch) over 2-decimal miles, arbitrary floats,
+# exact half-cent boundaries, negatives, NaN and huge values.
+#
+# Run from the project root:
+#   python -m benchmarks.bench_fare [--n 200000] [--check 100000] [--seed 7]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from resources.fare_engine import (
+    BASE_FARE, PER_MILE, MULTIPLIER, calculate_base_fare, calculate_base_fare_batch, fare_cents_array,
+)
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _cases(rng: np.random.Generator, n: int) -> np.ndarray:
+    rate = PER_MILE * MULTIPLIER
+    # Miles that land exactly on a half cent (and one micro-mile either side)
+    half = [float((Decimal(k) + Decimal("0.5") - BASE_FARE * 100) / (rate * 100)) for k in range(300, 20000, 37)]
+    return np.concatenate([
+        np.round(rng.uniform(0, 80, n), 2),                    # what estimate_miles produces
+        rng.uniform(0, 500, n),                                # arbitrary floats (scalar fallback)
+        np.round(rng.uniform(0, 80, n), 6),                    # micro-mile precision
+        np.array(half), np.nextafter(half, 0), np.nextafter(half, 1e9),
+        np.array([0.0, -0.0, -1.5, np.nan, 0.005, 0.125, 1e-7, 123456.78, 1e12, 0.1 + 0.2]),
+    ])
+
+
+def check(rng: np.random.Generator, n: int) -> int:
+    miles = _cases(rng, n)
+    got = fare_cents_array(miles)
+    bad = 0
+    for m, c in zip(miles, got):
+        want = int(calculate_base_fare(m) * 100)
+        if want != int(c):
+            bad += 1
+            if bad <= 10:
+                print(f"  MISMATCH miles={m!r}: batch {int(c)} vs scalar {want}")
+    dec = calculate_base_fare_batch(miles[:1000])
+    bad += sum(d != calculate_base_fare(m) for d, m in zip(dec, miles[:1000]))
+    print(f"equivalence: {len(miles)} values, {bad} mismatches "
+          f"(rates base={BASE_FARE} per_mile={PER_MILE} multiplier={MULTIPLIER})")
+    return bad
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--check", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    miles = np.round(rng.uniform(0, 80, args.n), 2)
+    t_loop = _timeit(lambda: [calculate_base_fare(m) for m in miles], repeat=1)
+    t_cents = _timeit(lambda: fare_cents_array(miles))
+    t_dec = _timeit(lambda: calculate_base_fare_batch(miles), repeat=1)
+    print(f"pricing {args.n} trips")
+    print(f"  scalar calculate_base_fare loop : {t_loop * 1e3:9.1f} ms")
+    print(f"  fare_cents_array (int64 cents)  : {t_cents * 1e3:9.1f} ms   x{t_loop / t_cents:,.0f}")
+    print(f"  calculate_base_fare_batch (Dec) : {t_dec * 1e3:9.1f} ms   x{t_loop / t_dec:,.1f}")
+
+    sys.exit(1 if check(rng, args.check) else 0)
+
+
+if __name__ == "__main__":
+    main()
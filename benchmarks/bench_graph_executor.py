@@ -0,0 +1,103 @@
+# benchmarks/bench_graph_executor.py
+# --------------------------------------------------------------
+# Booking graph executors (graph.py, BOOKING_GRAPH_EXECUTOR):
+# LangGraph's compiled StateGraph vs the DirectGraph plain-call runner.
+#
+#   - per-invocation overhead with no-op nodes (invoke and ainvoke)
+#   - the real estimate path (generate_booking -> explain_fare) on
+#     gazetteer places, checking both executors return identical states
+#   - cold `import graph` time in a fresh interpreter for each executor
+#
+# No database or network. Run from the project root:
+#   python -m benchmarks.bench_graph_executor [--iters 5000]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import graph
+from resources.gazetteer import place_names
+
+
+def _noop(state):
+    return {**state, "booking_request": "x"}
+
+
+async def _anoop(state):
+    return {**state, "booking_request": "x"}
+
+
+def _per_call_us(fn, states) -> float:
+    t = time.perf_counter()
+    for s in states:
+        fn(s)
+    return (time.perf_counter() - t) * 1e6 / len(states)
+
+
+def _per_acall_us(fn, states) -> float:
+    async def run():
+        t = time.perf_counter()
+        for s in states:
+            await fn(s)
+        return (time.perf_counter() - t) * 1e6 / len(states)
+    return asyncio.run(run())
+
+
+def _row(label: str, lg_us: float, direct_us: float) -> None:
+    print(f"  {label:<28} langgraph {lg_us:9.1f} us   direct {direct_us:8.1f} us   "
+          f"({lg_us / max(direct_us, 1e-9):.0f}x)")
+
+
+def _import_ms(executor: str, runs: int = 3) -> float:
+    env = {**os.environ, "BOOKING_GRAPH_EXECUTOR": executor}
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import graph"], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - t) * 1e3)
+    return statistics.median(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iters", type=int, default=5000)
+    args = ap.parse_args()
+
+    print("per invocation, no-op nodes")
+    states = [{"task": "create_booking", "pickup_location": f"{i} Main St", "job_id": str(i)}
+              for i in range(args.iters)]
+    lg = graph._build_graph(_noop, _noop, _noop, executor="langgraph")
+    direct = graph._build_graph(_noop, _noop, _noop, executor="direct")
+    _row("invoke (3 nodes)", _per_call_us(lg.invoke, states), _per_call_us(direct.invoke, states))
+    alg = graph._build_graph(_anoop, _anoop, _anoop, executor="langgraph")
+    adirect = graph._build_graph(_anoop, _anoop, _anoop, executor="direct")
+    _row("ainvoke (3 nodes)", _per_acall_us(alg.ainvoke, states), _per_acall_us(adirect.ainvoke, states))
+
+    print("estimate path (generate_booking -> explain_fare), gazetteer places")
+    names = place_names()[:30]
+    trips = [{"task": "estimate_fare", "pickup_location": names[i % len(names)],
+              "dropoff_location": names[(i * 7 + 3) % len(names)]} for i in range(min(args.iters, 2000))]
+    nodes = (graph.generate_booking, graph.explain_fare_fn, graph.dispatch_booking)
+    lg = graph._build_graph(*nodes, executor="langgraph")
+    direct = graph._build_graph(*nodes, executor="direct")
+    for t in trips[:50]:
+        lg.invoke(dict(t))  # warm geocode + route caches
+    same = all(lg.invoke(dict(t)) == direct.invoke(dict(t)) for t in trips)
+    _row("invoke", _per_call_us(lg.invoke, trips), _per_call_us(direct.invoke, trips))
+    print(f"  identical states: {same}")
+
+    print("cold `import graph` (median of 3 fresh interpreters)")
+    print(f"  langgraph {_import_ms('langgraph'):8.0f} ms   direct {_import_ms('direct'):8.0f} ms")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
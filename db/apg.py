@@ -0,0 +1,70 @@
+# db/apg.py
+# -------------------------------------------------------------------
+# Async Postgres pool (psycopg 3 + psycopg_pool) for the async booking
+# path (POST /book/ride with BOOKING_ASYNC). Same DSN as db/pg.py.
+# Optional: without psycopg 3 installed, AVAILABLE is False and callers
+# stay on the psycopg2 pool.
+#
+# Usage:
+#   async with aget_conn() as conn:
+#       async with conn.cursor(row_factory=dict_row) as cur:
+#           await cur.execute(...)
+#       await conn.commit()
+# -------------------------------------------------------------------
+from __future__ import annotations
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from db.pg import DSN
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+    AVAILABLE = True
+except Exception:
+    dict_row = None
+    AsyncConnectionPool = None
+    AVAILABLE = False
+
+POOL_MIN = int(os.getenv("PG_ASYNC_POOL_MIN", "2"))
+POOL_MAX = int(os.getenv("PG_ASYNC_POOL_MAX", "20"))
+POOL_TIMEOUT_SEC = float(os.getenv("PG_ASYNC_POOL_TIMEOUT_SEC", "10"))
+
+_POOL: Optional["AsyncConnectionPool"] = None
+_POOL_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_POOL_OPEN: Optional[asyncio.Task] = None
+
+
+async def _pool() -> "AsyncConnectionPool":
+    """Shared pool for the running loop (recreated if the loop changed)."""
+    global _POOL, _POOL_LOOP, _POOL_OPEN
+    if not AVAILABLE:
+        raise RuntimeError("psycopg 3 / psycopg_pool not installed")
+    loop = asyncio.get_running_loop()
+    if _POOL is None or _POOL_LOOP is not loop:
+        _POOL, _POOL_LOOP = AsyncConnectionPool(
+            conninfo=DSN, min_size=POOL_MIN, max_size=POOL_MAX, timeout=POOL_TIMEOUT_SEC, open=False,
+        ), loop
+        # Concurrent first callers all wait on this one open
+        _POOL_OPEN = loop.create_task(_POOL.open())
+    pool, opening = _POOL, _POOL_OPEN
+    await opening
+    return pool
+
+
+@asynccontextmanager
+async def aget_conn() -> AsyncIterator["object"]:
+    """Async twin of db.pg.get_conn (commit is the caller's, as there)."""
+    pool = await _pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def aclose_pool() -> None:
+    """Close the async pool (call on app shutdown)."""
+    global _POOL, _POOL_LOOP, _POOL_OPEN
+    if _POOL is not None:
+        await _POOL.close()
+        _POOL, _POOL_LOOP, _POOL_OPEN = None, None, None
@@ -0,0 +1,174 @@
+# db/booking_commit.py
+# --------------------------------------------------------------------
+# Single-statement booking commit (BOOKING_COMMIT=single).
+#
+# One CTE, one round trip, one transaction does what the step-by-step
+# path spreads over create_job, the KNN query, assign_job_to_driver,
+# set_driver_availability and the driver-PIN UPDATE:
+#   cand      nearest available driver (PostGIS KNN), or the first free
+#             one of a preferred id list (drive-time re-rank), row-locked
+#             with SKIP LOCKED so concurrent bookings never pick the same one
+#   reserved  that driver -> is_available = false
+#   job       INSERT the job, already claimed by the driver, with fare,
+#             explanation and driver PIN; with no driver it is left open
+#             (open_zone = pickup zone) for surge
+#   counts    the matching zone_counters deltas (driver -1 in its home
+#             zone, open job +1 in the pickup zone)
+# Returns the job id plus the driver row the response needs. Without a
+# pickup point (geocode failed) the job is inserted with no dispatch.
+# --------------------------------------------------------------------
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from db.pg import get_conn
+from db.apg import aget_conn, dict_row  # async twin (psycopg 3; optional)
+from db.writer import _coerce_fare, _job_fields
+from resources.surge import driver_zone, get_board
+from resources.zones import zone_sql
+
+_NEAREST = """
+    SELECT id FROM drivers
+    WHERE is_available = true
+      AND home_base IS NOT NULL
+      AND %(lat)s::float8 IS NOT NULL
+    ORDER BY home_base <-> ST_SetSRID(ST_MakePoint(%(lng)s::float8, %(lat)s::float8), 4326)
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+"""
+
+_PREFERRED = """
+    SELECT id FROM drivers
+    WHERE is_available = true
+      AND id = ANY(%(driver_ids)s::bigint[])
+    ORDER BY array_position(%(driver_ids)s::bigint[], id)
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+"""
+
+_COMMIT_SQL = """
+    WITH cand AS ({cand}),
+    reserved AS (
+        UPDATE drivers d
+           SET is_available = false
+          FROM cand
+         WHERE d.id = cand.id
+        RETURNING d.id, d.name, d.email, d.vehicle, d.plate,
+                  ST_Y(d.home_base::geometry) AS lat,
+                  ST_X(d.home_base::geometry) AS lng
+    ),
+    job AS (
+        INSERT INTO jobs (
+            pickup_location, dropoff_location, rider_name, phone_number,
+            fare_estimate, estimated_miles, fare_explanation, explanation_status,
+            claimed, driver_id, driver_name, driver_pin, driver_pin_expires, open_zone
+        )
+        SELECT %(pickup)s::text, %(dropoff)s::text, %(rider_name)s::text, %(phone_number)s::text,
+               %(fare)s::numeric, %(miles)s::float8, %(explanation)s::text, %(explanation_status)s::text,
+               r.id IS NOT NULL, r.id, r.name, %(driver_pin)s::text, %(driver_pin_expires)s::timestamptz,
+               CASE WHEN r.id IS NULL THEN %(zone)s::int END
+          FROM (SELECT 1) AS one
+          LEFT JOIN reserved r ON true
+        RETURNING id, open_zone
+    ),
+    counts AS (
+        INSERT INTO zone_counters (zone, drivers, open_jobs)
+        SELECT zone, sum(drivers), sum(open_jobs)
+          FROM (
+            SELECT {driver_zone} AS zone, -1 AS drivers, 0 AS open_jobs FROM reserved r
+            UNION ALL
+            SELECT open_zone, 0, 1 FROM job WHERE open_zone IS NOT NULL
+          ) AS delta
+         GROUP BY zone
+        ON CONFLICT (zone) DO UPDATE
+        SET drivers    = zone_counters.drivers + EXCLUDED.drivers,
+            open_jobs  = zone_counters.open_jobs + EXCLUDED.open_jobs,
+            updated_at = now()
+    )
+    SELECT job.id AS job_id, job.open_zone,
+           r.id, r.name, r.email, r.vehicle, r.plate, r.lat, r.lng
+      FROM job
+      LEFT JOIN reserved r ON true
+"""
+
+_driver_zone_sql = zone_sql("r.lat", "r.lng")
+_SQL_NEAREST = _COMMIT_SQL.format(cand=_NEAREST, driver_zone=_driver_zone_sql)
+_SQL_PREFERRED = _COMMIT_SQL.format(cand=_PREFERRED, driver_zone=_driver_zone_sql)
+
+
+def _params(
+    state: Dict[str, Any],
+    lng: Optional[float],
+    lat: Optional[float],
+    zone: Optional[int],
+    driver_ids: Optional[List[int]],
+) -> Dict[str, Any]:
+    pickup, dropoff, rider_name, phone_number = _job_fields(state)
+    return {
+        "pickup": pickup,
+        "dropoff": dropoff,
+        "rider_name": rider_name,
+        "phone_number": phone_number,
+        "fare": _coerce_fare(state.get("fare_estimate")),
+        "miles": state.get("estimated_miles"),
+        "explanation": state.get("fare_explanation"),
+        "explanation_status": state.get("explanation_status"),
+        "driver_pin": state.get("driver_pin"),
+        "driver_pin_expires": state.get("driver_pin_expires"),
+        "lng": lng,
+        "lat": lat,
+        "zone": zone,
+        "driver_ids": list(driver_ids or []),
+    }
+
+
+def _result(row: Dict[str, Any]) -> Dict[str, Any]:
+    """{job_id, driver (row or None)}; mirrors the counter deltas in this process."""
+    row = dict(row)
+    job_id, open_zone = int(row.pop("job_id")), row.pop("open_zone")
+    driver = row if row.get("id") is not None else None
+    board = get_board()
+    if driver is not None:
+        board.apply(driver_zone(driver.get("lat"), driver.get("lng")), drivers=-1)
+    if open_zone is not None:
+        board.apply(int(open_zone), open_jobs=1)
+    return {"job_id": job_id, "driver": driver}
+
+
+def commit_booking(
+    state: Dict[str, Any],
+    lng: Optional[float],
+    lat: Optional[float],
+    zone: Optional[int],
+    driver_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Insert the job, reserve + assign the nearest free driver (or the first
+    free one of `driver_ids`) and store the driver PIN, atomically.
+    Job fields come from the state (fare, explanation, driver_pin[_expires]).
+    """
+    sql = _SQL_PREFERRED if driver_ids else _SQL_NEAREST
+    with get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(sql, _params(state, lng, lat, zone, driver_ids))
+        row = cur.fetchone()
+        conn.commit()
+    return _result(row)
+
+
+async def commit_booking_async(
+    state: Dict[str, Any],
+    lng: Optional[float],
+    lat: Optional[float],
+    zone: Optional[int],
+    driver_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    sql = _SQL_PREFERRED if driver_ids else _SQL_NEAREST
+    async with aget_conn() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(sql, _params(state, lng, lat, zone, driver_ids))
+            row = await cur.fetchone()
+        await conn.commit()
+    return _result(row)
@@ -0,0 +1,250 @@
+# db/booking_queue.py
+# --------------------------------------------------------------------
+# Durable booking intake queue (BOOKING_INTAKE=queue).
+#
+# POST /book/ride inserts the job and its `booking_queue` row in one
+# transaction and answers 202; dispatch workers (dispatch/intake_worker.py)
+# drain the table:
+#   claim     oldest ready row, FOR UPDATE SKIP LOCKED (workers never
+#             block on or double-take a row), -> running, attempts + 1,
+#             locked for BOOKING_QUEUE_LOCK_SEC; a running row whose worker
+#             died is claimable again once its lock lapses
+#   complete  -> done with the rider-facing result, and the priced fare /
+#             miles written back to the job (intake doesn't price)
+#   assign_queued_job
+#             -> the driver assignment, the driver's reservation and the
+#             completion above in ONE transaction, so a booking that got a
+#             driver is never claimed (and dispatched) again
+#   fail      -> queued again after a backoff, or failed after
+#             BOOKING_QUEUE_MAX_ATTEMPTS
+# A running row whose lock lapsed (worker died) is claimable again while
+# attempts < BOOKING_QUEUE_MAX_ATTEMPTS, and marked failed after that.
+# Row status: queued | running | done | failed. Done / failed rows are
+# pruned after BOOKING_QUEUE_KEEP_SEC.
+# --------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from db.pg import get_conn
+from db.apg import aget_conn  # async twin (psycopg 3; optional)
+from db.driver_registry import update_driver_availability
+from db.writer import _ASSIGN_SQL, _coerce_fare, _job_fields
+from resources.surge import apply_counts, record_counts
+
+LOCK_SEC = int(os.getenv("BOOKING_QUEUE_LOCK_SEC", "120"))
+MAX_ATTEMPTS = int(os.getenv("BOOKING_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SEC = float(os.getenv("BOOKING_QUEUE_RETRY_SEC", "2"))
+KEEP_SEC = int(os.getenv("BOOKING_QUEUE_KEEP_SEC", "86400"))
+
+# State keys that travel with the queued booking (the graph recomputes the rest)
+_QUEUED_KEYS = (
+    "task", "pickup_location", "dropoff_location", "ride_time", "ride_time_iso", "rider_name", "phone_number",
+    "job_id", "pin", "fare_estimate", "estimated_miles", "fare_quoted",
+    "pickup_lat", "pickup_lng", "dropoff_lat", "dropoff_lng",
+)
+
+# Rider-facing fields kept on the done row (GET /jobs/status)
+_RESULT_KEYS = ("dispatch_info", "driver_name", "vehicle", "plate", "eta_minutes",
+                "fare_estimate", "estimated_miles")
+
+_INSERT_JOB_SQL = """
+    INSERT INTO jobs (pickup_location, dropoff_location, rider_name, phone_number,
+                      fare_estimate, estimated_miles, claimed)
+    VALUES (%s, %s, %s, %s, %s, %s, false)
+    RETURNING id
+"""
+
+_ENQUEUE_SQL = "INSERT INTO booking_queue (job_id, state) VALUES (%s, %s::jsonb)"
+
+_CLAIM_SQL = """
+    UPDATE booking_queue q
+       SET status = 'running',
+           attempts = q.attempts + 1,
+           locked_until = now() + make_interval(secs => %s),
+           updated_at = now()
+     WHERE q.job_id = (
+        SELECT job_id FROM booking_queue
+         WHERE (status = 'queued' AND available_at <= now())
+            OR (status = 'running' AND locked_until <= now() AND attempts < %s)
+         ORDER BY available_at
+         LIMIT 1
+         FOR UPDATE SKIP LOCKED
+     )
+    RETURNING q.job_id, q.state, q.attempts
+"""
+
+# Running rows that lapsed on their last attempt: the booking keeps killing
+# its worker, stop retrying it
+_EXHAUSTED_SQL = """
+    UPDATE booking_queue
+       SET status = 'failed', locked_until = NULL, updated_at = now(),
+           last_error = COALESCE(last_error, 'worker lost on the last attempt')
+     WHERE status = 'running' AND locked_until <= now() AND attempts >= %s
+"""
+
+_DONE_SQL = """
+    UPDATE booking_queue
+       SET status = 'done', result = %s::jsonb, last_error = NULL,
+           locked_until = NULL, updated_at = now()
+     WHERE job_id = %s
+"""
+
+_FARE_SQL = """
+    UPDATE jobs
+       SET fare_estimate = COALESCE(%s, fare_estimate),
+           estimated_miles = COALESCE(%s, estimated_miles)
+     WHERE id = %s
+"""
+
+_FAIL_SQL = """
+    UPDATE booking_queue
+       SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+           available_at = now() + make_interval(secs => %s * power(2, attempts - 1)),
+           locked_until = NULL, last_error = %s, updated_at = now()
+     WHERE job_id = %s
+    RETURNING status
+"""
+
+_JOB_DRIVER_SQL = "SELECT driver_id FROM jobs WHERE id = %s FOR UPDATE"
+
+_ASSIGNMENT_SQL = """
+    SELECT d.id, d.name, d.vehicle, d.plate,
+           ST_Y(d.home_base::geometry) AS lat,
+           ST_X(d.home_base::geometry) AS lng
+      FROM jobs j
+      JOIN drivers d ON d.id = j.driver_id
+     WHERE j.id = %s AND j.claimed
+"""
+
+_PRUNE_SQL = """
+    DELETE FROM booking_queue
+     WHERE status IN ('done', 'failed')
+       AND updated_at < now() - make_interval(secs => %s)
+"""
+
+_STATUS_SQL = """
+    SELECT job_id, status, attempts, result, last_error, created_at, updated_at
+      FROM booking_queue
+     WHERE job_id = %s
+"""
+
+
+def queued_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """The JSON-safe subset of the start state a worker needs."""
+    return {k: state.get(k) for k in _QUEUED_KEYS if state.get(k) is not None}
+
+
+def _job_params(state: Dict[str, Any]) -> tuple:
+    # No fare fallback here: intake must not geocode; the worker prices the
+    # job and writes the fare back on complete (a quote token's fare is kept)
+    return (*_job_fields(state), _coerce_fare(state.get("fare_estimate")), state.get("estimated_miles"))
+
+
+def enqueue_booking(state: Dict[str, Any], with_ids) -> Dict[str, Any]:
+    """
+    Insert the job and queue it for dispatch, in one transaction.
+    `with_ids(state, job_id_str)` stamps job_id / rider pin on the state
+    before it is queued; returns that state.
+    """
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_INSERT_JOB_SQL, _job_params(state))
+        state = with_ids(state, str(cur.fetchone()[0]))
+        cur.execute(_ENQUEUE_SQL, (int(state["job_id"]), json.dumps(queued_state(state), default=str)))
+        conn.commit()
+    return state
+
+
+async def enqueue_booking_async(state: Dict[str, Any], with_ids) -> Dict[str, Any]:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_INSERT_JOB_SQL, _job_params(state))
+            state = with_ids(state, str((await cur.fetchone())[0]))
+            await cur.execute(_ENQUEUE_SQL, (int(state["job_id"]), json.dumps(queued_state(state), default=str)))
+        await conn.commit()
+    return state
+
+
+def claim_next() -> Optional[Dict[str, Any]]:
+    """Claim the oldest ready booking: {job_id, state, attempts}, or None."""
+    with get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(_EXHAUSTED_SQL, (MAX_ATTEMPTS,))
+        cur.execute(_CLAIM_SQL, (LOCK_SEC, MAX_ATTEMPTS))
+        row = cur.fetchone()
+        conn.commit()
+    return dict(row) if row else None
+
+
+def _finish(cur, job_id: int, state: Dict[str, Any]) -> None:
+    result = {k: state.get(k) for k in _RESULT_KEYS}
+    cur.execute(_FARE_SQL, (_coerce_fare(state.get("fare_estimate")), state.get("estimated_miles"), job_id))
+    cur.execute(_DONE_SQL, (json.dumps(result, default=str), job_id))
+
+
+def complete(job_id: int, state: Dict[str, Any]) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        _finish(cur, job_id, state)
+        conn.commit()
+
+
+def queued_assignment(job_id: int) -> Optional[Dict[str, Any]]:
+    """The driver a job is already assigned to (id, name, vehicle, plate, lat, lng), or None."""
+    with get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(_ASSIGNMENT_SQL, (job_id,))
+        row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def assign_queued_job(job_id: int, driver: Dict[str, Any], state: Dict[str, Any]) -> bool:
+    """
+    One transaction: assign the job to `driver`, take the driver off the
+    available pool, write the fare back and mark the queue row done with
+    `state`'s result. False (nothing written) if the job already has a
+    driver, e.g. a rerun racing the first one.
+    """
+    deltas = []
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_JOB_DRIVER_SQL, (job_id,))
+        row = cur.fetchone()
+        if row is None or row[0] is not None:
+            conn.rollback()
+            return False
+        cur.execute(_ASSIGN_SQL, (job_id, driver["id"], driver["name"]))
+        row = cur.fetchone()
+        if row and row[0] is not None:
+            deltas.append(record_counts(cur, row[0], open_jobs=-1))
+        deltas.append(update_driver_availability(cur, driver["id"], False))
+        _finish(cur, job_id, state)
+        conn.commit()
+    apply_counts(*deltas)
+    return True
+
+
+def fail(job_id: int, error: str) -> str:
+    """Back off and requeue, or give up after MAX_ATTEMPTS; returns the new status."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_FAIL_SQL, (MAX_ATTEMPTS, RETRY_BASE_SEC, error[:500], job_id))
+        row = cur.fetchone()
+        conn.commit()
+    return row[0] if row else "failed"
+
+
+def prune() -> int:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_PRUNE_SQL, (KEEP_SEC,))
+        n = cur.rowcount
+        conn.commit()
+    return n
+
+
+def get_intake(job_id: int) -> Optional[Dict[str, Any]]:
+    """The job's queue row (status, attempts, result), or None if it never queued."""
+    with get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(_STATUS_SQL, (job_id,))
+        row = cur.fetchone()
+    return dict(row) if row else None
@@ -5,6 +5,8 @@ from __future__ import annotations
 from typing import Optional, Dict, Any, List
 from psycopg2.extras import RealDictCursor
 from db.pg import get_conn  # <-- use pooled connection helper
+from db.apg import aget_conn, dict_row  # async twins (psycopg 3; optional)
+from resources.surge import CountDelta, apply_counts, driver_zone, record_counts, record_counts_async
 
 def list_available_drivers() -> List[Dict[str, Any]]:
     """Return all currently available drivers (basic listing)."""
@@ -18,35 +20,94 @@ def list_available_drivers() -> List[Dict[str, Any]]:
         rows = cur.fetchall() or []
         return [dict(r) for r in rows]
 
+_NEAREST_SQL = """
+    SELECT
+        id, name, email, vehicle, plate,
+        ST_Y(home_base::geometry) AS lat,
+        ST_X(home_base::geometry) AS lng,
+        ST_Distance(
+            home_base,
+            ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography
+        ) AS meters
+    FROM drivers
+    WHERE is_available = true
+      AND home_base IS NOT NULL
+    ORDER BY home_base <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326)
+    LIMIT %s
+"""
+
 def find_nearest_available_driver(pickup_lng: float, pickup_lat: float) -> Optional[Dict[str, Any]]:
     """
     Use PostGIS to compute the nearest available driver to the pickup location.
     - pickup_lng: longitude (X)
     - pickup_lat: latitude (Y)
-    Returns a driver row (dict) or None.
+    Returns a driver row (dict, including home_base lat/lng) or None.
+    """
+    rows = find_nearest_available_drivers(pickup_lng, pickup_lat, 1)
+    return rows[0] if rows else None
+
+def find_nearest_available_drivers(pickup_lng: float, pickup_lat: float, limit: int = 5) -> List[Dict[str, Any]]:
     """
-    sql = """
-        SELECT
-            id, name, email, vehicle, plate,
-            ST_Distance(
-                home_base,
-                ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography
-            ) AS meters
-        FROM drivers
-        WHERE is_available = true
-          AND home_base IS NOT NULL
-        ORDER BY home_base <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326)
-        LIMIT 1
+    Like find_nearest_available_driver, but the `limit` nearest candidates
+    (straight-line order) with their home_base coordinates (lat, lng), so the
+    dispatcher can re-rank them by drive time.
     """
-    params = (pickup_lng, pickup_lat, pickup_lng, pickup_lat)
+    params = (pickup_lng, pickup_lat, pickup_lng, pickup_lat, limit)
     with get_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql, params)
-        row = cur.fetchone()
-        return dict(row) if row else None
+        cur.execute(_NEAREST_SQL, params)
+        return [dict(r) for r in cur.fetchall() or []]
+
+async def find_nearest_available_drivers_async(
+    pickup_lng: float, pickup_lat: float, limit: int = 5
+) -> List[Dict[str, Any]]:
+    """find_nearest_available_drivers on the async pool (db/apg.py)."""
+    params = (pickup_lng, pickup_lat, pickup_lng, pickup_lat, limit)
+    async with aget_conn() as conn, conn.cursor(row_factory=dict_row) as cur:
+        await cur.execute(_NEAREST_SQL, params)
+        return list(await cur.fetchall() or [])
+
+async def find_nearest_available_driver_async(pickup_lng: float, pickup_lat: float) -> Optional[Dict[str, Any]]:
+    rows = await find_nearest_available_drivers_async(pickup_lng, pickup_lat, 1)
+    return rows[0] if rows else None
+
+_AVAILABILITY_SQL = """
+    UPDATE drivers
+    SET is_available = %s
+    WHERE id = %s AND is_available IS DISTINCT FROM %s
+    RETURNING ST_Y(home_base::geometry), ST_X(home_base::geometry)
+"""
+
+def update_driver_availability(cur, driver_id: int, available: bool) -> Optional[CountDelta]:
+    """
+    Flip a driver's availability bit inside the caller's transaction and move
+    the driver in the per-zone surge counters. Returns the surge delta to
+    apply_counts after the caller commits, or None if nothing changed.
+    """
+    cur.execute(_AVAILABILITY_SQL, (available, driver_id, available))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return record_counts(cur, driver_zone(row[0], row[1]), drivers=1 if available else -1)
+
+async def update_driver_availability_async(cur, driver_id: int, available: bool) -> Optional[CountDelta]:
+    """update_driver_availability on an async (psycopg 3) cursor."""
+    await cur.execute(_AVAILABILITY_SQL, (available, driver_id, available))
+    row = await cur.fetchone()
+    if row is None:
+        return None
+    return await record_counts_async(cur, driver_zone(row[0], row[1]), drivers=1 if available else -1)
 
 def set_driver_availability(driver_id: int, available: bool) -> None:
     """Flip a driver's availability bit."""
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("UPDATE drivers SET is_available = %s WHERE id = %s", (available, driver_id))
+        delta = update_driver_availability(cur, driver_id, available)
         conn.commit()
+    apply_counts(delta)
+
+async def set_driver_availability_async(driver_id: int, available: bool) -> None:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            delta = await update_driver_availability_async(cur, driver_id, available)
+        await conn.commit()
+    apply_counts(delta)
 
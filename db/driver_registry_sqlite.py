@@ -1,6 +1,8 @@
 import sqlite3
 import random
 
+from resources.eta_engine import typical_eta_minutes
+
 def create_drivers_table():
     conn = sqlite3.connect("booking_agent.db")
     cursor = conn.cursor()
@@ -54,7 +56,8 @@ def get_available_driver():
         "plate": selected[2],
         "phone": selected[3],
         "email": selected[4],
-        "eta_minutes": random.randint(5, 12)
+        # No driver positions in this table: typical pickup ETA at the current hour
+        "eta_minutes": typical_eta_minutes()
     }
 
 def list_available_drivers():
@@ -1,6 +1,7 @@
 import sqlite3
 import random
-from geopy.distance import geodesic
+
+from resources.geo_distance import nearest
 
 def create_jobs_table():
     conn = sqlite3.connect("booking_agent.db")
@@ -45,20 +46,19 @@ def find_nearest_driver(pickup_lat, pickup_lng):
     drivers = cursor.fetchall()
     conn.close()
 
-    pickup_coords = (pickup_lat, pickup_lng)
-    closest = None
-    min_distance = float("inf")
-
-    for name, vehicle, plate, lat, lng in drivers:
-        if lat is None or lng is None:
-            continue
-        driver_coords = (lat, lng)
-        distance = geodesic(pickup_coords, driver_coords).miles
-        if distance < min_distance:
-            min_distance = distance
-            closest = (name, vehicle, plate)
+    # Rank every located driver in one vectorized pass
+    located = [d for d in drivers if d[3] is not None and d[4] is not None]
+    idx, _miles = nearest(
+        pickup_lat,
+        pickup_lng,
+        [d[3] for d in located],
+        [d[4] for d in located],
+    )
+    if idx < 0:
+        return None
 
-    return closest
+    name, vehicle, plate, _lat, _lng = located[idx]
+    return (name, vehicle, plate)
 
 def post_job(state):
     pickup_lat = state["pickup_lat"]
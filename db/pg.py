@@ -1,13 +1,20 @@
 # db/pg.py
 # -------------------------------------------------------------------
-# Small psycopg2 connection pool, configured via env.
+# Thread-safe psycopg2 connection pool, configured via env.
 # Use DATABASE_URL or individual vars (PGDATABASE, PGUSER, PGPASSWORD, PGHOST, PGPORT).
+#
+# Many threads share it: request threadpool, geocode + refresh pools
+# (durable cache), the Nominatim rate-limit bucket, surge sync, booking
+# intake workers, idempotency (to_thread) and deferred explanations.
+# Size PG_POOL_MAX for that; when every connection is checked out,
+# get_conn waits up to PG_POOL_TIMEOUT_SEC for one instead of failing.
 # -------------------------------------------------------------------
 from __future__ import annotations
 import os
+import threading
 from contextlib import contextmanager
 from typing import Iterator
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 import psycopg2
 
 # Prefer DATABASE_URL. Fallback to discrete vars.
@@ -19,14 +26,22 @@ DSN = os.getenv("DATABASE_URL") or (
     f"port={os.getenv('PGPORT','5432')}"
 )
 
-# Create a tiny pool (1..5). If DB is local dev, this is enough.
-_POOL: SimpleConnectionPool | None = None
+POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+POOL_MAX = max(1, int(os.getenv("PG_POOL_MAX", "20")))
+POOL_TIMEOUT_SEC = float(os.getenv("PG_POOL_TIMEOUT_SEC", "10"))
 
-def _pool() -> SimpleConnectionPool:
+_POOL: ThreadedConnectionPool | None = None
+_POOL_LOCK = threading.Lock()
+# One slot per connection: callers queue here instead of getting PoolError
+_SLOTS = threading.BoundedSemaphore(POOL_MAX)
+
+def _pool() -> ThreadedConnectionPool:
     global _POOL
     if _POOL is None:
-        # Note: raise on fail so you see it at boot.
-        _POOL = SimpleConnectionPool(minconn=1, maxconn=5, dsn=DSN)
+        with _POOL_LOCK:
+            if _POOL is None:
+                # Note: raise on fail so you see it at boot.
+                _POOL = ThreadedConnectionPool(minconn=min(POOL_MIN, POOL_MAX), maxconn=POOL_MAX, dsn=DSN)
     return _POOL
 
 @contextmanager
@@ -36,10 +51,16 @@ def get_conn() -> Iterator[psycopg2.extensions.connection]:
       with get_conn() as conn:
           with conn.cursor() as cur:
               ...
+    Raises PoolError if no connection frees up within PG_POOL_TIMEOUT_SEC.
     """
-    pool = _pool()
-    conn = pool.getconn()
+    if not _SLOTS.acquire(timeout=POOL_TIMEOUT_SEC):
+        raise PoolError(f"no Postgres connection free within {POOL_TIMEOUT_SEC}s (PG_POOL_MAX={POOL_MAX})")
     try:
-        yield conn
+        pool = _pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn)
     finally:
-        pool.putconn(conn)
+        _SLOTS.release()
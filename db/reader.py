@@ -26,7 +26,8 @@ def get_job(job_id: int) -> Optional[Dict[str, Any]]:
             cur.execute(
                 """
                 SELECT id, pickup_location, dropoff_location, fare_estimate,
-                       rider_name, phone_number, posted_at, claimed, driver_name, completed_at
+                       rider_name, phone_number, posted_at, claimed, driver_name, completed_at,
+                       fare_explanation, explanation_status
                 FROM jobs
                 WHERE id = %s
                 """,
@@ -34,3 +35,14 @@ def get_job(job_id: int) -> Optional[Dict[str, Any]]:
             )
             row = cur.fetchone()
             return dict(row) if row else None
+
+
+def get_job_explanation(job_id: int) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT id, fare_explanation, explanation_status FROM jobs WHERE id = %s",
+                (job_id,),
+            )
+            row = cur.fetchone()
+            return dict(row) if row else None
@@ -1,6 +1,9 @@
 # db/writer.py
 # --------------------------------------------------------------------
 # Persists jobs and assignments.
+# Jobs waiting for a driver carry `open_zone` (their pickup zone) and are
+# counted in the per-zone surge counters (resources/surge.py) until
+# assigned or closed; each change moves the counter in the same transaction.
 # Guarantees: we try hard to persist a non-null fare_estimate:
 #   - Prefer value from `state["fare_estimate"]`
 #   - If missing/unparseable, we compute a fallback using geo_utils + fare_engine
@@ -15,6 +18,8 @@ from decimal import Decimal, InvalidOperation
 from psycopg2.extras import RealDictCursor
 
 from db.pg import get_conn
+from db.apg import aget_conn  # async twins (psycopg 3; optional)
+from resources.surge import CountDelta, apply_counts, record_counts, record_counts_async
 
 
 # ---------- helpers ----------
@@ -42,6 +47,7 @@ def _compute_fare_fallback(pickup: str, dropoff: str) -> Optional[float]:
     """
     As a last resort, compute a fare if the state didn't include one.
     This keeps DB consistent even if the route mistakenly inserted before running the fare node.
+    estimate_miles consults the route-pair memo, so a pair already quoted costs no geocoding.
     """
     try:
         # Lazy imports to avoid module cycles on import graph
@@ -54,8 +60,42 @@ def _compute_fare_fallback(pickup: str, dropoff: str) -> Optional[float]:
         return None
 
 
+async def _compute_fare_fallback_async(pickup: str, dropoff: str) -> Optional[float]:
+    """_compute_fare_fallback with the async geocoder (never blocks the loop)."""
+    try:
+        from resources.geo_utils import estimate_miles_async
+        from resources.fare_engine import calculate_base_fare
+        return float(calculate_base_fare(await estimate_miles_async(pickup, dropoff)))
+    except Exception:
+        return None
+
+
 # ---------- writes ----------
 
+_INSERT_JOB_SQL = """
+    INSERT INTO jobs (
+        pickup_location,
+        dropoff_location,
+        rider_name,
+        phone_number,
+        fare_estimate,   -- persisted as numeric if available
+        claimed,
+        driver_id,
+        driver_name
+    )
+    VALUES (%s, %s, %s, %s, %s, false, NULL, NULL)
+    RETURNING id
+"""
+
+
+def _job_fields(state: dict):
+    pickup = (state.get("pickup_location") or "").strip()
+    dropoff = (state.get("dropoff_location") or "").strip()
+    rider_name = (state.get("rider_name") or "").strip()
+    phone_number = (state.get("phone_number") or "").strip()
+    return pickup, dropoff, rider_name, phone_number
+
+
 def create_job(state: dict) -> int:
     """
     Insert a job row and return the new id.
@@ -66,10 +106,7 @@ def create_job(state: dict) -> int:
       - fare_estimate (numeric) using state['fare_estimate'] if present,
         otherwise computes a fallback so it won't be NULL.
     """
-    pickup = (state.get("pickup_location") or "").strip()
-    dropoff = (state.get("dropoff_location") or "").strip()
-    rider_name = (state.get("rider_name") or "").strip()
-    phone_number = (state.get("phone_number") or "").strip()
+    pickup, dropoff, rider_name, phone_number = _job_fields(state)
 
     # 1) Prefer fare from state (produced by nodes/explain_fare.py)
     fare_estimate_value = _coerce_fare(state.get("fare_estimate"))
@@ -80,20 +117,7 @@ def create_job(state: dict) -> int:
 
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            """
-            INSERT INTO jobs (
-                pickup_location,
-                dropoff_location,
-                rider_name,
-                phone_number,
-                fare_estimate,   -- persisted as numeric if available
-                claimed,
-                driver_id,
-                driver_name
-            )
-            VALUES (%s, %s, %s, %s, %s, false, NULL, NULL)
-            RETURNING id
-            """,
+            _INSERT_JOB_SQL,
             (
                 pickup,
                 dropoff,
@@ -107,22 +131,132 @@ def create_job(state: dict) -> int:
         return int(job_id)
 
 
+async def create_job_async(state: dict) -> int:
+    """create_job on the async pool (db/apg.py)."""
+    pickup, dropoff, rider_name, phone_number = _job_fields(state)
+    fare_estimate_value = _coerce_fare(state.get("fare_estimate"))
+    if fare_estimate_value is None and pickup and dropoff:
+        fare_estimate_value = await _compute_fare_fallback_async(pickup, dropoff)
+
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_INSERT_JOB_SQL, (pickup, dropoff, rider_name, phone_number, fare_estimate_value))
+            job_id = (await cur.fetchone())[0]
+        await conn.commit()
+        return int(job_id)
+
+
+_ASSIGN_SQL = """
+    WITH prev AS (
+        SELECT id, open_zone FROM jobs WHERE id = %s FOR UPDATE
+    )
+    UPDATE jobs
+    SET driver_id = %s,
+        driver_name = %s,
+        claimed = true,
+        open_zone = NULL
+    FROM prev
+    WHERE jobs.id = prev.id
+    RETURNING prev.open_zone
+"""
+
+
 def assign_job_to_driver(job_id: int, driver_id: int, driver_name: str) -> None:
     """
     Mark a job as claimed and link it to a driver.
     - sets jobs.driver_id, jobs.driver_name
     - sets jobs.claimed = true
     """
+    delta = None
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_ASSIGN_SQL, (job_id, driver_id, driver_name))
+        row = cur.fetchone()
+        if row and row[0] is not None:
+            delta = record_counts(cur, row[0], open_jobs=-1)  # no longer waiting for a driver
+        conn.commit()
+    apply_counts(delta)
+
+
+async def assign_job_to_driver_async(job_id: int, driver_id: int, driver_name: str) -> None:
+    delta = None
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_ASSIGN_SQL, (job_id, driver_id, driver_name))
+            row = await cur.fetchone()
+            if row and row[0] is not None:
+                delta = await record_counts_async(cur, row[0], open_jobs=-1)
+        await conn.commit()
+    apply_counts(delta)
+
+
+def close_open_job(cur, job_id: int) -> Optional[CountDelta]:
+    """
+    Inside the caller's transaction: take a job out of the open-job surge
+    counters. Returns the delta to apply_counts after the caller commits.
+    """
+    cur.execute(
+        """
+        WITH prev AS (
+            SELECT id, open_zone FROM jobs WHERE id = %s AND open_zone IS NOT NULL FOR UPDATE
+        )
+        UPDATE jobs SET open_zone = NULL
+        FROM prev
+        WHERE jobs.id = prev.id
+        RETURNING prev.open_zone
+        """,
+        (job_id,),
+    )
+    row = cur.fetchone()
+    return record_counts(cur, row[0], open_jobs=-1) if row else None
+
+
+_MARK_OPEN_SQL = """
+    UPDATE jobs SET open_zone = %s
+    WHERE id = %s AND open_zone IS NULL AND claimed = false
+    RETURNING id
+"""
+
+
+def mark_job_open(job_id: int, zone: int) -> None:
+    """
+    Dispatch found no driver: count the job as open demand in its pickup zone
+    (surge) until it is assigned or closed. Idempotent.
+    """
+    delta = None
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_MARK_OPEN_SQL, (zone, job_id))
+        if cur.fetchone():
+            delta = record_counts(cur, zone, open_jobs=1)
+        conn.commit()
+    apply_counts(delta)
+
+
+async def mark_job_open_async(job_id: int, zone: int) -> None:
+    delta = None
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(_MARK_OPEN_SQL, (zone, job_id))
+            if await cur.fetchone():
+                delta = await record_counts_async(cur, zone, open_jobs=1)
+        await conn.commit()
+    apply_counts(delta)
+
+
+def set_job_explanation(job_id: int, text: Optional[str]) -> None:
+    """
+    Store a deferred LLM fare explanation on the job (None = the LLM failed:
+    keep the template copy). Runs on the explanation pool, after the booking
+    response went out.
+    """
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
             """
             UPDATE jobs
-            SET driver_id = %s,
-                driver_name = %s,
-                claimed = true
-            WHERE id = %s
+               SET fare_explanation = COALESCE(%s, fare_explanation),
+                   explanation_status = %s
+             WHERE id = %s
             """,
-            (driver_id, driver_name, job_id),
+            (text, "llm" if text else "template", job_id),
         )
         conn.commit()
 
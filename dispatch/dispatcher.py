@@ -2,77 +2,322 @@
 # --------------------------------------------------------------
 # Choose the nearest available driver using the *real* pickup
 # coordinates obtained via geocoding, then assign and reserve.
+# With the offline road graph loaded (DISTANCE_PROVIDER=road), the
+# DISPATCH_ROAD_CANDIDATES straight-line-nearest drivers are
+# re-ranked by drive time to the pickup.
+# Pickup ETA comes from resources/eta_engine.py (per-zone,
+# time-of-day speed profiles learned from driver traces).
+# A job left without a driver counts as open demand in its pickup zone
+# for surge pricing (resources/surge.py) until it's assigned.
+# dispatch_booking_async is the same step for the async booking graph
+# (async geocoder + psycopg 3 pool, db/apg.py).
+# commit_dispatch(_async) is the dispatch step when the job is not yet
+# persisted (BOOKING_COMMIT=single): job insert, driver reservation,
+# assignment and driver PIN in one statement (db/booking_commit.py).
+# dispatch_queued_booking is the step for a queued booking
+# (BOOKING_INTAKE=queue): assignment, reservation and queue completion
+# commit together (db/booking_queue.py), so a retried booking never
+# dispatches twice; resume_assigned finishes one that already has a driver.
 # --------------------------------------------------------------
 
 from __future__ import annotations
-from typing import Dict, Any
+import os
+from typing import Dict, Any, List, Optional, Tuple
 
-from resources.geo_utils import geocode_lng_lat, FALLBACK_MILES
-from db.driver_registry import find_nearest_available_driver, set_driver_availability
-from db.writer import assign_job_to_driver
+from resources.geo_utils import geocode_lng_lat, geocode_lng_lat_async, distance_model, FALLBACK_MILES
+from resources.road_router import drive_route
+from resources.eta_engine import eta_minutes as estimate_eta_minutes, typical_eta_minutes
+from db.driver_registry import (
+    find_nearest_available_driver,
+    find_nearest_available_driver_async,
+    find_nearest_available_drivers,
+    find_nearest_available_drivers_async,
+    set_driver_availability,
+    set_driver_availability_async,
+)
+from db.writer import assign_job_to_driver, assign_job_to_driver_async, mark_job_open, mark_job_open_async
+from db.booking_commit import commit_booking, commit_booking_async
+from db.booking_queue import assign_queued_job, queued_assignment
+from nodes.explain_fare import defer_to_job, defers_to_job
+from resources.zones import zone_of
+
+ROAD_CANDIDATES = int(os.getenv("DISPATCH_ROAD_CANDIDATES", "5"))
+
+
+def _state_lng_lat(state: Dict[str, Any]) -> tuple[float, float] | None:
+    # Coordinates already on the state (redeemed quote token) skip geocoding
+    if state.get("pickup_lat") is not None and state.get("pickup_lng") is not None:
+        return float(state["pickup_lng"]), float(state["pickup_lat"])
+    return None
 
 
 def _pickup_lng_lat_from_state(state: Dict[str, Any]) -> tuple[float, float] | None:
     """
     Geocode the pickup_location in the state and return (lng, lat).
     If geocoding fails, return None (we'll handle a graceful fallback).
+    Coordinates already on the state (redeemed quote token) skip geocoding.
     """
+    coords = _state_lng_lat(state)
+    if coords is not None:
+        return coords
     pickup = (state.get("pickup_location") or "").strip()
     if not pickup:
         return None
     return geocode_lng_lat(pickup)  # -> (lng, lat) or None
 
 
+async def _pickup_lng_lat_from_state_async(state: Dict[str, Any]) -> tuple[float, float] | None:
+    coords = _state_lng_lat(state)
+    if coords is not None:
+        return coords
+    pickup = (state.get("pickup_location") or "").strip()
+    if not pickup:
+        return None
+    return await geocode_lng_lat_async(pickup)
+
+
+def _ranked(candidates, lng: float, lat: float) -> List[Tuple[Dict[str, Any], Optional[float]]]:
+    """
+    Candidates best first with their drive miles: routed ones by drive time,
+    then the ones the router can't place in straight-line order.
+    """
+    routed, unrouted = [], []
+    for i, cand in enumerate(candidates):
+        route = None
+        if cand.get("lat") is not None and cand.get("lng") is not None:
+            route = drive_route((float(cand["lat"]), float(cand["lng"])), (lat, lng))
+        if route is None:
+            unrouted.append((cand, None))
+        else:
+            routed.append((route.seconds, i, cand, route.miles))
+    routed.sort(key=lambda t: (t[0], t[1]))
+    return [(cand, miles) for _, _, cand, miles in routed] + unrouted
+
+
+def _rerank(candidates, lng: float, lat: float) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+    ranked = _ranked(candidates, lng, lat)
+    return ranked[0] if ranked else (None, None)
+
+
+def _nearest_driver(lng: float, lat: float) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+    """
+    Nearest available driver: PostGIS KNN, re-ranked by drive time when the
+    road model is active. Candidates the router can't place keep their
+    straight-line order behind the routed ones.
+    Returns (driver, drive miles to the pickup if routed).
+    """
+    if distance_model() != "road" or ROAD_CANDIDATES <= 1:
+        return find_nearest_available_driver(lng, lat), None
+    return _rerank(find_nearest_available_drivers(lng, lat, ROAD_CANDIDATES), lng, lat)
+
+
+async def _nearest_driver_async(lng: float, lat: float) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+    if distance_model() != "road" or ROAD_CANDIDATES <= 1:
+        return await find_nearest_available_driver_async(lng, lat), None
+    return _rerank(await find_nearest_available_drivers_async(lng, lat, ROAD_CANDIDATES), lng, lat)
+
+
+def _pickup_eta(driver: Dict[str, Any], lng: float, lat: float, miles: Optional[float]) -> int:
+    """Driver position -> pickup ETA in minutes (typical ETA if the position is unknown)."""
+    if driver.get("lat") is None or driver.get("lng") is None:
+        return typical_eta_minutes((lat, lng))
+    return estimate_eta_minutes((float(driver["lat"]), float(driver["lng"])), (lat, lng), miles)
+
+
+def _no_pickup(state: Dict[str, Any]) -> Dict[str, Any]:
+    # No geocode result -> do not crash the flow; tell the user gracefully
+    return {
+        **state,
+        "dispatch_info": "❌ Could not determine pickup location precisely yet. Please try again in a moment.",
+        "driver_name": None,
+        "vehicle": None,
+        "plate": None,
+        "eta_minutes": None,
+    }
+
+
+def _no_driver(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **state,
+        "dispatch_info": "❌ No available drivers at the moment.",
+        "driver_name": None,
+        "vehicle": None,
+        "plate": None,
+        "eta_minutes": None,
+    }
+
+
+def _assigned(state: Dict[str, Any], driver: Dict[str, Any], eta_minutes: int) -> Dict[str, Any]:
+    dispatch_info = (
+        f"✅ Driver Assigned: {driver['name']} ({driver.get('vehicle', '?')}, {driver.get('plate', '?')})\n"
+        f"⏱️ ETA: {eta_minutes} minutes"
+    )
+
+    return {
+        **state,
+        "dispatch_info": dispatch_info,
+        "driver_name": driver["name"],
+        "vehicle": driver.get("vehicle"),
+        "plate": driver.get("plate"),
+        "eta_minutes": eta_minutes,
+    }
+
+
 def dispatch_booking(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     1) Geocode pickup to (lng, lat)
-    2) Query nearest available driver (PostGIS KNN) using that point
+    2) Query nearest available driver (PostGIS KNN, drive-time re-rank) using that point
     3) If none: return a 'pending' response
     4) If found: assign job + mark driver unavailable + enrich response
     """
     coords = _pickup_lng_lat_from_state(state)
     if coords is None:
-        # No geocode result -> do not crash the flow; tell the user gracefully
-        return {
-            **state,
-            "dispatch_info": "❌ Could not determine pickup location precisely yet. Please try again in a moment.",
-            "driver_name": None,
-            "vehicle": None,
-            "plate": None,
-            "eta_minutes": None,
-        }
+        return _no_pickup(state)
 
     lng, lat = coords
-    driver = find_nearest_available_driver(lng, lat)
+    driver, drive_miles = _nearest_driver(lng, lat)
 
     if not driver:
-        return {
-            **state,
-            "dispatch_info": "❌ No available drivers at the moment.",
-            "driver_name": None,
-            "vehicle": None,
-            "plate": None,
-            "eta_minutes": None,
-        }
+        try:
+            mark_job_open(int(state["job_id"]), zone_of(lat, lng))
+        except Exception:
+            pass  # surge counters are best-effort; never fail the booking
+        return _no_driver(state)
 
     # We have a driver — assign the job and mark the driver unavailable
     job_id = int(state["job_id"])  # job_id must already be persisted by /book/ride
     assign_job_to_driver(job_id, driver_id=driver["id"], driver_name=driver["name"])
     set_driver_availability(driver["id"], False)
 
-    # Simple ETA placeholder (you can replace with real routing later)
-    eta_minutes = 8
+    return _assigned(state, driver, _pickup_eta(driver, lng, lat, drive_miles))
 
-    dispatch_info = (
-        f"✅ Driver Assigned: {driver['name']} ({driver.get('vehicle', '?')}, {driver.get('plate', '?')})\n"
-        f"⏱️ ETA: {eta_minutes} minutes"
+
+async def dispatch_booking_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """dispatch_booking without blocking the event loop (same steps, same result)."""
+    coords = await _pickup_lng_lat_from_state_async(state)
+    if coords is None:
+        return _no_pickup(state)
+
+    lng, lat = coords
+    driver, drive_miles = await _nearest_driver_async(lng, lat)
+
+    if not driver:
+        try:
+            await mark_job_open_async(int(state["job_id"]), zone_of(lat, lng))
+        except Exception:
+            pass  # surge counters are best-effort; never fail the booking
+        return _no_driver(state)
+
+    job_id = int(state["job_id"])
+    await assign_job_to_driver_async(job_id, driver_id=driver["id"], driver_name=driver["name"])
+    await set_driver_availability_async(driver["id"], False)
+
+    return _assigned(state, driver, _pickup_eta(driver, lng, lat, drive_miles))
+
+
+def resume_assigned(state: Dict[str, Any], driver: Dict[str, Any]) -> Dict[str, Any]:
+    """Rider-facing result for a job already assigned to `driver` (no new dispatch)."""
+    coords = _state_lng_lat(state)
+    if coords is None:
+        pickup = (state.get("pickup_location") or "").strip()
+        coords = geocode_lng_lat(pickup) if pickup else None
+    if coords is None:
+        eta = typical_eta_minutes()
+    else:
+        lng, lat = coords
+        eta = _pickup_eta(driver, lng, lat, None)
+    return _assigned(state, driver, eta)
+
+
+def dispatch_queued_booking(state: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """
+    dispatch_booking for a queued (already persisted, already priced) job.
+    The assignment, the driver's reservation and the queue row's completion
+    are one transaction; a job that got a driver meanwhile is resumed from
+    that assignment instead of taking a second driver.
+    Returns (state, fresh): fresh is False when it resumed another run's work.
+    """
+    coords = _pickup_lng_lat_from_state(state)
+    if coords is None:
+        return _no_pickup(state), True
+
+    lng, lat = coords
+    job_id = int(state["job_id"])
+    driver, drive_miles = _nearest_driver(lng, lat)
+
+    if not driver:
+        try:
+            mark_job_open(job_id, zone_of(lat, lng))
+        except Exception:
+            pass  # surge counters are best-effort; never fail the booking
+        return _no_driver(state), True
+
+    out = _assigned(state, driver, _pickup_eta(driver, lng, lat, drive_miles))
+    if assign_queued_job(job_id, driver, out):
+        return out, True
+    existing = queued_assignment(job_id)
+    return (resume_assigned(state, existing) if existing else _no_driver(state)), False
+
+
+# ----------------------------
+# Single-statement commit (BOOKING_COMMIT=single)
+# ----------------------------
+
+def _before_commit(state: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    # The insert already records a paraphrase that will follow as pending
+    defer = defers_to_job(state)
+    return ({**state, "explanation_status": "pending"} if defer else state), defer
+
+
+def _committed(
+    state: Dict[str, Any],
+    res: Dict[str, Any],
+    coords: Optional[Tuple[float, float]],
+    ranked: Optional[List[Tuple[Dict[str, Any], Optional[float]]]],
+    defer: bool,
+) -> Dict[str, Any]:
+    state = {**state, "job_id": str(res["job_id"])}
+    if defer:
+        defer_to_job(state, state["job_id"])
+    if coords is None:
+        return _no_pickup(state)
+    driver = res["driver"]
+    if driver is None:
+        return _no_driver(state)
+    lng, lat = coords
+    drive_miles = {c["id"]: m for c, m in ranked or []}.get(driver["id"])
+    return _assigned(state, driver, _pickup_eta(driver, lng, lat, drive_miles))
+
+
+def commit_dispatch(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    1) Geocode pickup (road model: rank KNN candidates by drive time)
+    2) One statement: insert the job + reserve/assign the driver + driver PIN
+       (state's driver_pin / driver_pin_expires); no driver -> left open
+    3) Same response fields as dispatch_booking, plus the new job_id
+    """
+    coords = _pickup_lng_lat_from_state(state)
+    lng, lat = coords if coords else (None, None)
+    ranked = None
+    if coords and distance_model() == "road" and ROAD_CANDIDATES > 1:
+        ranked = _ranked(find_nearest_available_drivers(lng, lat, ROAD_CANDIDATES), lng, lat)
+    state, defer = _before_commit(state)
+    res = commit_booking(
+        state, lng, lat, zone_of(lat, lng) if coords else None,
+        [c["id"] for c, _ in ranked] if ranked else None,
     )
+    return _committed(state, res, coords, ranked, defer)
 
-    return {
-        **state,
-        "dispatch_info": dispatch_info,
-        "driver_name": driver["name"],
-        "vehicle": driver.get("vehicle"),
-        "plate": driver.get("plate"),
-        "eta_minutes": eta_minutes,
-    }
+
+async def commit_dispatch_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    coords = await _pickup_lng_lat_from_state_async(state)
+    lng, lat = coords if coords else (None, None)
+    ranked = None
+    if coords and distance_model() == "road" and ROAD_CANDIDATES > 1:
+        ranked = _ranked(await find_nearest_available_drivers_async(lng, lat, ROAD_CANDIDATES), lng, lat)
+    state, defer = _before_commit(state)
+    res = await commit_booking_async(
+        state, lng, lat, zone_of(lat, lng) if coords else None,
+        [c["id"] for c, _ in ranked] if ranked else None,
+    )
+    return _committed(state, res, coords, ranked, defer)
@@ -0,0 +1,166 @@
+# dispatch/intake_worker.py
+# --------------------------------------------------------------
+# Dispatch workers for the booking intake queue (BOOKING_INTAKE=queue,
+# db/booking_queue.py). Each worker thread claims the oldest ready
+# booking (SKIP LOCKED, so any number of workers / processes share the
+# table), runs the booking flow on it (price -> explain -> dispatch ->
+# driver PIN -> notifications) and records the outcome on the row:
+# done, or requeued with backoff, failed after the last attempt.
+# Re-running a booking is safe: a driver assignment commits together with
+# the row's completion, and a job that already has a driver is finished
+# from that assignment (routes/book.py dispatch_queued).
+#
+# Where they run:
+#   - in the API process: BOOKING_WORKERS threads started with the app
+#     (api.py); POST /book/ride wakes them right after enqueueing
+#   - standalone, for a separate dispatch fleet (set BOOKING_WORKERS=0
+#     on the API):  python -m dispatch.intake_worker [--workers N]
+# Idle workers poll every BOOKING_QUEUE_POLL_SEC. Each worker uses one
+# pooled psycopg2 connection at a time (db/pg.py pool has 5).
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from db.booking_queue import claim_next, complete, fail, prune
+
+WORKERS = int(os.getenv("BOOKING_WORKERS", "2"))
+POLL_SEC = float(os.getenv("BOOKING_QUEUE_POLL_SEC", "0.5"))
+PRUNE_EVERY_SEC = 300.0
+
+Handler = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class IntakeWorkers:
+    """
+    `handler(state) -> state` runs one queued booking; raising marks the
+    attempt failed (requeued with backoff until BOOKING_QUEUE_MAX_ATTEMPTS).
+    """
+
+    def __init__(self, handler: Handler, workers: int = WORKERS) -> None:
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        self.processed = self.retried = self.failed = 0
+
+    def start(self) -> None:
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"booking-intake-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def wake(self) -> None:
+        """A booking was just queued: skip the rest of the idle poll."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.process_one()
+            except Exception:
+                busy = False  # DB down: back off like an empty queue
+            if not busy:
+                self._wake.wait(POLL_SEC)
+                self._wake.clear()
+                self._maybe_prune()
+
+    def process_one(self) -> bool:
+        """Claim and run one booking; False when nothing was ready."""
+        item = claim_next()
+        if item is None:
+            return False
+        job_id = int(item["job_id"])
+        try:
+            state = self.handler(dict(item["state"]))
+        except Exception as e:
+            status = fail(job_id, f"{e.__class__.__name__}: {e}")
+            with self._lock:
+                if status == "failed":
+                    self.failed += 1
+                else:
+                    self.retried += 1
+            return True
+        complete(job_id, state)
+        with self._lock:
+            self.processed += 1
+        return True
+
+    def _maybe_prune(self) -> None:
+        with self._lock:
+            due = time.time() - self._pruned_at > PRUNE_EVERY_SEC
+            if due:
+                self._pruned_at = time.time()
+        if due:
+            try:
+                prune()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": len(self._threads), "processed": self.processed,
+                    "retried": self.retried, "failed": self.failed}
+
+
+# ----------------------------
+# Shared instance (API process)
+# ----------------------------
+
+_workers: Optional[IntakeWorkers] = None
+_workers_lock = threading.Lock()
+
+
+def start_workers(handler: Handler, workers: int = WORKERS) -> Optional[IntakeWorkers]:
+    """Start this process's workers once; None when workers <= 0."""
+    global _workers
+    if workers <= 0:
+        return None
+    with _workers_lock:
+        if _workers is None:
+            _workers = IntakeWorkers(handler, workers)
+            _workers.start()
+    return _workers
+
+
+def stop_workers() -> None:
+    global _workers
+    with _workers_lock:
+        if _workers is not None:
+            _workers.stop()
+            _workers = None
+
+
+def wake() -> None:
+    if _workers is not None:
+        _workers.wake()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else max(1, WORKERS)
+    from routes.book import dispatch_queued
+    pool = IntakeWorkers(dispatch_queued, n)
+    pool.start()
+    print(f"booking intake: {n} workers, polling every {POLL_SEC}s (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(60)
+            print(pool.stats())
+    except KeyboardInterrupt:
+        pool.stop()
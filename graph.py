@@ -5,43 +5,59 @@
 # - Uses dict-based state (BookingState) for LangGraph compatibility
 # - Avoids name collision with FastAPI's `app` by exporting `booking_graph`
 # - Optional dispatch: skip if `task == "estimate_fare"`
+# - `abooking_graph` is the same graph over the async node twins
+#   (run with `run_booking_flow_async`, i.e. LangGraph ainvoke)
+# - `commit_graph` / `acommit_graph`: dispatch step is commit_dispatch,
+#   which also inserts the job (BOOKING_COMMIT=single, db/booking_commit.py)
+# - BOOKING_GRAPH_EXECUTOR=direct runs the same nodes and routing as plain
+#   calls (DirectGraph) with the same resulting states, without LangGraph's
+#   per-step channel machinery or its import (benchmarks/bench_graph_executor.py)
 # -------------------------------------------------------------
 
 from __future__ import annotations
 
+import inspect
 import sys
 import os
-from typing import Dict, Any
+from typing import Dict, Any, FrozenSet
 
 # Ensure relative imports work when launched from project root
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from state import BookingState
 from nodes.generate_booking import generate_booking
-from nodes.explain_fare import explain_fare_fn
+from nodes.explain_fare import explain_fare_fn, explain_fare_fn_async
 
 # Dispatcher may not be available in early dev. Fail-soft with a no-op.
 try:
-    from dispatch.dispatcher import dispatch_booking
+    from dispatch.dispatcher import (
+        commit_dispatch,
+        commit_dispatch_async,
+        dispatch_booking,
+        dispatch_booking_async,
+    )
 except Exception:
     def dispatch_booking(state: Dict[str, Any]) -> Dict[str, Any]:
         # No-op dispatch fallback, keeps graph functional in dev
         return {**state, "dispatch_info": state.get("dispatch_info", "pending (dev-noop)")}
 
-from langgraph.graph import StateGraph, END
+    async def dispatch_booking_async(state: Dict[str, Any]) -> Dict[str, Any]:
+        return dispatch_booking(state)
 
-# -----------------------------
-# Build the graph
-# -----------------------------
-graph = StateGraph(BookingState)
+    commit_dispatch, commit_dispatch_async = dispatch_booking, dispatch_booking_async
+
+EXECUTOR = os.getenv("BOOKING_GRAPH_EXECUTOR", "langgraph").lower()
+
+if EXECUTOR == "direct":
+    END = "__end__"  # = langgraph.graph.END; not imported, so cold start skips LangGraph
+else:
+    from langgraph.graph import StateGraph, END
 
-# Register nodes (functions must accept & return dict-like state)
-graph.add_node("generate_booking", generate_booking)
-graph.add_node("explain_fare", explain_fare_fn)
-graph.add_node("dispatch", dispatch_booking)
 
-# Static linear edges up to explain
-graph.add_edge("generate_booking", "explain_fare")
+async def generate_booking_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    # Pure string formatting; async only so ainvoke doesn't hop to a thread for it
+    return generate_booking(state)
+
 
 # Conditional edge after explanation:
 # If task == "estimate_fare", end early (no dispatch).
@@ -50,20 +66,86 @@ def decide_after_explain(state: BookingState) -> str:
     task = (state.get("task") or "").strip().lower()
     return END if task == "estimate_fare" else "dispatch"
 
-graph.add_conditional_edges(
-    "explain_fare",
-    decide_after_explain,
-    {
-        END: END,             # stop here if just estimating
-        "dispatch": "dispatch"
-    }
-)
 
-# Entry point
-graph.set_entry_point("generate_booking")
+# -----------------------------
+# Direct executor
+# -----------------------------
+_STATE_KEYS: FrozenSet[str] = BookingState.__required_keys__ | BookingState.__optional_keys__
+
+
+def _merge(state: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    # LangGraph semantics for a TypedDict state without reducers: every
+    # BookingState key a node returns overwrites the channel, others are dropped
+    for k, v in update.items():
+        if k in _STATE_KEYS:
+            state[k] = v
+    return state
+
+
+class DirectGraph:
+    """
+    generate_booking -> explain_fare -> [dispatch | end] as plain calls.
+    Same contract as the compiled StateGraph: invoke()/ainvoke() take and
+    return a BookingState, each node gets its own copy of the state.
+    """
+
+    def __init__(self, generate, explain, dispatch) -> None:
+        self.nodes = {"generate_booking": generate, "explain_fare": explain, "dispatch": dispatch}
+
+    def invoke(self, state: BookingState) -> BookingState:
+        out = _merge({}, state)
+        out = _merge(out, self.nodes["generate_booking"](dict(out)))
+        out = _merge(out, self.nodes["explain_fare"](dict(out)))
+        if decide_after_explain(out) == "dispatch":
+            out = _merge(out, self.nodes["dispatch"](dict(out)))
+        return out
+
+    async def ainvoke(self, state: BookingState) -> BookingState:
+        out = _merge({}, state)
+        for name in ("generate_booking", "explain_fare", "dispatch"):
+            if name == "dispatch" and decide_after_explain(out) != "dispatch":
+                break
+            res = self.nodes[name](dict(out))
+            out = _merge(out, await res if inspect.isawaitable(res) else res)
+        return out
+
+
+# -----------------------------
+# Build the graph
+# -----------------------------
+def _build_graph(generate, explain, dispatch, executor: str = EXECUTOR):
+    if executor == "direct":
+        return DirectGraph(generate, explain, dispatch)
+
+    graph = StateGraph(BookingState)
+
+    # Register nodes (functions must accept & return dict-like state)
+    graph.add_node("generate_booking", generate)
+    graph.add_node("explain_fare", explain)
+    graph.add_node("dispatch", dispatch)
+
+    # Static linear edges up to explain
+    graph.add_edge("generate_booking", "explain_fare")
+
+    graph.add_conditional_edges(
+        "explain_fare",
+        decide_after_explain,
+        {
+            END: END,             # stop here if just estimating
+            "dispatch": "dispatch"
+        }
+    )
+
+    # Entry point
+    graph.set_entry_point("generate_booking")
+    return graph.compile()
+
 
 # Compile once and export under a non-conflicting name
-booking_graph = graph.compile()
+booking_graph = _build_graph(generate_booking, explain_fare_fn, dispatch_booking)
+abooking_graph = _build_graph(generate_booking_async, explain_fare_fn_async, dispatch_booking_async)
+commit_graph = _build_graph(generate_booking, explain_fare_fn, commit_dispatch)
+acommit_graph = _build_graph(generate_booking_async, explain_fare_fn_async, commit_dispatch_async)
 
 # -----------------------------
 # Convenience wrapper for routes
@@ -79,3 +161,26 @@ def run_booking_flow(state: BookingState) -> BookingState:
     """
     # booking_graph.invoke returns the updated state dict
     return booking_graph.invoke(state)
+
+
+async def run_booking_flow_async(state: BookingState) -> BookingState:
+    """
+    Async twin of run_booking_flow (async geocoder + DB; nothing blocks the loop).
+
+    Example:
+        final_state = await run_booking_flow_async(state)
+    """
+    return await abooking_graph.ainvoke(state)
+
+
+def run_booking_commit_flow(state: BookingState) -> BookingState:
+    """
+    Booking flow for a job that is not persisted yet: the dispatch step
+    inserts it (job_id comes back on the state) together with the driver
+    reservation and the state's driver PIN, in one statement.
+    """
+    return commit_graph.invoke(state)
+
+
+async def run_booking_commit_flow_async(state: BookingState) -> BookingState:
+    return await acommit_graph.ainvoke(state)
@@ -2,38 +2,40 @@
 # --------------------------------------------------------------
 # Deterministic fare explanation (polished, rider-friendly).
 # No formulas, no debug fields. Optional LLM paraphrase is
-# supported via USE_LLM_EXPLANATION=1 but is OFF by default.
+# supported via USE_LLM_EXPLANATION=1 but is OFF by default; it is
+# cached and time-boxed (resources/llm_explain.py), falling back to
+# the template on timeout. With LLM_EXPLAIN_MODE=deferred the template
+# goes out right away and a booking's paraphrase is written to its job
+# row when ready (explanation_status: pending -> llm | template).
+# explain_fare_fn_async is the same node for the async booking graph
+# (async geocoder, awaited LLM deadline).
 # --------------------------------------------------------------
 
 from __future__ import annotations
 import os
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from resources.geo_utils import estimate_miles
+from resources.geo_utils import measure_trip, measure_trip_async, cached_latlng, cached_latlng_async
 from resources.fare_engine import calculate_base_fare
+from resources.zones import zone_of
+from resources.llm_explain import (
+    DEFERRED,
+    fare_chain,
+    cached_explanation,
+    defer_explanation,
+    llm_explanation,
+    llm_explanation_async,
+    submit_explanation,
+)
 
-# Feature flag: keep LLM OFF by default
-USE_LLM = os.getenv("USE_LLM_EXPLANATION", "0") == "1"
-
-# Optional LLM (only used if USE_LLM=1 and init succeeds)
-fare_chain = None
-if USE_LLM:
-    try:
-        from langchain_openai import ChatOpenAI
-        from langchain_core.prompts import ChatPromptTemplate
-        llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0)
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You write short, polished fare explanations for riders."),
-            ("human", "Explain in one sentence why the estimated fare from {pickup} to {dropoff} is ${fare}. Be friendly and clear, with no formulas.")
-        ])
-        fare_chain = prompt | llm
-    except Exception:
-        fare_chain = None  # fail-soft: stick with template
-
+try:
+    from db.writer import set_job_explanation
+except Exception:
+    set_job_explanation = None  # no DB: deferred paraphrases have nowhere to go
 
 def _rider_copy(pickup: str, dropoff: str, miles: float, fare: Decimal) -> str:
     """
@@ -46,33 +48,106 @@ def _rider_copy(pickup: str, dropoff: str, miles: float, fare: Decimal) -> str:
     )
 
 
-def explain_fare_fn(state: Dict[str, Any]) -> Dict[str, Any]:
+def _zone(latlng: Optional[Tuple[float, float]]) -> Optional[int]:
+    # None = endpoint not placed: no zone rules
+    return zone_of(*latlng) if latlng else None
+
+
+def _defer(job_id: Any, pickup: str, dropoff: str, fare: Decimal) -> bool:
+    # Persisted booking: paraphrase lands on the job row later. Anything
+    # else (quotes, in-memory jobs) only warms the cache for next time.
+    job_id = str(job_id or "")
+    if set_job_explanation is None or not job_id.isdigit():
+        submit_explanation(pickup, dropoff, fare)
+        return False
+    return defer_explanation(pickup, dropoff, fare, lambda text: set_job_explanation(int(job_id), text))
+
+
+def defers_to_job(state: Dict[str, Any]) -> bool:
+    """
+    Single-commit bookings (db/booking_commit.py) run this node before the
+    job exists: True when the paraphrase should be deferred onto the job
+    once it is inserted (see defer_to_job).
+    """
+    return (DEFERRED and fare_chain is not None and not state.get("fare_quoted")
+            and state.get("explanation_status") == "template")
+
+
+def defer_to_job(state: Dict[str, Any], job_id: str) -> None:
+    """Attach the (usually already running) paraphrase call to the new job."""
     pickup = (state.get("pickup_location") or "").strip()
     dropoff = (state.get("dropoff_location") or "").strip()
+    if not _defer(job_id, pickup, dropoff, Decimal(state["fare_estimate"])) and set_job_explanation:
+        set_job_explanation(int(job_id), None)  # nothing coming after all: settle on the template
+
+
+def _quoted(state: Dict[str, Any], pickup: str, dropoff: str) -> Optional[Dict[str, Any]]:
+    # Booking with a valid quote token: keep the quoted miles + fare as-is
+    if not (state.get("fare_quoted") and state.get("fare_estimate")):
+        return None
+    miles = float(state.get("estimated_miles") or 0.0)
+    return {
+        **state,
+        "estimated_miles": miles,
+        "fare_explanation": state.get("fare_explanation")
+        or _rider_copy(pickup, dropoff, miles, Decimal(state["fare_estimate"])),
+        "explanation_status": state.get("explanation_status") or "template",
+    }
+
 
-    miles = estimate_miles(pickup, dropoff)
-    fare: Decimal = calculate_base_fare(miles)
+def _price(miles: float, pickup_latlng, dropoff_latlng) -> Decimal:
+    return calculate_base_fare(miles, pickup_zone=_zone(pickup_latlng), dropoff_zone=_zone(dropoff_latlng))
 
+
+def _explained(
+    state: Dict[str, Any], pickup: str, dropoff: str, miles: float, fallback: bool, fare: Decimal,
+    llm_text: Optional[str],
+) -> Dict[str, Any]:
     # Default polished copy
     explanation = _rider_copy(pickup, dropoff, miles, fare)
 
-    # Optional LLM paraphrase (still short, no formulas)
-    if fare_chain is not None:
-        try:
-            res = fare_chain.invoke({
-                "pickup": pickup or "the pickup",
-                "dropoff": dropoff or "the destination",
-                "fare": f"{fare:.2f}",
-            })
-            text = getattr(res, "content", "") or ""
-            if text.strip():
-                explanation = text.strip()
-        except Exception:
-            pass  # keep template
+    # Optional LLM paraphrase (still short, no formulas); cached + deadline-bound,
+    # or in deferred mode only a cache read, the call itself running in the background
+    status = "template"
+    if llm_text:
+        explanation, status = llm_text, "llm"
+    elif DEFERRED and _defer(state.get("job_id"), pickup, dropoff, fare):
+        status = "pending"
 
     return {
         **state,
         "estimated_miles": float(miles),
+        "miles_fallback": fallback,         # True = FALLBACK_MILES, not a measured trip
         "fare_estimate": f"{fare:.2f}",     # string for JSON-safety
         "fare_explanation": explanation,    # rider-friendly, no formulas
+        "explanation_status": status,       # pending = paraphrase still coming (deferred mode)
     }
+
+
+def explain_fare_fn(state: Dict[str, Any]) -> Dict[str, Any]:
+    pickup = (state.get("pickup_location") or "").strip()
+    dropoff = (state.get("dropoff_location") or "").strip()
+    quoted = _quoted(state, pickup, dropoff)
+    if quoted is not None:
+        return quoted
+
+    miles, fallback, pc, dc = measure_trip(pickup, dropoff)
+    # Endpoints measure_trip didn't geocode (route memo hit) come from the caches
+    fare = _price(miles, pc or cached_latlng(pickup), dc or cached_latlng(dropoff))
+    llm_text = cached_explanation(pickup, dropoff, fare) if DEFERRED else llm_explanation(pickup, dropoff, fare)
+    return _explained(state, pickup, dropoff, miles, fallback, fare, llm_text)
+
+
+async def explain_fare_fn_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    pickup = (state.get("pickup_location") or "").strip()
+    dropoff = (state.get("dropoff_location") or "").strip()
+    quoted = _quoted(state, pickup, dropoff)
+    if quoted is not None:
+        return quoted
+
+    miles, fallback, pc, dc = await measure_trip_async(pickup, dropoff)
+    # Same, with the durable cache read off the event loop
+    fare = _price(miles, pc or await cached_latlng_async(pickup), dc or await cached_latlng_async(dropoff))
+    llm_text = cached_explanation(pickup, dropoff, fare) if DEFERRED \
+        else await llm_explanation_async(pickup, dropoff, fare)
+    return _explained(state, pickup, dropoff, miles, fallback, fare, llm_text)
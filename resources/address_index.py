@@ -0,0 +1,205 @@
+# resources/address_index.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Address autocomplete (GET /geo/suggest): riders pick strings we
+#     have already geocoded instead of free text that misses
+#
+# Sources (rebuilt every GEO_SUGGEST_REFRESH_SEC, in the background):
+#   - gazetteer place names
+#   - historical jobs.pickup_location / dropoff_location (frequency ranked)
+#   - canonical keys in the durable geocode cache (already geocoded)
+#
+# Index:
+#   - Sorted array of canonical strings, one row per word-start suffix
+#     ("123 main st" -> "123 main st", "main st", "st"), so both
+#     "123 ma" and "main" match; a prefix is a bisect range
+#   - Queries: every word but the last is canonicalized like an address;
+#     the last may still be being typed, so it also searches as the
+#     abbreviation of any suffix / directional / state it starts
+#     ("123 main stre" also looks up "123 main st")
+#   - 1-3 character prefixes (huge ranges) answer from precomputed
+#     top-k lists; longer ones rank their whole bisect range
+#   - Ranking: geocoded first, then job frequency, then shorter text
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from resources import gazetteer, geo_cache
+from resources.geo_utils import DIRECTIONALS, STATES, STREET_SUFFIXES, address_tokens, canonicalize_address
+
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+REFRESH_SEC = float(os.getenv("GEO_SUGGEST_REFRESH_SEC", "600"))
+JOB_ROWS = int(os.getenv("GEO_SUGGEST_JOB_ROWS", "50000"))
+CACHE_ROWS = int(os.getenv("GEO_SUGGEST_CACHE_ROWS", "20000"))
+
+SHORT_PREFIX = 3
+TOP_K = 20
+
+
+# Long forms canonicalization abbreviates, for completing a partial last word
+_LONG_FORMS: List[Tuple[str, str]] = sorted({**STREET_SUFFIXES, **DIRECTIONALS, **STATES}.items())
+
+
+def _prefixes(query: str) -> List[str]:
+    """Canonical prefixes to look up for a partial address (none covering another)."""
+    full = canonicalize_address(query)
+    words = address_tokens(query)
+    if not full or not words or not query[-1].isalnum():
+        return [full] if full else []  # last word is finished: a plain address
+    head, last = full.split()[:-1], words[-1]
+    tails = {full.split()[-1], last} | {abbr for long, abbr in _LONG_FORMS if long.startswith(last)}
+    out: List[str] = []
+    for p in sorted({full} | {" ".join(head + [t]) for t in tails}, key=len):
+        if not any(p.startswith(q) for q in out):
+            out.append(p)
+    return out
+
+
+class _Entry:
+    __slots__ = ("key", "text", "weight", "geocoded")
+
+    def __init__(self, key: str, text: str, weight: int, geocoded: bool) -> None:
+        self.key, self.text, self.weight, self.geocoded = key, text, weight, geocoded
+
+    def rank(self) -> int:
+        # geocoded > job frequency > shorter text, packed into one int
+        return ((1 if self.geocoded else 0) << 48) | (min(self.weight, 1 << 31) << 16) | max(0, 0xFFFF - len(self.text))
+
+
+class PrefixIndex:
+    """Immutable once built; safe to query from many threads."""
+
+    def __init__(self, entries: Iterable[_Entry]) -> None:
+        self.entries: List[_Entry] = list(entries)
+        rows: List[Tuple[str, int]] = []
+        for i, e in enumerate(self.entries):
+            words = e.key.split()
+            for w in range(len(words)):
+                rows.append((" ".join(words[w:]), i))
+        rows.sort()
+        self._keys = [r[0] for r in rows]
+        self._ids = [r[1] for r in rows]
+        self._rank = [e.rank() for e in self.entries]
+
+        # Top-k per short prefix
+        buckets: Dict[str, Dict[int, None]] = {}
+        for key, i in rows:
+            for n in range(1, SHORT_PREFIX + 1):
+                if len(key) >= n:
+                    buckets.setdefault(key[:n], {})[i] = None
+        self._short: Dict[str, List[int]] = {
+            p: heapq.nlargest(TOP_K, ids, key=self._rank.__getitem__)
+            for p, ids in buckets.items()
+        }
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _matches(self, prefix: str) -> Iterable[int]:
+        if len(prefix) <= SHORT_PREFIX:
+            return self._short.get(prefix, [])
+        # Ranked over the whole range: a popular address sorting late must still win
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        return self._ids[lo:hi]
+
+    def search(self, query: str, limit: int = 8) -> List[_Entry]:
+        ids = set()
+        for prefix in _prefixes(query):
+            ids.update(self._matches(prefix))
+        best = heapq.nlargest(limit, ids, key=self._rank.__getitem__)
+        return [self.entries[i] for i in best]
+
+
+# ----------------------------
+# Building from our data
+# ----------------------------
+
+def _job_addresses(limit: int) -> List[str]:
+    if get_conn is None:
+        return []
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT pickup_location, dropoff_location
+                FROM jobs ORDER BY id DESC LIMIT %s
+                """,
+                (limit,),
+            )
+            return [a for row in cur.fetchall() for a in row if a]
+    except Exception:
+        return []
+
+
+def build_index() -> PrefixIndex:
+    """Collect every source into a fresh index. Never raises."""
+    # canonical key -> {raw spelling: count}
+    spellings: Dict[str, Dict[str, int]] = {}
+    for raw in _job_addresses(JOB_ROWS):
+        text = " ".join(raw.split())
+        key = canonicalize_address(text)
+        if key:
+            counts = spellings.setdefault(key, {})
+            counts[text] = counts.get(text, 0) + 1
+
+    geocoded = set(geo_cache.recent_keys(CACHE_ROWS))
+    for name in gazetteer.place_names():
+        key = canonicalize_address(name)
+        if key:
+            geocoded.add(key)
+            spellings.setdefault(key, {}).setdefault(name, 0)
+    for key in geocoded:
+        spellings.setdefault(key, {})
+
+    entries = []
+    for key, counts in spellings.items():
+        # Most common rider spelling is the display text; bare cache keys show as-is
+        text = max(counts, key=lambda t: (counts[t], t)) if counts else key
+        entries.append(_Entry(key, text, sum(counts.values()), key in geocoded))
+    return PrefixIndex(entries)
+
+
+_index: Optional[PrefixIndex] = None
+_build_lock = threading.Lock()
+
+
+def _refresh() -> None:
+    global _index
+    try:
+        _index = build_index()
+    finally:
+        _build_lock.release()
+
+
+def get_index() -> PrefixIndex:
+    """
+    Current index. The first call builds synchronously; afterwards a stale
+    index keeps serving while one background thread rebuilds it.
+    """
+    global _index
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _index = build_index()
+        return _index
+    if time.time() - _index.built_at > REFRESH_SEC and _build_lock.acquire(blocking=False):
+        threading.Thread(target=_refresh, name="address-index", daemon=True).start()
+    return _index
+
+
+def suggest(query: str, limit: int = 8) -> List[Dict[str, object]]:
+    """Suggestions for a partial address: [{text, geocoded}], best first."""
+    return [{"text": e.text, "geocoded": e.geocoded} for e in get_index().search(query, limit)]
@@ -0,0 +1,266 @@
+# resources/eta_engine.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Pickup ETA (driver position -> pickup) for dispatch, replacing
+#     the hardcoded / random placeholders
+#
+# Model:
+#   - Pace table: seconds-per-mile per (zone, hour-of-week), zones from
+#     resources/zones.py, hours in SERVICE_TZ (Mon 00:00 = 0 .. 167)
+#   - Learned from our own driver traces (`locations`, role = 'driver'):
+#     consecutive fixes of one PIN become (miles, seconds) samples, summed
+#     per cell; sparse cells are shrunk toward the hour's city-wide pace
+#     scaled by the zone's overall factor (ETA_PRIOR_MILES pseudo-miles)
+#   - ETA = trip miles x mean pace of the two end zones + ETA_OVERHEAD_SEC;
+#     trip miles are the drive miles when the caller has them (road model),
+#     else straight-line x ETA_CIRCUITY
+#
+# Hot path:
+#   - Precomputed table held as nested lists + pure-Python haversine, so
+#     one ETA is a few microseconds (no NumPy scalar overhead)
+#
+# Build / refresh the table (reads Postgres, writes ETA_PROFILE_PATH):
+#   python -m resources.eta_engine build [--days 28]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from resources import zones
+from resources.geo_distance import MEAN_RADIUS_MI
+
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+PROFILE_PATH = os.getenv("ETA_PROFILE_PATH", "resources/data/eta_profiles.npz")
+SERVICE_TZ = ZoneInfo(os.getenv("SERVICE_TZ", "America/Chicago"))
+DEFAULT_MPH = float(os.getenv("ETA_DEFAULT_MPH", "28"))
+CIRCUITY = float(os.getenv("ETA_CIRCUITY", "1.3"))
+OVERHEAD_SEC = float(os.getenv("ETA_OVERHEAD_SEC", "60"))
+PRIOR_MILES = float(os.getenv("ETA_PRIOR_MILES", "5"))
+TYPICAL_PICKUP_MI = float(os.getenv("ETA_TYPICAL_PICKUP_MI", "3"))
+LEARN_DAYS = int(os.getenv("ETA_LEARN_DAYS", "28"))
+
+HOURS_PER_WEEK = 168
+
+# Trace samples outside these bounds are GPS noise or parked drivers
+MIN_SAMPLE_SEC, MAX_SAMPLE_SEC = 5, 300
+MIN_SAMPLE_MPH, MAX_SAMPLE_MPH = 1.0, 90.0
+
+
+def hour_of_week(ts: Optional[float] = None) -> int:
+    """0..167 in SERVICE_TZ, Monday 00:00 = 0."""
+    dt = datetime.fromtimestamp(time.time() if ts is None else ts, SERVICE_TZ)
+    return dt.weekday() * 24 + dt.hour
+
+
+def _haversine_mi(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    la, lb = math.radians(a[0]), math.radians(b[0])
+    h = math.sin((lb - la) / 2.0) ** 2 + math.cos(la) * math.cos(lb) * math.sin(
+        math.radians(b[1] - a[1]) / 2.0) ** 2
+    return 2.0 * MEAN_RADIUS_MI * math.asin(min(1.0, math.sqrt(h)))
+
+
+class SpeedProfiles:
+    """
+    Pace lookup table, shape (zones.N_ZONES + 1, 168), seconds per mile.
+    """
+
+    def __init__(self, pace: np.ndarray, miles: Optional[np.ndarray] = None) -> None:
+        self.pace = np.asarray(pace, dtype=float)
+        self.miles = np.zeros_like(self.pace) if miles is None else np.asarray(miles, dtype=float)
+        self._rows = self.pace.tolist()
+
+    @classmethod
+    def flat(cls, mph: float = DEFAULT_MPH) -> "SpeedProfiles":
+        return cls(np.full((zones.N_ZONES + 1, HOURS_PER_WEEK), 3600.0 / mph))
+
+    @classmethod
+    def from_samples(cls, zone, how, miles, seconds, prior_miles: float = PRIOR_MILES) -> "SpeedProfiles":
+        """
+        Build from per-sample (or pre-summed) arrays: zone id, hour-of-week,
+        miles, seconds.
+        """
+        shape = (zones.N_ZONES + 1, HOURS_PER_WEEK)
+        zone = np.asarray(zone, dtype=np.int64)
+        how = np.asarray(how, dtype=np.int64)
+        mi = np.zeros(shape)
+        sec = np.zeros(shape)
+        np.add.at(mi, (zone, how), np.asarray(miles, dtype=float))
+        np.add.at(sec, (zone, how), np.asarray(seconds, dtype=float))
+
+        default = 3600.0 / DEFAULT_MPH
+        # City-wide pace per hour (prior), then each zone's overall factor vs the city
+        hour_mi, hour_sec = mi.sum(axis=0), sec.sum(axis=0)
+        hour_pace = (hour_sec + prior_miles * default) / (hour_mi + prior_miles)
+        expected = (mi * hour_pace[None, :]).sum(axis=1)
+        zone_factor = (sec.sum(axis=1) + prior_miles * default) / (expected + prior_miles * default)
+        prior = hour_pace[None, :] * zone_factor[:, None]
+        pace = (sec + prior_miles * prior) / (mi + prior_miles)
+        return cls(pace, mi)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SpeedProfiles"]:
+        """Load a saved table; None if missing or built for a different zoning."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as z:
+            if tuple(z["bbox"]) != (zones.LAT0, zones.LAT1, zones.LNG0, zones.LNG1) \
+                    or float(z["cell_deg"]) != zones.CELL_DEG:
+                return None
+            return cls(z["pace"], z["miles"])
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            pace=self.pace.astype(np.float32),
+            miles=self.miles.astype(np.float32),
+            bbox=np.array([zones.LAT0, zones.LAT1, zones.LNG0, zones.LNG1]),
+            cell_deg=np.array(zones.CELL_DEG),
+        )
+
+    def pace_at(self, zone: int, how: int) -> float:
+        return self._rows[zone][how]
+
+    def eta_seconds(
+        self,
+        origin: Tuple[float, float],
+        dest: Tuple[float, float],
+        miles: Optional[float] = None,
+        how: Optional[int] = None,
+    ) -> float:
+        """Seconds from origin to dest (lat, lng); `miles` = known drive miles."""
+        if miles is None:
+            miles = _haversine_mi(origin, dest) * CIRCUITY
+        h = hour_of_week() if how is None else how
+        pace = (self._rows[zones.zone_of(*origin)][h] + self._rows[zones.zone_of(*dest)][h]) / 2.0
+        return miles * pace + OVERHEAD_SEC
+
+    def stats(self) -> Dict[str, float]:
+        observed = self.miles > 0
+        return {
+            "zones": zones.N_ZONES,
+            "observed_cells": int(observed.sum()),
+            "observed_miles": round(float(self.miles.sum()), 1),
+            "median_mph": round(float(3600.0 / np.median(self.pace)), 1),
+        }
+
+
+# ----------------------------
+# Learning from `locations`
+# ----------------------------
+
+_SAMPLES_SQL = """
+    WITH fixes AS (
+        SELECT "timestamp" AS ts, location,
+               LAG(location)    OVER w AS prev_loc,
+               LAG("timestamp") OVER w AS prev_ts
+        FROM locations
+        WHERE role = 'driver' AND "timestamp" >= now() - make_interval(days => %(days)s)
+        WINDOW w AS (PARTITION BY pin ORDER BY "timestamp")
+    ),
+    legs AS (
+        SELECT ts, location,
+               ST_Distance(location::geography, prev_loc::geography) / 1609.344 AS miles,
+               extract(epoch FROM ts - prev_ts) AS secs
+        FROM fixes
+        WHERE prev_ts IS NOT NULL
+    )
+    SELECT floor((ST_Y(location) - %(lat0)s) / %(cell)s)::int AS r,
+           floor((ST_X(location) - %(lng0)s) / %(cell)s)::int AS c,
+           ((extract(isodow FROM ts AT TIME ZONE %(tz)s)::int - 1) * 24
+             + extract(hour FROM ts AT TIME ZONE %(tz)s)::int) AS how,
+           sum(miles), sum(secs)
+    FROM legs
+    WHERE secs BETWEEN %(min_sec)s AND %(max_sec)s
+      AND miles * 3600.0 / secs BETWEEN %(min_mph)s AND %(max_mph)s
+    GROUP BY 1, 2, 3
+"""
+
+
+def learn_profiles(days: int = LEARN_DAYS) -> SpeedProfiles:
+    """Aggregate the last `days` of driver traces into a pace table."""
+    params = {
+        "days": days, "lat0": zones.LAT0, "lng0": zones.LNG0, "cell": zones.CELL_DEG,
+        "tz": str(SERVICE_TZ.key), "min_sec": MIN_SAMPLE_SEC, "max_sec": MAX_SAMPLE_SEC,
+        "min_mph": MIN_SAMPLE_MPH, "max_mph": MAX_SAMPLE_MPH,
+    }
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_SAMPLES_SQL, params)
+        rows = cur.fetchall() or []
+    if not rows:
+        return SpeedProfiles.flat()
+    r, c, how, mi, sec = (np.array(col, dtype=float) for col in zip(*rows))
+    inside = (r >= 0) & (r < zones.ROWS) & (c >= 0) & (c < zones.COLS)
+    zone = np.where(inside, r * zones.COLS + c, zones.OUTSIDE_ZONE).astype(np.int64)
+    return SpeedProfiles.from_samples(zone, how.astype(np.int64), mi, sec)
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+
+_profiles: Optional[SpeedProfiles] = None
+_lock = threading.Lock()
+
+
+def get_profiles() -> SpeedProfiles:
+    """Table from ETA_PROFILE_PATH (loaded once), else a flat ETA_DEFAULT_MPH table."""
+    global _profiles
+    if _profiles is None:
+        with _lock:
+            if _profiles is None:
+                try:
+                    _profiles = SpeedProfiles.load(PROFILE_PATH) or SpeedProfiles.flat()
+                except Exception:
+                    _profiles = SpeedProfiles.flat()
+    return _profiles
+
+
+def set_profiles(profiles: Optional[SpeedProfiles]) -> None:
+    """Install a table (after a rebuild); None reloads from disk on next use."""
+    global _profiles
+    with _lock:
+        _profiles = profiles
+
+
+def eta_minutes(
+    origin: Tuple[float, float],
+    dest: Tuple[float, float],
+    miles: Optional[float] = None,
+) -> int:
+    """Whole minutes (>= 1) from origin to dest (lat, lng) at the current hour."""
+    return max(1, int(math.ceil(get_profiles().eta_seconds(origin, dest, miles) / 60.0)))
+
+
+def typical_eta_minutes(pickup: Optional[Tuple[float, float]] = None) -> int:
+    """
+    ETA when the driver's position is unknown: ETA_TYPICAL_PICKUP_MI at the
+    pickup zone's current pace (city-wide pace without a pickup point).
+    """
+    p = get_profiles()
+    zone = zones.zone_of(*pickup) if pickup else zones.OUTSIDE_ZONE
+    seconds = TYPICAL_PICKUP_MI * p.pace_at(zone, hour_of_week()) + OVERHEAD_SEC
+    return max(1, int(math.ceil(seconds / 60.0)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("usage: python -m resources.eta_engine build [--days N]")
+        sys.exit(2)
+    days = int(sys.argv[sys.argv.index("--days") + 1]) if "--days" in sys.argv else LEARN_DAYS
+    prof = learn_profiles(days)
+    prof.save(PROFILE_PATH)
+    print(f"{prof.stats()} -> {PROFILE_PATH}")
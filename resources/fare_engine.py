@@ -1,28 +1,206 @@
 # resources/fare_engine.py
 # --------------------------------------------------------------
 # Money-safe fare calculation using Decimal to avoid float issues.
-# Rates are env-driven with sensible defaults.
+# Rates are env-driven with sensible defaults; time bands, zone
+# multipliers/fees, airport fees and a minimum fare come from the
+# hot-reloaded rule set in resources/fare_rules.py (env rates alone
+# when no rules are configured), and the live per-zone surge from
+# resources/surge.py multiplies the per-mile rate by pickup zone.
+# Batch pricing (fare_cents_array / calculate_base_fare_batch) gives the
+# same results in integer cents with NumPy; see benchmarks/bench_fare.py.
 # --------------------------------------------------------------
 
 from __future__ import annotations
 
 import os
 from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from resources import zones
+from resources.eta_engine import hour_of_week
+from resources.fare_rules import RuleSet, RuleStore, value_levels
+from resources.surge import get_board, surge_multiplier
 
 # Read from env with sane defaults (strings → Decimal)
 BASE_FARE = Decimal(os.getenv("FARE_BASE", "3.00"))
 PER_MILE  = Decimal(os.getenv("FARE_PER_MILE", "4.00"))
 MULTIPLIER = Decimal(os.getenv("FARE_MULTIPLIER", "0.70"))  # dynamic pricing factor
+ONE       = Decimal("1")
+
+# Rule file / table overrides on top of the env rates
+_rules = RuleStore(BASE_FARE, PER_MILE, MULTIPLIER)
+
+
+def current_rules() -> RuleSet:
+    """The rule set in effect right now (re-checked every FARE_RULES_CHECK_SEC)."""
+    return _rules.current()
+
+
+def reload_rules() -> RuleSet:
+    """Re-read the rule source immediately (e.g. right after publishing rules)."""
+    return _rules.reload()
+
+
+def rules_stats() -> Dict[str, object]:
+    return {**current_rules().describe(), "reloads": _rules.reloads, "errors": _rules.errors}
 
 def _money(d: Decimal) -> Decimal:
     # Normalize to 2 decimals with bankers' rounding style common to USD
     return d.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-def calculate_base_fare(miles: float) -> Decimal:
+def _to_miles(miles) -> Decimal:
     # Guard: negative or NaN miles → treat as 0
     try:
-        m = Decimal(str(max(0.0, float(miles))))
+        return Decimal(str(max(0.0, float(miles))))
     except Exception:
-        m = Decimal("0")
-    fare = BASE_FARE + (m * PER_MILE * MULTIPLIER)
-    return _money(fare)
+        return Decimal("0")
+
+def _fare(rules: RuleSet, m: Decimal, how: int, pickup_zone: int, dropoff_zone: int,
+          surge: Decimal = ONE) -> Decimal:
+    if rules.trivial and surge == ONE:
+        return _money(rules.base + (m * rules.per_mile * rules.multiplier))
+    return rules.price(m, how, pickup_zone, dropoff_zone, surge)
+
+def dynamic_factor(pickup_zone: int, when: Optional[float] = None) -> Decimal:
+    """Time band x surge for a pickup zone right now (1 = static pricing)."""
+    rules = current_rules()
+    band = ONE if rules.trivial else rules.time_mult[hour_of_week(when)]
+    return band * surge_multiplier(pickup_zone)
+
+def calculate_base_fare(
+    miles: float,
+    *,
+    when: Optional[float] = None,
+    pickup_zone: Optional[int] = None,
+    dropoff_zone: Optional[int] = None,
+) -> Decimal:
+    """
+    Fare for `miles` under the current rules. `when` (epoch seconds, default
+    now) picks the time band; zones (resources/zones.py ids) pick zone and
+    airport rules, and unknown zones get none. The pickup zone's current
+    surge applies whatever `when` is.
+    """
+    rules = current_rules()
+    how = 0 if rules.trivial else hour_of_week(when)
+    out = zones.OUTSIDE_ZONE
+    return _fare(
+        rules, _to_miles(miles), how,
+        out if pickup_zone is None else pickup_zone,
+        out if dropoff_zone is None else dropoff_zone,
+        surge_multiplier(pickup_zone),
+    )
+
+# ----------------------------
+# Batch pricing (integer cents)
+# ----------------------------
+# Same result as calculate_base_fare for every input, computed as exact
+# integer arithmetic: miles are taken in micro-miles (the decimal value of
+# repr(float) whenever it has <= 6 decimals, as estimate_miles' 2-decimal
+# values always do) and the rates as scaled integers, then rounded half-up
+# once. Anything that can't be represented that way (more decimals, inf,
+# int64 overflow) is priced by the scalar Decimal path instead.
+
+_MILES_DP = 6
+
+
+def _int_rates(base: Decimal, rate: Decimal):
+    """(base numerator, rate numerator, scale) so cents = (b + r * micro_miles) / scale."""
+    if not (rate.is_finite() and base.is_finite()):
+        return None
+    rate = rate.normalize()
+    r_dp = max(0, -rate.as_tuple().exponent)
+    scale = 10 ** (r_dp + _MILES_DP)
+    base_n = base * 100 * scale
+    if base_n != base_n.to_integral_value() or rate < 0:
+        return None
+    base_n, rate_n = int(base_n), int(rate.scaleb(r_dp)) * 100
+    if base_n + scale + rate_n > np.iinfo(np.int64).max:
+        return None  # rates with too many decimals for int64
+    return base_n, rate_n, scale
+
+
+def _exact_cents(miles: np.ndarray, base: Decimal, rate: Decimal, scalar) -> np.ndarray:
+    """
+    Cents for round(base + miles * rate) over an array; `scalar(m)` prices the
+    elements (or the whole array) the integer path can't represent.
+    """
+    plan = _int_rates(base, rate)
+    if plan is None:
+        return np.array([scalar(m) for m in miles], dtype=np.int64)
+    base_n, rate_n, scale = plan
+
+    # Scalar path: max(0.0, m) turns negatives and NaN into 0
+    m = np.where(np.isnan(miles) | (miles < 0), 0.0, miles)
+    limit = (np.iinfo(np.int64).max - base_n - scale) // max(rate_n, 1)
+    with np.errstate(invalid="ignore", over="ignore"):
+        micro = np.round(m * 10.0 ** _MILES_DP)
+        exact = np.isfinite(m) & (micro <= limit) & (micro / 10.0 ** _MILES_DP == m)
+    micro_i = np.where(exact, micro, 0.0).astype(np.int64)
+
+    cents = (base_n + rate_n * micro_i + scale // 2) // scale
+    for i in np.flatnonzero(~exact):
+        cents[i] = scalar(miles[i])
+    return cents
+
+
+def fare_cents_array(
+    miles,
+    pickup_zones=None,
+    dropoff_zones=None,
+    when: Optional[float] = None,
+    *,
+    dynamic: bool = True,
+) -> np.ndarray:
+    """
+    Vectorized calculate_base_fare: fare in integer cents (int64), identical
+    to int(calculate_base_fare(m, when=..., pickup_zone=..., dropoff_zone=...) * 100)
+    for each element. Zones are arrays aligned with `miles` (default: none);
+    `dynamic=False` prices as if no time band or surge applied.
+    """
+    miles = np.asarray(miles, dtype=float).ravel()
+    rules = current_rules()
+    board = get_board()
+    surging = dynamic and board.active and pickup_zones is not None
+    if rules.trivial and not surging:
+        return _exact_cents(
+            miles, rules.base, rules.per_mile * rules.multiplier,
+            lambda m: int(_fare(rules, _to_miles(m), 0, zones.OUTSIDE_ZONE, zones.OUTSIDE_ZONE) * 100),
+        )
+
+    n = miles.size
+    zp = np.full(n, zones.OUTSIDE_ZONE, dtype=np.int64) if pickup_zones is None \
+        else np.asarray(pickup_zones, dtype=np.int64).ravel()
+    zd = np.full(n, zones.OUTSIDE_ZONE, dtype=np.int64) if dropoff_zones is None \
+        else np.asarray(dropoff_zones, dtype=np.int64).ravel()
+    time_mult = rules.time_mult[hour_of_week(when)] if dynamic and not rules.trivial else ONE
+    surge_levels, surge_class = value_levels(board.multiplier if surging else [ONE] * (zones.N_ZONES + 1))
+
+    # One exact integer pass per distinct (pickup, surge, dropoff) multiplier
+    # triple; zone rules and surge only take a handful of distinct values
+    n_s, n_d = len(surge_levels), len(rules.dropoff_levels)
+    group = (rules.pickup_class[zp] * n_s + surge_class[zp]) * n_d + rules.dropoff_class[zd]
+    order = np.argsort(group, kind="stable")
+    keys, starts = np.unique(group[order], return_index=True)
+    cents = np.empty(n, dtype=np.int64)
+    for key, rows in zip(keys.tolist(), np.split(order, starts[1:])):
+        ps, d = divmod(key, n_d)
+        p, s = divmod(ps, n_s)
+        rate = (rules.per_mile * rules.multiplier * time_mult
+                * rules.pickup_levels[p] * surge_levels[s] * rules.dropoff_levels[d])
+        cents[rows] = _exact_cents(
+            miles[rows], rules.base, rate,
+            lambda m: int(_money(rules.base + _to_miles(m) * rate) * 100),
+        )
+    cents += rules.pickup_fee_cents[zp] + rules.dropoff_fee_cents[zd]
+    return np.maximum(cents, int(rules.minimum * 100))
+
+
+def calculate_base_fare_batch(
+    miles, pickup_zones=None, dropoff_zones=None, when: Optional[float] = None
+) -> List[Decimal]:
+    """
+    Batch twin of calculate_base_fare: one Decimal fare per input, same values.
+    """
+    return [Decimal(int(c)).scaleb(-2) for c in fare_cents_array(miles, pickup_zones, dropoff_zones, when)]
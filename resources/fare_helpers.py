@@ -1,14 +1,77 @@
 # resources/fare_helpers.py
 # Single source of truth for fare quotes used by both /fare/estimate (GET)
-# and /quote (POST). Keeps wording consistent with bookings.
+# and /quote (POST), plus the batch variant behind /quote/batch.
+# Keeps wording consistent with bookings.
+# Fast mode answers from the precomputed zone matrix (resources/zone_matrix.py)
+# for addresses already in the geocode caches; anything else takes the exact path.
 
 from __future__ import annotations
-from typing import Dict, Any
+import os
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 # Reuse the same node that bookings use (computes miles + fare + explanation)
-from nodes.explain_fare import explain_fare_fn
+from nodes.explain_fare import explain_fare_fn, _rider_copy
+from resources.fare_engine import fare_cents_array
+from resources.geo_utils import (
+    FALLBACK_MILES, cached_latlng, canonicalize_address, iter_resolved, pair_miles,
+)
+from resources.quote_token import issue_quote_token
+from resources.zone_matrix import get_zone_matrix
+from resources.zones import OUTSIDE_ZONE, zone_of
+
+# Default for the `fast` flag on /fare/estimate and /quote
+FAST_QUOTE_DEFAULT = os.getenv("FAST_QUOTE_DEFAULT", "0") == "1"
+
+
+def _with_token(quote: Dict[str, Any], pc, dc) -> Dict[str, Any]:
+    """
+    Attach a signed quote token (/book/ride reuses the quote instead of
+    recomputing it) when both endpoints were placed and tokens are enabled.
+    """
+    if pc and dc and quote.get("fare_estimate"):
+        issued = issue_quote_token(
+            quote["pickup_location"], quote["dropoff_location"], pc, dc,
+            quote["estimated_miles"], quote["fare_estimate"],
+        )
+        if issued is not None:
+            quote["quote_token"], quote["quote_expires_at"] = issued
+    return quote
 
-def get_fare_quote(pickup: str, dropoff: str) -> Dict[str, Any]:
+
+def _fast_quote(pickup: str, dropoff: str) -> Optional[Dict[str, Any]]:
+    """
+    Zone-matrix quote: cached coordinates only (memory, gazetteer, durable
+    cache; never OSM) + two array reads. None when the matrix is unavailable,
+    an address isn't cached yet or is outside the zones, or both addresses are
+    the same: the exact path prices those (and warms the cache for next time).
+    """
+    matrix = get_zone_matrix()
+    if matrix is None:
+        return None
+    pk, dk = canonicalize_address(pickup), canonicalize_address(dropoff)
+    if not pk or not dk or pk == dk:
+        return None
+    pc, dc = cached_latlng(pickup), cached_latlng(dropoff)
+    if not pc or not dc:
+        return None
+    hit = matrix.lookup(pc, dc)
+    if hit is None:
+        return None
+    miles, fare = hit
+    return _with_token({
+        "pickup_location": pickup,
+        "dropoff_location": dropoff,
+        "estimated_miles": miles,
+        "fare_estimate": f"{fare:.2f}",
+        "fare_explanation": _rider_copy(pickup, dropoff, miles, fare),
+        "quote_mode": "zone",
+    }, pc, dc)
+
+
+def get_fare_quote(pickup: str, dropoff: str, fast: bool = False) -> Dict[str, Any]:
     """
     Return a normalized fare quote payload:
       - pickup_location
@@ -16,16 +79,129 @@ def get_fare_quote(pickup: str, dropoff: str) -> Dict[str, Any]:
       - estimated_miles (float)
       - fare_estimate (string money, e.g. "40.52")
       - fare_explanation (polished, no formulas)
+      - quote_token / quote_expires_at (when the miles were measured, not
+        the FALLBACK_MILES default; pass the token to /book/ride to book
+        at this fare)
+    With `fast`, answer from the zone matrix when possible (adds
+    quote_mode="zone"); otherwise fall through to the exact quote.
     """
+    if fast:
+        quote = _fast_quote((pickup or "").strip(), (dropoff or "").strip())
+        if quote is not None:
+            return quote
+
     state = {
         "pickup_location": (pickup or "").strip(),
         "dropoff_location": (dropoff or "").strip(),
     }
     out = explain_fare_fn(state)
-    return {
+    quote = {
         "pickup_location": state["pickup_location"],
         "dropoff_location": state["dropoff_location"],
         "estimated_miles": out.get("estimated_miles"),
         "fare_estimate": out.get("fare_estimate"),
         "fare_explanation": out.get("fare_explanation"),
     }
+    if out.get("miles_fallback", True):
+        return quote  # priced on the default miles: nothing worth signing
+    # explain_fare_fn just resolved both addresses, so these are cache reads
+    return _with_token(quote, cached_latlng(state["pickup_location"]), cached_latlng(state["dropoff_location"]))
+
+
+# --------------------------------------------------------------
+# Batch quotes (POST /quote/batch)
+# Geocode each unique address once and stream every pair out as soon as
+# both its addresses are resolved: miles come from the same pair_miles as
+# single quotes, fares are priced with array math per ready group, and
+# the copy is the same template as single quotes.
+# --------------------------------------------------------------
+
+# How long a batch keeps waiting on cold lookups (Nominatim allows ~1/s)
+BATCH_DEADLINE_SEC = float(os.getenv("QUOTE_BATCH_DEADLINE_SEC", "120"))
+
+
+def iter_fare_quotes_batch(
+    pairs: List[Tuple[str, str]], explain: bool = True, deadline_sec: float = BATCH_DEADLINE_SEC
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one quote payload per (pickup, dropoff) pair as soon as both of
+    its addresses are resolved (completion order; `index` is the input
+    position), with the same fields as `get_fare_quote` plus:
+      - resolved: both addresses were placed
+      - fallback: miles are FALLBACK_MILES because one wasn't (not found,
+        or still unresolved after `deadline_sec`)
+    """
+    n = len(pairs)
+    pickups = [(p or "").strip() for p, _ in pairs]
+    dropoffs = [(d or "").strip() for _, d in pairs]
+    pkeys = [canonicalize_address(a) for a in pickups]
+    dkeys = [canonicalize_address(a) for a in dropoffs]
+
+    # key -> pairs waiting on it; a pair is ready once both keys are reported
+    waiting: Dict[str, List[int]] = {}
+    missing = [0] * n
+    for i in range(n):
+        for key in {pkeys[i], dkeys[i]}:
+            if key:
+                waiting.setdefault(key, []).append(i)
+                missing[i] += 1
+
+    coords: Dict[str, Optional[Tuple[float, float]]] = {}
+    ready = [i for i in range(n) if missing[i] == 0]  # blank addresses
+    yield from _price_group(ready, pickups, dropoffs, pkeys, dkeys, coords, explain)
+    for key, latlng in iter_resolved(pickups + dropoffs, deadline_sec):
+        coords[key] = latlng
+        ready = []
+        for i in waiting.pop(key, ()):
+            missing[i] -= 1
+            if missing[i] == 0:
+                ready.append(i)
+        yield from _price_group(ready, pickups, dropoffs, pkeys, dkeys, coords, explain)
+
+
+def _price_group(
+    idx: List[int],
+    pickups: List[str],
+    dropoffs: List[str],
+    pkeys: List[str],
+    dkeys: List[str],
+    coords: Dict[str, Optional[Tuple[float, float]]],
+    explain: bool,
+) -> Iterator[Dict[str, Any]]:
+    if not idx:
+        return
+    k = len(idx)
+    miles = np.full(k, FALLBACK_MILES)
+    resolved = np.zeros(k, dtype=bool)
+    # Zone rules (airport fees, ...) apply wherever an endpoint was placed
+    pickup_zones = np.full(k, OUTSIDE_ZONE, dtype=np.int64)
+    dropoff_zones = np.full(k, OUTSIDE_ZONE, dtype=np.int64)
+    for j, i in enumerate(idx):
+        pk, dk = pkeys[i], dkeys[i]
+        pc, dc = coords.get(pk), coords.get(dk)
+        if pc:
+            pickup_zones[j] = zone_of(*pc)
+        if dc:
+            dropoff_zones[j] = zone_of(*dc)
+        resolved[j] = bool(pc and dc)
+        if pk and pk == dk:
+            miles[j] = 0.0  # same address, as estimate_miles
+        elif resolved[j]:
+            miles[j] = pair_miles(pk, dk, pc, dc)
+    cents = fare_cents_array(miles, pickup_zones, dropoff_zones)
+
+    for j, i in enumerate(idx):
+        fare = Decimal(int(cents[j])) / 100
+        fallback = not resolved[j] and not (pkeys[i] and pkeys[i] == dkeys[i])
+        item: Dict[str, Any] = {
+            "index": i,
+            "pickup_location": pickups[i],
+            "dropoff_location": dropoffs[i],
+            "estimated_miles": float(miles[j]),
+            "fare_estimate": f"{fare:.2f}",
+            "resolved": bool(resolved[j]),
+            "fallback": bool(fallback),
+        }
+        if explain:
+            item["fare_explanation"] = _rider_copy(pickups[i], dropoffs[i], float(miles[j]), fare)
+        yield item
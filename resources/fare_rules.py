@@ -0,0 +1,288 @@
+# resources/fare_rules.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Versioned fare rules (time bands, pickup/dropoff zones, airport
+#     surcharges, minimum fare) that change without a redeploy
+#   - Rules are compiled into flat tables, so pricing one trip is a few
+#     list reads + Decimal math, whatever the number of rules
+#
+# Sources (FARE_RULES_SOURCE):
+#   - "file" (default): JSON at FARE_RULES_PATH (no file = env rates;
+#     see resources/data/fare_rules.example.json)
+#   - "db": newest active row of `fare_rule_sets` (same JSON in `rules`;
+#     a row is reloaded when its `version` differs from the one in use)
+#   - "off": env rates only (FARE_BASE / FARE_PER_MILE / FARE_MULTIPLIER)
+#   The source is read once at startup, then re-checked at most every
+#   FARE_RULES_CHECK_SEC on a background thread, so pricing (also on the
+#   event loop) only ever reads the current rules; a new version is
+#   compiled off to the side and swapped in with one assignment (readers
+#   never see a half-built rule set). A rule file that fails to parse
+#   keeps the previous rules.
+#
+# Rule file (money as strings; every section optional; time bands are
+# whole hours in SERVICE_TZ, "end" exclusive, overnight bands allowed):
+#   {
+#     "version": "2026-10-01",
+#     "base": "3.00", "per_mile": "4.00", "multiplier": "0.70",
+#     "minimum_fare": "8.00",
+#     "time_bands": [{"days": "mon-fri", "start": "07:00", "end": "09:00", "multiplier": "1.2"}],
+#     "zones": [{"name": "downtown", "bbox": [32.77, 32.80, -96.81, -96.78],
+#                "pickup_multiplier": "1.1", "dropoff_fee": "1.00"}],
+#     "airports": [{"name": "DFW", "lat": 32.8998, "lng": -97.0403, "radius_mi": 2.5,
+#                   "pickup_fee": "5.00", "dropoff_fee": "3.00"}]
+#   }
+#
+# Fare = max(minimum, round(base + miles x per_mile x multiplier x
+#            time band x pickup zone x dropoff zone) + pickup/dropoff fees)
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from resources import zones
+from resources.geo_distance import one_to_many
+
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+SOURCE = os.getenv("FARE_RULES_SOURCE", "file").lower()
+RULES_PATH = os.getenv("FARE_RULES_PATH", "resources/data/fare_rules.json")
+CHECK_SEC = float(os.getenv("FARE_RULES_CHECK_SEC", "5"))
+
+ONE = Decimal("1")
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+HOURS_PER_WEEK = 168
+
+_DAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+_DAY_SETS = {"daily": range(7), "weekdays": range(5), "weekends": range(5, 7)}
+
+
+def _money(d: Decimal) -> Decimal:
+    return d.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _days(spec: Any) -> List[int]:
+    """"mon-fri" | "sat,sun" | "daily" | ["mon", "wed"] -> weekday numbers."""
+    if isinstance(spec, (list, tuple)):
+        return sorted({d for part in spec for d in _days(part)})
+    spec = str(spec or "daily").strip().lower()
+    if spec in _DAY_SETS:
+        return list(_DAY_SETS[spec])
+    out = set()
+    for part in spec.split(","):
+        if "-" in part:
+            a, b = (_DAYS[p.strip()[:3]] for p in part.split("-", 1))
+            out.update((a + i) % 7 for i in range((b - a) % 7 + 1))
+        else:
+            out.add(_DAYS[part.strip()[:3]])
+    return sorted(out)
+
+
+def _hour(hhmm: str) -> int:
+    return int(str(hhmm).split(":", 1)[0])
+
+
+def value_levels(values: List[Decimal]) -> Tuple[List[Decimal], np.ndarray]:
+    """Distinct values + each position's index into them."""
+    levels = sorted(set(values))
+    index = {v: i for i, v in enumerate(levels)}
+    return levels, np.array([index[v] for v in values], dtype=np.int64)
+
+
+class RuleSet:
+    """
+    One compiled, immutable version of the rules.
+    Tables are indexed by hour-of-week (0..167) and zone id (0..N_ZONES).
+    """
+
+    def __init__(self, spec: Dict[str, Any], base: Decimal, per_mile: Decimal, multiplier: Decimal) -> None:
+        self.version = str(spec.get("version", "env"))
+        self.base = Decimal(str(spec.get("base", base)))
+        self.per_mile = Decimal(str(spec.get("per_mile", per_mile)))
+        self.multiplier = Decimal(str(spec.get("multiplier", multiplier)))
+        self.minimum = _money(Decimal(str(spec.get("minimum_fare", "0"))))
+        n = zones.N_ZONES + 1
+
+        self.time_mult: List[Decimal] = [ONE] * HOURS_PER_WEEK
+        for band in spec.get("time_bands", []):
+            mult = Decimal(str(band.get("multiplier", "1")))
+            start, end = _hour(band.get("start", "00:00")), _hour(band.get("end", "24:00"))
+            hours = range(start, end) if start < end else [*range(start, 24), *range(0, end)]
+            for day in _days(band.get("days")):
+                for h in hours:
+                    # Overnight bands spill into the next day
+                    how = (day * 24 + h + (24 if start >= end and h < end else 0)) % HOURS_PER_WEEK
+                    self.time_mult[how] *= mult
+
+        self.pickup_mult: List[Decimal] = [ONE] * n
+        self.dropoff_mult: List[Decimal] = [ONE] * n
+        self.pickup_fee: List[Decimal] = [ZERO] * n
+        self.dropoff_fee: List[Decimal] = [ZERO] * n
+        lats, lngs = zones.zone_centers()
+        for rule in [*spec.get("zones", []), *spec.get("airports", [])]:
+            for z in self._rule_zones(rule, lats, lngs):
+                self.pickup_mult[z] *= Decimal(str(rule.get("pickup_multiplier", "1")))
+                self.dropoff_mult[z] *= Decimal(str(rule.get("dropoff_multiplier", "1")))
+                self.pickup_fee[z] += _money(Decimal(str(rule.get("pickup_fee", "0"))))
+                self.dropoff_fee[z] += _money(Decimal(str(rule.get("dropoff_fee", "0"))))
+
+        # Batch pricing: per-zone multiplier classes (few distinct values) and fee cents
+        self.pickup_levels, self.pickup_class = value_levels(self.pickup_mult)
+        self.dropoff_levels, self.dropoff_class = value_levels(self.dropoff_mult)
+        self.pickup_fee_cents = np.array([int(f * 100) for f in self.pickup_fee], dtype=np.int64)
+        self.dropoff_fee_cents = np.array([int(f * 100) for f in self.dropoff_fee], dtype=np.int64)
+
+        self.trivial = (
+            self.minimum <= 0
+            and all(m == ONE for m in self.time_mult)
+            and all(m == ONE for m in self.pickup_mult + self.dropoff_mult)
+            and all(f == ZERO for f in self.pickup_fee + self.dropoff_fee)
+        )
+        # Fingerprint of the compiled zone / airport / minimum tables: rule
+        # edits that keep `version` still change it (zone_matrix staleness)
+        self.tables_digest = hashlib.sha256(json.dumps([
+            str(self.minimum),
+            [str(m) for m in self.pickup_mult], [str(m) for m in self.dropoff_mult],
+            [str(f) for f in self.pickup_fee], [str(f) for f in self.dropoff_fee],
+        ]).encode()).hexdigest()[:16]
+        self.loaded_at = time.time()
+
+    @staticmethod
+    def _rule_zones(rule: Dict[str, Any], lats: np.ndarray, lngs: np.ndarray) -> List[int]:
+        """Zones a rule covers: explicit ids, a bbox, or a radius around a point."""
+        if "zone_ids" in rule:
+            return [int(z) for z in rule["zone_ids"] if 0 <= int(z) <= zones.N_ZONES]
+        if "bbox" in rule:
+            la0, la1, ln0, ln1 = (float(x) for x in rule["bbox"])
+            inside = (lats >= la0) & (lats <= la1) & (lngs >= ln0) & (lngs <= ln1)
+            covered = set(np.flatnonzero(inside).tolist())
+            covered.update(zones.zone_of(lat, lng) for lat in (la0, la1) for lng in (ln0, ln1))
+        else:
+            lat, lng = float(rule["lat"]), float(rule["lng"])
+            near = one_to_many(lat, lng, lats, lngs) <= float(rule.get("radius_mi", 1.0))
+            covered = set(np.flatnonzero(near).tolist())
+            covered.add(zones.zone_of(lat, lng))  # the point's own zone, even off-centre
+        covered.discard(zones.OUTSIDE_ZONE)
+        return sorted(covered)
+
+    def rate(self, how: int, pickup_zone: int, dropoff_zone: int, surge: Decimal = ONE) -> Decimal:
+        """Effective dollars per mile for this hour, zone pair and surge."""
+        return (self.per_mile * self.multiplier * self.time_mult[how]
+                * self.pickup_mult[pickup_zone] * surge * self.dropoff_mult[dropoff_zone])
+
+    def fees(self, pickup_zone: int, dropoff_zone: int) -> Decimal:
+        """Flat zone + airport fees, whole cents."""
+        return self.pickup_fee[pickup_zone] + self.dropoff_fee[dropoff_zone]
+
+    def price(self, miles: Decimal, how: int = 0, pickup_zone: int = zones.OUTSIDE_ZONE,
+              dropoff_zone: int = zones.OUTSIDE_ZONE, surge: Decimal = ONE) -> Decimal:
+        """Fare for `miles` at hour-of-week `how` between two zones."""
+        fare = _money(self.base + miles * self.rate(how, pickup_zone, dropoff_zone, surge))
+        return max(self.minimum, fare + self.fees(pickup_zone, dropoff_zone))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "base": str(self.base), "per_mile": str(self.per_mile), "multiplier": str(self.multiplier),
+            "minimum_fare": str(self.minimum), "trivial": self.trivial, "loaded_at": self.loaded_at,
+        }
+
+
+# ----------------------------
+# Sources + hot reload
+# ----------------------------
+
+def _read_file() -> Optional[Dict[str, Any]]:
+    with open(RULES_PATH, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _read_db() -> Optional[Dict[str, Any]]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT version, rules FROM fare_rule_sets WHERE active ORDER BY created_at DESC, id DESC LIMIT 1"
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    spec = row[1] if isinstance(row[1], dict) else json.loads(row[1])
+    return {**spec, "version": spec.get("version", str(row[0]))}
+
+
+class RuleStore:
+    """Holds the current RuleSet and swaps in new versions as the source changes."""
+
+    def __init__(self, base: Decimal, per_mile: Decimal, multiplier: Decimal) -> None:
+        self._defaults = (base, per_mile, multiplier)
+        self._current = RuleSet({}, *self._defaults)
+        self._stamp: Any = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.errors = 0
+        self._check()  # startup: the only load on the caller's thread
+        self._checked_at = time.monotonic()
+
+    def _load(self) -> None:
+        if SOURCE == "off" or (SOURCE == "db" and get_conn is None):
+            return
+        if SOURCE == "file":
+            if not os.path.exists(RULES_PATH):
+                if self._stamp is not None:  # file removed -> back to env rates
+                    self._current, self._stamp = RuleSet({}, *self._defaults), None
+                return
+            st = os.stat(RULES_PATH)  # cheap change detector: mtime + size
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._stamp:
+                return
+            spec = _read_file()
+        else:
+            spec = _read_db()
+            stamp = spec and spec.get("version")
+            if spec is None or stamp == self._stamp:
+                return
+        self._current = RuleSet(spec or {}, *self._defaults)
+        self._stamp = stamp
+        self.reloads += 1
+
+    def _check(self) -> None:
+        try:
+            self._load()
+        except Exception:
+            self.errors += 1  # bad/missing source: keep serving the last good rules
+
+    def _check_in_background(self) -> None:
+        try:
+            self._check()
+        finally:
+            self._lock.release()
+
+    def current(self) -> RuleSet:
+        """
+        The active rules: a plain read. At most every CHECK_SEC it also
+        starts one background re-check of the source (never waits on it).
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= CHECK_SEC and self._lock.acquire(blocking=False):
+            self._checked_at = now
+            threading.Thread(target=self._check_in_background, name="fare-rules", daemon=True).start()
+        return self._current
+
+    def reload(self) -> RuleSet:
+        """Re-check the source now, on this thread (e.g. right after publishing rules)."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._check()
+        return self._current
@@ -0,0 +1,193 @@
+# resources/gazetteer.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Offline, first-tier geocoder for the places riders reuse
+#     (airport terminals, hotels, stadiums, downtown landmarks)
+#   - Resolves in microseconds and keeps working when OSM is down
+#
+# Data:
+#   - CSV (name,aliases,lat,lng; aliases separated by "|") or a
+#     SQLite file with a `places` table of the same columns
+#   - GAZETTEER_PATH overrides the bundled resources/data/gazetteer.csv
+#   - Names/aliases are indexed in canonical form (geo_utils.canonicalize_address)
+#
+# Matching (conservative on purpose — a wrong hit is worse than a miss):
+#   1) exact match on a normalized name/alias
+#   2) token index lookup with typo-tolerant tokens; every token of the
+#      place must be present and any extra query tokens must be
+#      locality noise ("dallas", "tx", ZIP codes, ...)
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import csv
+import difflib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+ENABLED = os.getenv("GAZETTEER_ENABLED", "1") == "1"
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.csv")
+PATH = os.getenv("GAZETTEER_PATH", DEFAULT_PATH)
+
+# How close a misspelled token must be to a known one (difflib ratio)
+TOKEN_CUTOFF = float(os.getenv("GAZETTEER_TOKEN_CUTOFF", "0.8"))
+
+# Extra query tokens that don't change *which* place is meant
+# (canonical forms: "texas" -> "tx", "and" -> "&")
+LOCALITY_TOKENS: Set[str] = {
+    "dallas", "fort", "worth", "arlington", "irving", "grapevine", "frisco",
+    "tx", "usa", "us", "united", "states", "the", "at", "&",
+}
+_ZIP = re.compile(r"^\d{5}$")
+
+_lock = threading.Lock()
+_loaded = False
+
+# Normalized entry text -> (lat, lng)
+_exact: Dict[str, Tuple[float, float]] = {}
+# Entries as token tuples, aligned with _coords
+_entries: List[Tuple[str, ...]] = []
+_coords: List[Tuple[float, float]] = []
+# token -> ids of entries containing it
+_postings: Dict[str, Set[int]] = {}
+_vocab: List[str] = []
+# Display names (CSV `name` column), for address suggestions
+_names: List[str] = []
+
+
+def _normalize(text: str) -> str:
+    # Same canonical form as the cache keys, so names and queries line up
+    from resources.geo_utils import canonicalize_address
+    return canonicalize_address(text)
+
+
+# ----------------------------
+# Loading
+# ----------------------------
+
+def _read_rows(path: str) -> List[Tuple[str, str, float, float]]:
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute("SELECT name, aliases, lat, lng FROM places").fetchall()
+        finally:
+            conn.close()
+        return [(r[0] or "", r[1] or "", float(r[2]), float(r[3])) for r in rows]
+
+    with open(path, newline="", encoding="utf-8") as fh:
+        return [
+            (r.get("name") or "", r.get("aliases") or "", float(r["lat"]), float(r["lng"]))
+            for r in csv.DictReader(fh)
+        ]
+
+
+def _add_entry(text: str, latlng: Tuple[float, float]) -> None:
+    key = _normalize(text)
+    if not key or key in _exact:
+        return
+    _exact[key] = latlng
+    idx = len(_entries)
+    tokens = tuple(key.split())
+    _entries.append(tokens)
+    _coords.append(latlng)
+    for tok in tokens:
+        _postings.setdefault(tok, set()).add(idx)
+
+
+def load(path: str | None = None) -> int:
+    """
+    (Re)build the in-memory index from a CSV/SQLite file.
+    Returns the number of indexed names + aliases. Never raises.
+    """
+    global _loaded, _vocab
+    with _lock:
+        _exact.clear()
+        _entries.clear()
+        _coords.clear()
+        _postings.clear()
+        _names.clear()
+        try:
+            for name, aliases, lat, lng in _read_rows(path or PATH):
+                if name:
+                    _names.append(name)
+                for text in [name, *aliases.split("|")]:
+                    _add_entry(text, (lat, lng))
+        except Exception:
+            pass  # missing/invalid file -> empty gazetteer, network still works
+        _vocab = sorted(_postings)
+        _loaded = True
+        return len(_entries)
+
+
+def _ensure_loaded() -> None:
+    if not _loaded:
+        load()
+
+
+def place_names() -> List[str]:
+    """Display names of every place (aliases excluded)."""
+    if not ENABLED:
+        return []
+    _ensure_loaded()
+    return list(_names)
+
+
+# ----------------------------
+# Lookup
+# ----------------------------
+
+def _resolve_token(tok: str) -> Optional[str]:
+    if tok in _postings:
+        return tok
+    if len(tok) < 4:
+        return None  # too short to fuzz safely
+    close = difflib.get_close_matches(tok, _vocab, n=1, cutoff=TOKEN_CUTOFF)
+    return close[0] if close else None
+
+
+def lookup(query: str) -> Optional[Tuple[float, float]]:
+    """
+    Return (lat, lng) for a known place, or None.
+    """
+    if not ENABLED:
+        return None
+    _ensure_loaded()
+
+    key = _normalize(query)
+    if not key:
+        return None
+    hit = _exact.get(key)
+    if hit:
+        return hit
+
+    tokens: List[str] = []
+    noise: List[str] = []
+    for tok in key.split():
+        resolved = _resolve_token(tok)
+        if resolved:
+            tokens.append(resolved)
+        else:
+            noise.append(tok)
+    if not tokens or any(t not in LOCALITY_TOKENS and not _ZIP.match(t) for t in noise):
+        return None
+
+    present = set(tokens)
+    candidates: Set[int] = set()
+    for tok in present:
+        candidates |= _postings.get(tok, set())
+
+    best: Optional[int] = None
+    for idx in candidates:
+        entry = _entries[idx]
+        if not all(t in present for t in entry):
+            continue
+        extra = present.difference(entry)
+        if any(t not in LOCALITY_TOKENS for t in extra):
+            continue
+        # Prefer the most specific place ("dfw airport terminal d" over "dfw airport")
+        if best is None or len(entry) > len(_entries[best]):
+            best = idx
+    return _coords[best] if best is not None else None
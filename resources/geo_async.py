@@ -0,0 +1,151 @@
+# resources/geo_async.py
+# --------------------------------------------------------------
+# Purpose:
+#   - asyncio geocoding client for async routes (no threadpool slot
+#     held while waiting on Nominatim)
+#
+# Features:
+#   - One pooled httpx.AsyncClient per event loop (keep-alive reuse)
+#   - Single-flight: concurrent lookups of the same canonical key share
+#     one in-flight resolution instead of each hitting OSM
+#   - Semaphore caps outstanding upstream requests (GEOCODE_MAX_INFLIGHT)
+#   - Shares the global Nominatim rate limiter with the sync path
+#   - Non-blocking exponential backoff between retries
+#   - Same tiers and entry rules as the sync path:
+#     memory -> gazetteer -> durable cache -> OSM (negative + stale entries);
+#     only an OSM answer with no match is cached as negative, never a
+#     throttled, failed or erroring request
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from resources.rate_limiter import NOMINATIM_LIMITER
+from resources.geo_utils import (
+    UA, TIMEOUT_SEC, RETRIES, RETRY_SLEEP,
+    NOT_FOUND, _bump, _osm_query, _peek_local, _peek_durable, _record,
+)
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+MAX_INFLIGHT = int(os.getenv("GEOCODE_MAX_INFLIGHT", "4"))
+
+
+class AsyncGeocoder:
+    """
+    Async, single-flight geocoder bound to the event loop that created it.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = MAX_INFLIGHT,
+        timeout: float = TIMEOUT_SEC,
+        retries: int = RETRIES,
+        backoff: float = RETRY_SLEEP,
+    ) -> None:
+        self._client = httpx.AsyncClient(
+            headers=UA,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight),
+        )
+        self._sem = asyncio.Semaphore(max_inflight)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._retries = retries
+        self._backoff = backoff
+        self.loop = asyncio.get_running_loop()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    # ----------------------------
+    # Upstream (OSM / Nominatim)
+    # ----------------------------
+
+    async def _fetch_once(self, query: str):
+        async with self._sem:
+            resp = await self._client.get(
+                NOMINATIM_URL, params={"q": query, "format": "jsonv2", "limit": 1}
+            )
+        resp.raise_for_status()
+        rows = resp.json() or []
+        if not rows:
+            return NOT_FOUND
+        return (float(rows[0]["lat"]), float(rows[0]["lon"]))
+
+    async def _fetch_with_retry(self, query: str):
+        """(lat, lng), NOT_FOUND, or None when OSM could not be asked / didn't answer."""
+        for attempt in range(self._retries + 1):
+            # Global Nominatim budget (cross-worker); priority comes from the caller's context
+            if not await asyncio.to_thread(NOMINATIM_LIMITER.acquire):
+                _bump("throttled")
+                return None
+            try:
+                return await self._fetch_once(query)
+            except Exception:
+                pass  # transient network/HTTP error -> back off and retry
+            if attempt < self._retries:
+                await asyncio.sleep(self._backoff * (2 ** attempt))
+        return None
+
+    # ----------------------------
+    # Tiered resolve
+    # ----------------------------
+
+    async def _resolve(self, key: str, raw: Optional[str]) -> Optional[Tuple[float, float]]:
+        e = _peek_local(key, raw)
+        if e is None:
+            e = await asyncio.to_thread(_peek_durable, key, raw)
+        if e is not None:
+            return e.latlng
+
+        _bump("network_lookups")
+        latlng = await self._fetch_with_retry(_osm_query(raw, key))
+        if latlng is None:
+            _bump("network_failures")
+            return None  # throttled / unreachable: nothing cached
+        if latlng == NOT_FOUND:
+            _bump("not_found")
+            latlng = None
+        e = await asyncio.to_thread(_record, key, latlng)
+        return e.latlng
+
+    async def lookup(self, key: str, raw: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        """
+        Return (lat, lng) for a canonical key (OSM is asked for `raw`, the
+        caller's address, when given). Concurrent callers asking for the
+        same key await the same in-flight resolution.
+        """
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._resolve(key, raw))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+        # shield: one caller being cancelled must not cancel the shared lookup
+        return await asyncio.shield(fut)
+
+
+_client: Optional[AsyncGeocoder] = None
+
+
+def get_async_geocoder() -> AsyncGeocoder:
+    """
+    Shared client for the running loop (recreated if the loop changed).
+    Must be called from inside a coroutine.
+    """
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.loop is not loop:
+        _client = AsyncGeocoder()
+    return _client
+
+
+async def aclose_async_geocoder() -> None:
+    """Close the pooled HTTP client (call on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,377 @@
+# resources/geo_cache.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Durable geocode cache that survives restarts and is shared
+#     by every worker (so a warm fleet never geocodes twice)
+#   - Explicit cache entry model (GeocodeEntry) used by every tier
+#
+# Backends (GEOCODE_CACHE_BACKEND):
+#   - "auto" (default): Postgres `geocode_cache` table, falling back
+#     to a local SQLite file when Postgres is unreachable
+#   - "postgres" | "sqlite" | "off"
+#
+# Entry lifetimes:
+#   - positive: fresh for GEOCODE_CACHE_TTL_DAYS, then served stale for
+#     GEOCODE_STALE_DAYS more while a background refresh runs
+#   - negative (no result / OSM failure): GEOCODE_NEGATIVE_TTL_SEC only,
+#     so one transient failure can't pin an address to the fallback
+#
+# Features:
+#   - Keyed by canonical address (callers pass the key)
+#   - Bounded size: dead rows and least-recently-hit rows are evicted
+#     every GEOCODE_CACHE_EVICT_EVERY writes
+#   - Fail-soft: cache errors never break geocoding
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Postgres pool is optional (local dev may not have psycopg2 / a DB)
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+BACKEND = os.getenv("GEOCODE_CACHE_BACKEND", "auto").lower()
+SQLITE_PATH = os.getenv("GEOCODE_CACHE_SQLITE", "geocode_cache.db")
+TTL_SEC = int(float(os.getenv("GEOCODE_CACHE_TTL_DAYS", "90")) * 86400)
+STALE_SEC = int(float(os.getenv("GEOCODE_STALE_DAYS", "30")) * 86400)
+NEGATIVE_TTL_SEC = int(os.getenv("GEOCODE_NEGATIVE_TTL_SEC", "120"))
+MAX_ROWS = int(os.getenv("GEOCODE_CACHE_MAX_ROWS", "50000"))
+EVICT_EVERY = int(os.getenv("GEOCODE_CACHE_EVICT_EVERY", "200"))
+
+# After a Postgres error, stay on SQLite for this long before retrying
+PG_RETRY_SEC = 60.0
+
+_lock = threading.Lock()
+_pg_retry_at = 0.0
+_sqlite_ready = False
+_writes = 0
+
+
+# ----------------------------
+# Entry model
+# ----------------------------
+
+@dataclass(frozen=True)
+class GeocodeEntry:
+    """
+    One cached geocode result. `latlng is None` marks a negative entry.
+    Times are epoch seconds so entries mean the same thing in every process.
+    """
+    latlng: Optional[Tuple[float, float]]
+    fetched_at: float
+    fresh_until: float
+    stale_until: float
+
+    @property
+    def negative(self) -> bool:
+        return self.latlng is None
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        return (now or time.time()) < self.fresh_until
+
+    def is_usable(self, now: float | None = None) -> bool:
+        """Fresh, or stale-but-servable (positive entries only)."""
+        return (now or time.time()) < self.stale_until
+
+
+def make_entry(latlng: Optional[Tuple[float, float]], now: float | None = None) -> GeocodeEntry:
+    """Build an entry with the configured positive/negative lifetimes."""
+    now = now or time.time()
+    if latlng is None:
+        return GeocodeEntry(None, now, now + NEGATIVE_TTL_SEC, now + NEGATIVE_TTL_SEC)
+    latlng = (float(latlng[0]), float(latlng[1]))
+    return GeocodeEntry(latlng, now, now + TTL_SEC, now + TTL_SEC + STALE_SEC)
+
+
+def _row_to_entry(row) -> GeocodeEntry:
+    lat, lng, fetched, fresh, stale = row
+    latlng = None if lat is None or lng is None else (float(lat), float(lng))
+    return GeocodeEntry(latlng, float(fetched), float(fresh), float(stale))
+
+
+# ----------------------------
+# Backend selection
+# ----------------------------
+
+def _use_pg() -> bool:
+    if BACKEND in ("sqlite", "off") or get_conn is None:
+        return False
+    return time.time() >= _pg_retry_at
+
+
+def _pg_failed() -> None:
+    """Remember a Postgres failure; fall back to SQLite for a while."""
+    global _pg_retry_at
+    _pg_retry_at = time.time() + PG_RETRY_SEC
+
+
+def _use_sqlite() -> bool:
+    return BACKEND in ("auto", "sqlite")
+
+
+# ----------------------------
+# SQLite fallback
+# ----------------------------
+
+def _sqlite() -> sqlite3.Connection:
+    global _sqlite_ready
+    conn = sqlite3.connect(SQLITE_PATH, timeout=5)
+    if not _sqlite_ready:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(geocode_cache)")}
+        if cols and "stale_until" not in cols:
+            # Pre-negative-caching layout; it's only a cache, so rebuild it
+            conn.execute("DROP TABLE geocode_cache")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                query_key   TEXT PRIMARY KEY,
+                lat         REAL,
+                lng         REAL,
+                created_at  REAL NOT NULL,
+                expires_at  REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                last_hit_at REAL NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_geocode_cache_last_hit ON geocode_cache (last_hit_at)"
+        )
+        conn.commit()
+        _sqlite_ready = True
+    return conn
+
+
+def _sqlite_get(key: str) -> Optional[GeocodeEntry]:
+    now = time.time()
+    conn = _sqlite()
+    try:
+        row = conn.execute(
+            """
+            SELECT lat, lng, created_at, expires_at, stale_until
+            FROM geocode_cache WHERE query_key = ? AND stale_until > ?
+            """,
+            (key, now),
+        ).fetchone()
+        if row:
+            conn.execute("UPDATE geocode_cache SET last_hit_at = ? WHERE query_key = ?", (now, key))
+            conn.commit()
+        return _row_to_entry(row) if row else None
+    finally:
+        conn.close()
+
+
+def _sqlite_put(key: str, e: GeocodeEntry) -> None:
+    lat, lng = e.latlng if e.latlng else (None, None)
+    conn = _sqlite()
+    try:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO geocode_cache
+                (query_key, lat, lng, created_at, expires_at, stale_until, last_hit_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (key, lat, lng, e.fetched_at, e.fresh_until, e.stale_until, e.fetched_at),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _sqlite_evict() -> None:
+    conn = _sqlite()
+    try:
+        conn.execute("DELETE FROM geocode_cache WHERE stale_until <= ?", (time.time(),))
+        conn.execute(
+            """
+            DELETE FROM geocode_cache
+             WHERE query_key IN (
+                SELECT query_key FROM geocode_cache
+                ORDER BY last_hit_at DESC
+                LIMIT -1 OFFSET ?
+             )
+            """,
+            (MAX_ROWS,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ----------------------------
+# Postgres (primary)
+# ----------------------------
+
+def _pg_get(key: str) -> Optional[GeocodeEntry]:
+    # One round trip: read + touch last_hit_at for LRU eviction
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE geocode_cache
+               SET last_hit_at = now()
+             WHERE query_key = %s AND stale_until > now()
+            RETURNING lat, lng,
+                      extract(epoch FROM created_at),
+                      extract(epoch FROM expires_at),
+                      extract(epoch FROM stale_until)
+            """,
+            (key,),
+        )
+        row = cur.fetchone()
+        conn.commit()
+        return _row_to_entry(row) if row else None
+
+
+def _pg_put(key: str, e: GeocodeEntry) -> None:
+    lat, lng = e.latlng if e.latlng else (None, None)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO geocode_cache (query_key, lat, lng, created_at, expires_at, stale_until, last_hit_at)
+            VALUES (%s, %s, %s, to_timestamp(%s), to_timestamp(%s), to_timestamp(%s), now())
+            ON CONFLICT (query_key) DO UPDATE
+            SET lat = EXCLUDED.lat,
+                lng = EXCLUDED.lng,
+                created_at = EXCLUDED.created_at,
+                expires_at = EXCLUDED.expires_at,
+                stale_until = EXCLUDED.stale_until,
+                last_hit_at = EXCLUDED.last_hit_at
+            """,
+            (key, lat, lng, e.fetched_at, e.fresh_until, e.stale_until),
+        )
+        conn.commit()
+
+
+def _pg_evict() -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM geocode_cache WHERE stale_until <= now()")
+        cur.execute(
+            """
+            DELETE FROM geocode_cache
+             WHERE query_key IN (
+                SELECT query_key FROM geocode_cache
+                ORDER BY last_hit_at DESC
+                OFFSET %s
+             )
+            """,
+            (MAX_ROWS,),
+        )
+        conn.commit()
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+
+def get_entry(key: str) -> Optional[GeocodeEntry]:
+    """
+    Return the usable (fresh or stale) entry for a canonical key, or None.
+    Never raises.
+    """
+    if not key or BACKEND == "off":
+        return None
+    if _use_pg():
+        try:
+            return _pg_get(key)
+        except Exception:
+            _pg_failed()
+    if _use_sqlite():
+        try:
+            return _sqlite_get(key)
+        except Exception:
+            pass
+    return None
+
+
+def put_entry(key: str, entry: GeocodeEntry) -> None:
+    """
+    Store an entry (positive or negative). Periodically evicts dead /
+    least-recently-hit rows. Never raises.
+    """
+    global _writes
+    if not key or BACKEND == "off":
+        return
+    stored_pg = False
+    if _use_pg():
+        try:
+            _pg_put(key, entry)
+            stored_pg = True
+        except Exception:
+            _pg_failed()
+    if not stored_pg and _use_sqlite():
+        try:
+            _sqlite_put(key, entry)
+        except Exception:
+            return
+
+    with _lock:
+        _writes += 1
+        due = _writes % max(1, EVICT_EVERY) == 0
+    if due:
+        evict(stored_pg)
+
+
+def get(key: str) -> Optional[Tuple[float, float]]:
+    """Fresh positive (lat, lng) for a key, or None (compat helper)."""
+    e = get_entry(key)
+    return e.latlng if e and e.is_fresh() else None
+
+
+def put(key: str, lat: float, lng: float) -> None:
+    """Store a positive result with the default lifetimes (compat helper)."""
+    put_entry(key, make_entry((lat, lng)))
+
+
+def recent_keys(limit: int = 10000) -> List[str]:
+    """Keys of live positive entries, most recently hit first. Never raises."""
+    if BACKEND == "off":
+        return []
+    if _use_pg():
+        try:
+            with get_conn() as conn, conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT query_key FROM geocode_cache
+                     WHERE lat IS NOT NULL AND stale_until > now()
+                     ORDER BY last_hit_at DESC LIMIT %s
+                    """,
+                    (limit,),
+                )
+                return [r[0] for r in cur.fetchall()]
+        except Exception:
+            _pg_failed()
+    if _use_sqlite():
+        try:
+            conn = _sqlite()
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT query_key FROM geocode_cache
+                     WHERE lat IS NOT NULL AND stale_until > ?
+                     ORDER BY last_hit_at DESC LIMIT ?
+                    """,
+                    (time.time(), limit),
+                ).fetchall()
+            finally:
+                conn.close()
+            return [r[0] for r in rows]
+        except Exception:
+            pass
+    return []
+
+
+def evict(pg: bool | None = None) -> None:
+    """Drop dead rows and trim the table to GEOCODE_CACHE_MAX_ROWS."""
+    try:
+        if pg if pg is not None else _use_pg():
+            _pg_evict()
+        elif _use_sqlite():
+            _sqlite_evict()
+    except Exception:
+        pass
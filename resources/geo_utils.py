@@ -2,25 +2,48 @@
 # --------------------------------------------------------------
 # Purpose:
 #   - Geocode addresses with OpenStreetMap (via `geocoder`)
-#   - Provide distance estimation (geodesic miles)
+#   - Provide distance estimation (geodesic miles, or drive miles on the
+#     offline road graph when DISTANCE_PROVIDER=road)
 #   - Provide a reusable (lng, lat) geocode helper for dispatch
 #
 # Features:
 #   - Explicit User-Agent (OSM/Nominatim policy)
-#   - Timeout + light retries
-#   - LRU cache to avoid hammering OSM for repeated inputs
+#   - Timeout + light retries, behind a global Nominatim rate limiter
+#   - Address canonicalization so equivalent spellings share one cache key
+#   - Offline gazetteer (resources/gazetteer.py) for known places
+#   - In-process LRU of cache entries to avoid hammering OSM
+#   - Durable cache (resources/geo_cache.py) so restarts start warm
+#   - Negative caching (short TTL) + stale-while-revalidate refreshes
+#   - Route-pair memo (resources/route_cache.py) in front of the distance math
+#   - Async twins on a single-flight client (resources/geo_async.py)
 #   - Graceful fallbacks so the API remains reliable
 # --------------------------------------------------------------
 
 from __future__ import annotations
 
-from functools import lru_cache
-from typing import Tuple, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+import asyncio
+import contextvars
+import csv
+import json
+import os
+import re
+import threading
 import time
+import unicodedata
 
 from geopy.distance import geodesic
 import geocoder
 
+from resources import geo_cache, gazetteer
+from resources.geo_cache import GeocodeEntry, make_entry
+from resources.route_cache import ROUTES
+from resources.road_router import drive_route, get_road_graph
+from resources.rate_limiter import NOMINATIM_LIMITER, geocode_priority, PRIORITY_BACKGROUND
+
 # Be a good API citizen with an identifying User-Agent
 UA = {"User-Agent": "booking-agent/1.0 (contact: ops@yourdomain.com)"}
 
@@ -32,6 +55,30 @@ RETRY_SLEEP = 0.35        # seconds between retries
 # Fallback when geocoding fails or inputs are missing
 FALLBACK_MILES = 10.0
 
+# Distance model for trip miles: "geodesic" (straight line, default) or
+# "road" (resources/road_router.py; falls back to geodesic per trip when the
+# graph is missing or an endpoint is off it)
+DISTANCE_PROVIDER = os.getenv("DISTANCE_PROVIDER", "geodesic").lower()
+
+# One overall deadline for resolving both trip endpoints (seconds).
+# Lookups that miss it keep running in the background and warm the caches.
+DEADLINE_SEC = float(os.getenv("GEOCODE_DEADLINE_SEC", "10"))
+
+# Shared pool so pickup and dropoff resolve concurrently. Only real misses
+# (durable cache / OSM) run here; memory and gazetteer hits are answered on
+# the caller's thread, so a pool busy with cold lookups can't stall them.
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GEOCODE_WORKERS", "8")),
+    thread_name_prefix="geocode",
+)
+
+# Stale-while-revalidate refreshes get their own small pool, so background
+# revalidation never competes with live quotes for _EXECUTOR threads
+_REFRESH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GEOCODE_REFRESH_WORKERS", "2")),
+    thread_name_prefix="geocode-refresh",
+)
+
 
 # ----------------------------
 # Internal geocoding utilities
@@ -44,32 +91,369 @@ def _geocode_once(query: str):
     return geocoder.osm(query, headers=UA, timeout=TIMEOUT_SEC)
 
 
+# OSM answered and has no match for the query. This is the only outcome
+# cached as a negative entry; a throttled request (limiter timeout), a
+# network error or an HTTP error comes back as None and is never cached.
+NOT_FOUND = "not_found"
+
+
 def _geocode_with_retry(query: str):
     """
-    Try a couple of times; return a geocoder result or None.
+    Try a couple of times -> (lat, lng), NOT_FOUND, or None when OSM could
+    not be asked or did not answer.
     """
-    last_err: Exception | None = None
     for _ in range(RETRIES + 1):
+        # Shared across workers; bookings are served before quotes
+        if not NOMINATIM_LIMITER.acquire():
+            _bump("throttled")
+            return None
         try:
             res = _geocode_once(query)
-            if res and res.ok and res.lat is not None and res.lng is not None:
-                return res
-        except Exception as e:
-            last_err = e  # you could log this
+        except Exception:
+            res = None  # transient: retry
+        if res is not None:
+            if res.ok and res.lat is not None and res.lng is not None:
+                return (float(res.lat), float(res.lng))
+            if res.status_code == 200 and not res.error:
+                return NOT_FOUND
         time.sleep(RETRY_SLEEP)
-    # Optionally log last_err
     return None
 
 
-@lru_cache(maxsize=1024)
-def _coords_lat_lng(query: str) -> Optional[Tuple[float, float]]:
+# ----------------------------
+# Address canonicalization
+# ----------------------------
+
+# USPS-style street suffixes (Publication 28, common subset)
+STREET_SUFFIXES: Dict[str, str] = {
+    "alley": "aly", "avenue": "ave", "av": "ave", "boulevard": "blvd", "circle": "cir",
+    "court": "ct", "center": "ctr", "centre": "ctr", "crossing": "xing", "drive": "dr",
+    "expressway": "expy", "freeway": "fwy", "highway": "hwy", "lane": "ln",
+    "parkway": "pkwy", "place": "pl", "plaza": "plz", "road": "rd", "square": "sq",
+    "street": "st", "str": "st", "terrace": "ter", "trail": "trl", "turnpike": "tpke",
+}
+DIRECTIONALS: Dict[str, str] = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw",
+}
+UNIT_DESIGNATORS: Dict[str, str] = {
+    "apartment": "apt", "suite": "ste", "building": "bldg", "floor": "fl",
+    "room": "rm", "unit": "unit", "number": "unit", "no": "unit",
+}
+STATES: Dict[str, str] = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "florida": "fl", "georgia": "ga",
+    "hawaii": "hi", "idaho": "id", "illinois": "il", "indiana": "in", "iowa": "ia",
+    "kansas": "ks", "kentucky": "ky", "louisiana": "la", "maine": "me", "maryland": "md",
+    "massachusetts": "ma", "michigan": "mi", "minnesota": "mn", "mississippi": "ms",
+    "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "oklahoma": "ok", "oregon": "or", "pennsylvania": "pa", "tennessee": "tn",
+    "texas": "tx", "utah": "ut", "vermont": "vt", "virginia": "va", "washington": "wa",
+    "wisconsin": "wi", "wyoming": "wy",
+}
+MISC_WORDS: Dict[str, str] = {"international": "intl", "and": "&"}
+# State names are only abbreviated in the state slot (see _abbreviate_state),
+# so "Washington Ave" or "Texas Stadium" keep their words
+_TOKEN_MAP: Dict[str, str] = {**STREET_SUFFIXES, **DIRECTIONALS, **UNIT_DESIGNATORS, **MISC_WORDS}
+_MULTI_WORD_STATES: Dict[str, str] = {
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "rhode island": "ri",
+    "south carolina": "sc", "south dakota": "sd", "west virginia": "wv",
+    "district of columbia": "dc",
+}
+
+# Phrase aliases applied to the canonical text (longest match wins).
+# Extend via GEO_ALIASES_FILE (CSV "alias,canonical" or a JSON object).
+DEFAULT_ALIASES: Dict[str, str] = {
+    "dallas fort worth intl airport": "dfw airport",
+    "dallas fort worth airport": "dfw airport",
+    "dallas ft worth airport": "dfw airport",
+    "dfw intl airport": "dfw airport",
+    "dfw intl": "dfw airport",
+    "love field airport": "dallas love field",
+    "dallas love field airport": "dallas love field",
+    "ft worth": "fort worth",
+}
+ALIASES_FILE = os.getenv("GEO_ALIASES_FILE", "")
+
+_ZIP_PLUS4 = re.compile(r"\b(\d{5})-\d{4}\b")
+_ZIP5 = re.compile(r"^\d{5}$")
+_APOSTROPHE = re.compile(r"['\u2019]")
+_PUNCT = re.compile(r"[^\w\s&#]")
+_alias_re: Optional[re.Pattern] = None
+_aliases: Dict[str, str] = {}
+
+
+def _load_alias_file(path: str) -> Dict[str, str]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            if path.endswith(".json"):
+                return {str(k): str(v) for k, v in json.load(fh).items()}
+            return {row[0]: row[1] for row in csv.reader(fh) if len(row) >= 2}
+    except Exception:
+        return {}
+
+
+def set_aliases(aliases: Dict[str, str]) -> None:
+    """
+    Replace the alias table. Both sides are canonicalized first, and every
+    target also maps to itself so an already-canonical phrase is left alone.
+    """
+    global _alias_re, _aliases
+    table: Dict[str, str] = {}
+    for alias, target in aliases.items():
+        a, t = _canonical_tokens(alias), _canonical_tokens(target)
+        if a and t:
+            table[a] = t
+            table.setdefault(t, t)
+    _aliases = table
+    if table:
+        alts = sorted(table, key=len, reverse=True)
+        _alias_re = re.compile(r"(?<!\S)(" + "|".join(re.escape(a) for a in alts) + r")(?!\S)")
+    else:
+        _alias_re = None
+
+
+def address_tokens(address: str) -> List[str]:
+    """Lowercased words without accents, punctuation or ZIP+4, before any abbreviation."""
+    text = unicodedata.normalize("NFKD", address or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _ZIP_PLUS4.sub(r"\1", text)
+    text = _APOSTROPHE.sub("", text)
+    return _PUNCT.sub(" ", text).replace("&", " & ").replace("#", " # ").split()
+
+
+def _canonical_tokens(address: str) -> str:
+    """Case, punctuation, abbreviations, state and ZIP forms (no aliases)."""
+    out = []
+    for tok in _abbreviate_state(address_tokens(address)):
+        if tok == "#":
+            # "apt # 5" -> "apt 5"; a bare "# 5" -> "unit 5"
+            if not out or out[-1] not in UNIT_DESIGNATORS.values():
+                out.append("unit")
+            continue
+        out.append(_TOKEN_MAP.get(tok, tok))
+    return " ".join(out)
+
+
+def _abbreviate_state(tokens: List[str]) -> List[str]:
+    """
+    Abbreviate a spelled-out state in the state slot only: the last token,
+    or the one before a trailing ZIP ("dallas texas 75201" -> "dallas tx 75201").
+    """
+    end = len(tokens) - 1 if tokens and _ZIP5.match(tokens[-1]) else len(tokens)
+    if end >= 2:
+        abbr = _MULTI_WORD_STATES.get(" ".join(tokens[end - 2:end]))
+        if abbr:
+            return tokens[:end - 2] + [abbr] + tokens[end:]
+    if end >= 1 and tokens[end - 1] in STATES:
+        return tokens[:end - 1] + [STATES[tokens[end - 1]]] + tokens[end:]
+    return tokens
+
+
+def canonicalize_address(address: str) -> str:
+    """
+    Canonical form of a free-form address, used as the key for every cache
+    tier (OSM is always queried with the caller's own spelling), e.g.
+        "Dallas/Fort Worth Int'l Airport " -> "dfw airport"
+        "123 North Main Street, Apt #4, Dallas, Texas 75201-1234"
+            -> "123 n main st apt 4 dallas tx 75201"
+    """
+    text = _canonical_tokens(address)
+    if text and _alias_re is not None:
+        text = _alias_re.sub(lambda m: _aliases[m.group(1)], text)
+    return text
+
+
+set_aliases({**DEFAULT_ALIASES, **(_load_alias_file(ALIASES_FILE) if ALIASES_FILE else {})})
+
+
+# ----------------------------
+# Hit-rate counters
+# ----------------------------
+
+_stats_lock = threading.Lock()
+_STATS: Dict[str, int] = {
+    "lookups": 0,             # calls that needed coordinates
+    "canonical_rewrites": 0,  # inputs whose key differs from plain lower/strip
+    "memory_hits": 0,
+    "gazetteer_hits": 0,
+    "durable_hits": 0,
+    "negative_hits": 0,       # memory/durable hits on a cached "not found"
+    "stale_served": 0,        # stale positives returned while refreshing
+    "refreshes": 0,           # background revalidations started
+    "network_lookups": 0,
+    "network_failures": 0,    # OSM unreachable / erroring / throttled (not cached)
+    "not_found": 0,           # OSM answered without a match (cached negative)
+    "throttled": 0,           # Nominatim limiter timeouts
+}
+
+
+def _bump(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _STATS[name] += n
+
+
+def geocode_stats() -> Dict[str, float]:
     """
-    Cached geocode result as (lat, lng) tuple, or None if not found.
+    Snapshot of geocode counters. `coalesced` are lookups that joined an
+    in-flight async lookup; `hit_rate` is the share of lookups that avoided OSM.
     """
-    res = _geocode_with_retry(query)
-    if not res:
+    with _stats_lock:
+        snap: Dict[str, float] = dict(_STATS)
+    tiers = snap["memory_hits"] + snap["gazetteer_hits"] + snap["durable_hits"] + snap["network_lookups"]
+    snap["coalesced"] = max(0, snap["lookups"] - tiers)
+    snap["hit_rate"] = (
+        round(1.0 - snap["network_lookups"] / snap["lookups"], 4) if snap["lookups"] else 0.0
+    )
+    return snap
+
+
+def _count_lookup(raw: str, key: str) -> None:
+    _bump("lookups")
+    if key != " ".join((raw or "").lower().split()):
+        _bump("canonical_rewrites")
+
+
+# ----------------------------
+# Cache tiers (entries: resources/geo_cache.GeocodeEntry)
+#   memory (per process) -> gazetteer -> durable -> OSM
+# Positive entries past their fresh TTL are served stale while one
+# background refresh runs; negative entries live only briefly.
+# ----------------------------
+
+MEMORY_MAX = int(os.getenv("GEOCODE_MEMORY_MAX", "4096"))
+
+_mem_lock = threading.Lock()
+_MEMORY: "OrderedDict[str, GeocodeEntry]" = OrderedDict()
+_refreshing: set = set()
+
+
+def _mem_get(key: str) -> Optional[GeocodeEntry]:
+    with _mem_lock:
+        e = _MEMORY.get(key)
+        if e is None:
+            return None
+        if not e.is_usable():
+            del _MEMORY[key]
+            return None
+        _MEMORY.move_to_end(key)
+        return e
+
+
+def _mem_put(key: str, e: GeocodeEntry) -> None:
+    with _mem_lock:
+        _MEMORY[key] = e
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > MEMORY_MAX:
+            _MEMORY.popitem(last=False)
+
+
+def clear_memory_cache() -> None:
+    """Drop the per-process tier (durable cache is untouched)."""
+    with _mem_lock:
+        _MEMORY.clear()
+
+
+def _osm_query(raw: Optional[str], key: str) -> str:
+    """What OSM is asked: the caller's address as typed (the key is lossy)."""
+    return " ".join((raw or "").split()) or key
+
+
+def _refresh(key: str, raw: Optional[str] = None) -> None:
+    """Background revalidation; a failed refresh keeps the stale entry."""
+    try:
+        with geocode_priority(PRIORITY_BACKGROUND):
+            _bump("network_lookups")
+            latlng = _geocode_with_retry(_osm_query(raw, key))
+        if latlng is None or latlng == NOT_FOUND:
+            _bump("network_failures" if latlng is None else "not_found")
+        else:
+            _record(key, latlng)
+    finally:
+        with _mem_lock:
+            _refreshing.discard(key)
+
+
+def _serve(key: str, e: GeocodeEntry, raw: Optional[str] = None) -> GeocodeEntry:
+    """Count the hit and kick off a refresh if the entry is stale."""
+    if e.negative:
+        _bump("negative_hits")
+    elif not e.is_fresh():
+        _bump("stale_served")
+        with _mem_lock:
+            start = key not in _refreshing
+            _refreshing.add(key)
+        if start:
+            _bump("refreshes")
+            _REFRESH_EXECUTOR.submit(_refresh, key, raw)
+    return e
+
+
+def _peek_local(key: str, raw: Optional[str] = None) -> Optional[GeocodeEntry]:
+    """Non-blocking tiers: process memory, then the offline gazetteer."""
+    e = _mem_get(key)
+    if e is not None:
+        _bump("memory_hits")
+        return _serve(key, e, raw)
+
+    known = gazetteer.lookup(key)
+    if known:
+        _bump("gazetteer_hits")
+        e = GeocodeEntry(known, 0.0, float("inf"), float("inf"))
+        _mem_put(key, e)
+        return e
+    return None
+
+
+def _peek_durable(key: str, raw: Optional[str] = None) -> Optional[GeocodeEntry]:
+    """Shared durable tier (blocking I/O); promotes hits into memory."""
+    e = geo_cache.get_entry(key)
+    if e is None:
         return None
-    return (float(res.lat), float(res.lng))
+    _bump("durable_hits")
+    _mem_put(key, e)
+    return _serve(key, e, raw)
+
+
+def _record(key: str, latlng: Optional[Tuple[float, float]]) -> GeocodeEntry:
+    """
+    Store an OSM answer in memory + durable tiers: coordinates, or None for a
+    confirmed no-match (negative entry). Never called for failed requests.
+    """
+    e = make_entry(latlng)
+    _mem_put(key, e)
+    geo_cache.put_entry(key, e)
+    return e
+
+
+def _lookup(raw: str, key: str) -> Optional[Tuple[float, float]]:
+    """Counted entry point into the cached resolver."""
+    _count_lookup(raw, key)
+    return _coords_lat_lng(key, raw)
+
+
+def _coords_lat_lng(query: str, raw: Optional[str] = None) -> Optional[Tuple[float, float]]:
+    """
+    Geocode result as (lat, lng) tuple, or None if not found.
+
+    Read-through order: memory -> gazetteer -> durable cache -> OSM.
+    `query` must already be canonical (see `canonicalize_address`); it is
+    the cache key, while OSM gets `raw` (the caller's address) when given.
+    """
+    e = _peek_local(query, raw) or _peek_durable(query, raw)
+    if e is not None:
+        return e.latlng
+
+    _bump("network_lookups")
+    latlng = _geocode_with_retry(_osm_query(raw, query))
+    if latlng is None:
+        _bump("network_failures")
+        return None  # throttled / unreachable: nothing cached, the next lookup asks again
+    if latlng == NOT_FOUND:
+        _bump("not_found")
+        latlng = None
+    return _record(query, latlng).latlng
 
 
 # ----------------------------
@@ -84,28 +468,123 @@ def geocode_lng_lat(address: str, retries: int = RETRIES, delay: float = RETRY_S
         (lng, lat) on success, or None on failure.
 
     Notes:
-        - Uses an LRU-cached path to avoid repeated external calls.
+        - Uses the memory + durable cached path to avoid repeated external calls.
         - `retries`/`delay` are kept for API parity; the cached function already
           includes a minimal retry internally.
     """
-    addr = (address or "").strip()
+    addr = canonicalize_address(address)
     if not addr:
         return None
 
     # Use the cached (lat, lng) then flip the order for convenience in mapping/DB
-    latlng = _coords_lat_lng(addr)
+    latlng = _lookup(address, addr)
     if not latlng:
         return None
     lat, lng = latlng
     return (lng, lat)
 
 
+def cached_latlng(address: str) -> Optional[Tuple[float, float]]:
+    """
+    (lat, lng) from the cache tiers only (memory, gazetteer, durable cache),
+    never the network; None if the address hasn't been resolved before.
+    """
+    key = canonicalize_address(address)
+    e = (_peek_local(key, address) or _peek_durable(key, address)) if key else None
+    return e.latlng if e is not None else None
+
+
+def _submit(fn, *args):
+    """Run on the shared pool, carrying the caller's context (geocode priority)."""
+    return _EXECUTOR.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _start_lookups(
+    items: Iterable[Tuple[str, str]],
+) -> Tuple[Dict[str, Optional[Tuple[float, float]]], Dict[str, Future]]:
+    """
+    Resolve (raw, key) items: memory / gazetteer hits are answered inline on
+    the caller's thread, each distinct miss is submitted once to the shared
+    pool. Returns ({key: (lat, lng) | None}, {key: future}).
+    """
+    done: Dict[str, Optional[Tuple[float, float]]] = {}
+    pending: Dict[str, Future] = {}
+    for raw, key in items:
+        if not key or key in done or key in pending:
+            continue
+        e = _peek_local(key, raw)
+        if e is not None:
+            _count_lookup(raw, key)
+            done[key] = e.latlng
+        else:
+            pending[key] = _submit(_lookup, raw, key)
+    return done, pending
+
+
+def _result_now(f: Future) -> Optional[Tuple[float, float]]:
+    """A finished lookup's (lat, lng); None if it failed or is still running."""
+    try:
+        return f.result(timeout=0) if f.done() else None
+    except Exception:
+        return None
+
+
+def _lookup_pair(
+    pickup: str, p: str, dropoff: str, d: str
+) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+    """
+    Resolve both endpoints under one deadline; misses run concurrently on the
+    shared pool, so a cold quote costs max(pickup, dropoff) instead of their
+    sum. A side that misses the deadline comes back as None.
+    """
+    coords, pending = _start_lookups([(pickup, p), (dropoff, d)])
+    if pending:
+        wait(list(pending.values()), timeout=DEADLINE_SEC)
+        coords.update({key: _result_now(f) for key, f in pending.items()})
+    return coords.get(p), coords.get(d)
+
+
+def distance_model() -> str:
+    """The distance model in effect: "road" only when the road graph is loaded."""
+    if DISTANCE_PROVIDER == "road" and get_road_graph() is not None:
+        return "road"
+    return "geodesic"
+
+
+def trip_miles(a: Tuple[float, float], b: Tuple[float, float], model: Optional[str] = None) -> float:
+    """Rounded miles between two (lat, lng) points under `model` (default: current)."""
+    if (model or distance_model()) == "road":
+        route = drive_route(a, b)
+        if route is not None:
+            return round(route.miles, 2)
+    return round(float(geodesic(a, b).miles), 2)
+
+
+def _measure(p: str, d: str, a: Tuple[float, float], b: Tuple[float, float], model: str) -> float:
+    miles = trip_miles(a, b, model)
+    ROUTES.put(p, d, miles, symmetric=model == "geodesic", model=model)
+    return miles
+
+
+def pair_miles(p: str, d: str, p_latlng: Tuple[float, float], d_latlng: Tuple[float, float]) -> float:
+    """
+    Miles between two resolved canonical endpoints, exactly as estimate_miles
+    prices them (route-pair memo, then trip_miles under the current model).
+    """
+    if p == d:
+        return 0.0
+    model = distance_model()
+    memo = ROUTES.get(p, d, symmetric=model == "geodesic", model=model)
+    return memo if memo is not None else _measure(p, d, p_latlng, d_latlng, model)
+
+
 def estimate_miles(pickup: str, dropoff: str) -> float:
     """
-    Return rounded miles between pickup and dropoff using geodesic distance.
+    Return rounded miles between pickup and dropoff (geodesic, or drive
+    distance when DISTANCE_PROVIDER=road).
 
-    If geocoding fails for either endpoint, return a conservative default so the
-    booking flow can continue without blocking.
+    If geocoding fails for either endpoint (or misses GEOCODE_DEADLINE_SEC),
+    return a conservative default so the booking flow can continue without blocking.
 
     Args:
         pickup:  Free-form address string
@@ -114,19 +593,148 @@ def estimate_miles(pickup: str, dropoff: str) -> float:
     Returns:
         Miles as float (rounded to 2 decimals), or FALLBACK_MILES on failure.
     """
-    p = (pickup or "").strip()
-    d = (dropoff or "").strip()
+    return measure_trip(pickup, dropoff)[0]
+
+
+def measure_trip(pickup: str, dropoff: str) -> Tuple[float, bool, Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+    """
+    estimate_miles that also says whether the miles are FALLBACK_MILES
+    (an endpoint missing, unplaceable or past the deadline) and which
+    endpoints it geocoded -> (miles, fallback, pickup (lat, lng), dropoff
+    (lat, lng)). Endpoints are None when not looked up (route-pair memo
+    hit, same address) or unresolved.
+    """
+    p = canonicalize_address(pickup)
+    d = canonicalize_address(dropoff)
     if not p or not d:
-        return FALLBACK_MILES
+        return FALLBACK_MILES, True, None, None
 
     # If exact same text, treat as zero distance
-    if p.lower() == d.lower():
-        return 0.0
+    if p == d:
+        return 0.0, False, None, None
 
-    p_latlng = _coords_lat_lng(p)
-    d_latlng = _coords_lat_lng(d)
+    # Hot pairs skip geocoding and routing entirely (only geodesic is symmetric;
+    # one-way streets make road distance directional)
+    model = distance_model()
+    symmetric = model == "geodesic"
+    memo = ROUTES.get(p, d, symmetric=symmetric, model=model)
+    if memo is not None:
+        return memo, False, None, None
+
+    p_latlng, d_latlng = _lookup_pair(pickup, p, dropoff, d)
     if not p_latlng or not d_latlng:
-        return FALLBACK_MILES
+        return FALLBACK_MILES, True, p_latlng, d_latlng  # not memoized: failures may be transient
+    return _measure(p, d, p_latlng, d_latlng, model), False, p_latlng, d_latlng
+
 
-    miles = geodesic(p_latlng, d_latlng).miles
-    return round(float(miles), 2)
+def resolve_many(addresses: Iterable[str]) -> List[Tuple[str, Optional[Tuple[float, float]]]]:
+    """
+    Canonicalize and geocode many addresses at once (batch quotes).
+
+    Each distinct canonical key is looked up once: known ones inline, misses
+    concurrently on the shared pool, under GEOCODE_DEADLINE_SEC. Returns
+    (canonical_key, (lat, lng) | None) aligned with the input order.
+    """
+    raws = list(addresses)
+    keys = [canonicalize_address(a) for a in raws]
+    coords, pending = _start_lookups(zip(raws, keys))
+    if pending:
+        wait(list(pending.values()), timeout=DEADLINE_SEC)
+        coords.update({key: _result_now(f) for key, f in pending.items()})
+    return [(key, coords.get(key)) for key in keys]
+
+
+def iter_resolved(
+    addresses: Iterable[str], deadline_sec: float = DEADLINE_SEC
+) -> Iterator[Tuple[str, Optional[Tuple[float, float]]]]:
+    """
+    resolve_many as a stream: yields (canonical_key, (lat, lng) | None) once
+    per distinct key as soon as it is known (inline hits first, then misses
+    in completion order). Keys still unresolved after `deadline_sec` are
+    yielded with None; their lookups keep running and warm the caches.
+    """
+    raws = list(addresses)
+    coords, pending = _start_lookups(zip(raws, [canonicalize_address(a) for a in raws]))
+    yield from coords.items()
+    keys = {f: key for key, f in pending.items()}
+    try:
+        for f in as_completed(keys, timeout=deadline_sec):
+            yield keys.pop(f), _result_now(f)
+    except FutureTimeout:
+        for key in keys.values():
+            yield key, None
+
+
+# ----------------------------
+# Async helpers (resources/geo_async.py)
+# ----------------------------
+
+async def _lookup_async(raw: str, key: str) -> Optional[Tuple[float, float]]:
+    from resources.geo_async import get_async_geocoder  # lazy: avoids import cycle
+
+    _count_lookup(raw, key)
+    try:
+        return await get_async_geocoder().lookup(key, raw)
+    except Exception:
+        return None
+
+
+async def cached_latlng_async(address: str) -> Optional[Tuple[float, float]]:
+    """Async twin of `cached_latlng`: the durable read runs off the event loop."""
+    key = canonicalize_address(address)
+    if not key:
+        return None
+    e = _peek_local(key, address) or await asyncio.to_thread(_peek_durable, key, address)
+    return e.latlng if e is not None else None
+
+
+async def geocode_lng_lat_async(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Async twin of `geocode_lng_lat`: (lng, lat) or None, without blocking the loop.
+    """
+    addr = canonicalize_address(address)
+    if not addr:
+        return None
+    latlng = await _lookup_async(address, addr)
+    if not latlng:
+        return None
+    lat, lng = latlng
+    return (lng, lat)
+
+
+async def estimate_miles_async(pickup: str, dropoff: str) -> float:
+    """
+    Async twin of `estimate_miles`; both endpoints are resolved concurrently
+    under the same GEOCODE_DEADLINE_SEC.
+    """
+    return (await measure_trip_async(pickup, dropoff))[0]
+
+
+async def measure_trip_async(
+    pickup: str, dropoff: str
+) -> Tuple[float, bool, Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+    """Async twin of `measure_trip` -> (miles, fallback, pickup, dropoff)."""
+    p = canonicalize_address(pickup)
+    d = canonicalize_address(dropoff)
+    if not p or not d:
+        return FALLBACK_MILES, True, None, None
+    if p == d:
+        return 0.0, False, None, None
+
+    model = distance_model()
+    symmetric = model == "geodesic"
+    memo = ROUTES.get(p, d, symmetric=symmetric, model=model)
+    if memo is not None:
+        return memo, False, None, None
+
+    try:
+        p_latlng, d_latlng = await asyncio.wait_for(
+            asyncio.gather(_lookup_async(pickup, p), _lookup_async(dropoff, d)),
+            timeout=DEADLINE_SEC,
+        )
+    except asyncio.TimeoutError:
+        # Shared lookups are shielded, so they finish and warm the caches anyway
+        return FALLBACK_MILES, True, None, None
+    if not p_latlng or not d_latlng:
+        return FALLBACK_MILES, True, p_latlng, d_latlng
+    return _measure(p, d, p_latlng, d_latlng, model), False, p_latlng, d_latlng
@@ -0,0 +1,355 @@
+# resources/idempotency.py
+# --------------------------------------------------------------
+# Purpose:
+#   - `Idempotency-Key` support for POST /book/ride and POST /quote, so
+#     a client retrying on a flaky network gets the first response back
+#     instead of a second booking
+#
+# Semantics (per scope = endpoint, key = client-chosen header value):
+#   - first request with a key runs the endpoint; whatever it returns
+#     (body + status code) is stored
+#   - later requests with the same key and the same request fingerprint
+#     replay the stored body (flagged with the Idempotent-Replayed header)
+#   - a duplicate that arrives while the first is still running waits
+#     (up to IDEMPOTENCY_WAIT_SEC) for its result instead of re-running
+#     the pipeline; past that -> 409
+#   - same key, different request body -> 422
+#   - failed runs (exception) release the key so the retry runs again
+#
+# Tiers (IDEMPOTENCY_BACKEND):
+#   - "auto" (default): in-process LRU + in-flight futures, backed by the
+#     Postgres `idempotency_keys` table so duplicates landing on another
+#     worker replay / wait too; memory only while Postgres is unreachable
+#   - "postgres" | "memory" | "off"
+#
+# Bounds:
+#   - stored responses live IDEMPOTENCY_TTL_SEC (a scope may pass a
+#     shorter ttl_sec, e.g. /quote: its quote_token expires); the LRU keeps at most
+#     IDEMPOTENCY_MEMORY_MAX of them, the table IDEMPOTENCY_MAX_ROWS
+#     (dead / oldest rows evicted every IDEMPOTENCY_EVICT_EVERY claims)
+#   - a pending row whose owner died is taken over after IDEMPOTENCY_LOCK_SEC
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Postgres pool is optional (local dev may not have psycopg2 / a DB)
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "auto").lower()
+TTL_SEC = int(os.getenv("IDEMPOTENCY_TTL_SEC", "86400"))
+MEMORY_MAX = int(os.getenv("IDEMPOTENCY_MEMORY_MAX", "10000"))
+WAIT_SEC = float(os.getenv("IDEMPOTENCY_WAIT_SEC", "30"))
+LOCK_SEC = int(os.getenv("IDEMPOTENCY_LOCK_SEC", "60"))
+MAX_ROWS = int(os.getenv("IDEMPOTENCY_MAX_ROWS", "200000"))
+EVICT_EVERY = int(os.getenv("IDEMPOTENCY_EVICT_EVERY", "500"))
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+MAX_KEY_LEN = 255
+
+# Poll interval while another worker holds the key
+POLL_SEC = 0.1
+# After a Postgres error, stay memory-only for this long before retrying
+PG_RETRY_SEC = 60.0
+
+_lock = threading.Lock()
+_pg_retry_at = 0.0
+_claims = 0
+
+
+class IdempotencyError(Exception):
+    """Key misuse / still in flight; routes map it to an HTTP error."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: Any
+    expires_at: float  # epoch seconds
+
+
+@dataclass
+class _Flight:
+    fingerprint: str
+    done: "asyncio.Future[None]"
+
+
+# (scope, key) -> StoredResponse, LRU order (oldest first)
+_responses: "OrderedDict[Tuple[str, str], StoredResponse]" = OrderedDict()
+# (scope, key) -> run in progress in this process (event loop only)
+_inflight: Dict[Tuple[str, str], _Flight] = {}
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of the request (body + relevant query params)."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ----------------------------
+# Memory tier
+# ----------------------------
+
+def _memory_get(k: Tuple[str, str]) -> Optional[StoredResponse]:
+    with _lock:
+        hit = _responses.get(k)
+        if hit is None:
+            return None
+        if hit.expires_at <= time.time():
+            del _responses[k]
+            return None
+        _responses.move_to_end(k)
+        return hit
+
+
+def _memory_put(k: Tuple[str, str], stored: StoredResponse) -> None:
+    with _lock:
+        _responses[k] = stored
+        _responses.move_to_end(k)
+        while len(_responses) > max(1, MEMORY_MAX):
+            _responses.popitem(last=False)
+
+
+# ----------------------------
+# Postgres tier
+# ----------------------------
+
+def _use_pg() -> bool:
+    if BACKEND not in ("auto", "postgres") or get_conn is None:
+        return False
+    return time.time() >= _pg_retry_at
+
+
+def _pg_failed() -> None:
+    """Remember a Postgres failure; stay memory-only for a while."""
+    global _pg_retry_at
+    _pg_retry_at = time.time() + PG_RETRY_SEC
+
+
+_CLAIM_SQL = """
+    INSERT INTO idempotency_keys (scope, key, fingerprint, status, locked_until, expires_at)
+    VALUES (%(scope)s, %(key)s, %(fp)s, 'pending',
+            now() + make_interval(secs => %(lock)s), now() + make_interval(secs => %(ttl)s))
+    ON CONFLICT (scope, key) DO UPDATE
+       SET fingerprint     = EXCLUDED.fingerprint,
+           status          = 'pending',
+           response_status = NULL,
+           response        = NULL,
+           created_at      = now(),
+           locked_until    = EXCLUDED.locked_until,
+           expires_at      = EXCLUDED.expires_at
+     WHERE idempotency_keys.expires_at <= now()
+        OR (idempotency_keys.status = 'pending' AND idempotency_keys.locked_until <= now())
+    RETURNING true
+"""
+
+_ROW_SQL = """
+    SELECT fingerprint, status, response_status, response,
+           extract(epoch FROM expires_at) AS expires_at
+      FROM idempotency_keys
+     WHERE scope = %(scope)s AND key = %(key)s
+"""
+
+
+def _pg_claim(scope: str, key: str, fp: str, ttl_sec: int) -> Optional[tuple]:
+    """
+    Claim the key (new, expired, or pending past its lock). Returns None
+    when claimed, else the existing (fingerprint, status, response_status,
+    response, expires_at) row.
+    """
+    params = {"scope": scope, "key": key, "fp": fp, "lock": LOCK_SEC, "ttl": ttl_sec}
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_CLAIM_SQL, params)
+        claimed = cur.fetchone() is not None
+        row = None
+        if not claimed:
+            cur.execute(_ROW_SQL, params)
+            row = cur.fetchone()
+        conn.commit()
+    if claimed:
+        return None
+    # Row vanished between the two statements (evicted): claim again
+    return row or ("", "gone", None, None, 0.0)
+
+
+def _pg_store(scope: str, key: str, fp: str, stored: StoredResponse) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE idempotency_keys
+               SET status = 'done', response_status = %s, response = %s::jsonb
+             WHERE scope = %s AND key = %s AND fingerprint = %s
+            """,
+            (stored.status_code, json.dumps(stored.body, default=str), scope, key, fp),
+        )
+        conn.commit()
+
+
+def _pg_release(scope: str, key: str, fp: str) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM idempotency_keys WHERE scope = %s AND key = %s AND fingerprint = %s AND status = 'pending'",
+            (scope, key, fp),
+        )
+        conn.commit()
+
+
+def _pg_evict() -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM idempotency_keys WHERE expires_at <= now()")
+        cur.execute(
+            """
+            DELETE FROM idempotency_keys
+             WHERE (scope, key) IN (
+                SELECT scope, key FROM idempotency_keys
+                 WHERE status = 'done'
+                 ORDER BY created_at DESC
+                OFFSET %s
+             )
+            """,
+            (MAX_ROWS,),
+        )
+        conn.commit()
+
+
+async def _pg_call(fn, *args) -> Tuple[bool, Any]:
+    """(ok, result) of a blocking Postgres helper run off the loop; never raises."""
+    try:
+        return True, await asyncio.to_thread(fn, *args)
+    except Exception:
+        _pg_failed()
+        return False, None
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+def _replay(stored: StoredResponse, fp: str) -> StoredResponse:
+    if stored.fingerprint != fp:
+        raise IdempotencyError(422, f"{HEADER} was already used with a different request")
+    return stored
+
+
+async def _wait_pg(scope: str, key: str, fp: str, deadline: float, ttl_sec: int) -> Optional[StoredResponse]:
+    """
+    Claim the key in Postgres, or wait while another worker holds it.
+    Returns its stored response, or None once this process owns the key
+    (also when Postgres is unreachable: memory-only for this request).
+    """
+    while True:
+        ok, row = await _pg_call(_pg_claim, scope, key, fp, ttl_sec)
+        if not ok or row is None:
+            return None
+        row_fp, row_status, response_status, response, expires_at = row
+        if row_status != "gone":
+            if row_fp != fp:
+                raise IdempotencyError(422, f"{HEADER} was already used with a different request")
+            if row_status == "done":
+                return StoredResponse(fp, int(response_status), response, float(expires_at))
+        if time.monotonic() >= deadline:
+            raise IdempotencyError(409, f"a request with this {HEADER} is still in progress")
+        await asyncio.sleep(POLL_SEC)
+
+
+async def run_once(
+    scope: str,
+    key: Optional[str],
+    fp: str,
+    compute: Callable[[], Awaitable[Tuple[Any, int]]],
+    ttl_sec: Optional[int] = None,
+) -> Tuple[Any, int, bool]:
+    """
+    Run `compute` -> (body, status_code) at most once per (scope, key)
+    within the TTL (`ttl_sec`, capped at IDEMPOTENCY_TTL_SEC). Returns
+    (body, status_code, replayed). Without a key
+    (or with IDEMPOTENCY_BACKEND=off) it just runs `compute`.
+    Raises IdempotencyError (400 / 409 / 422) on key misuse or timeout.
+    """
+    global _claims
+    key = (key or "").strip()
+    if not key or BACKEND == "off":
+        body, status_code = await compute()
+        return body, status_code, False
+    if len(key) > MAX_KEY_LEN:
+        raise IdempotencyError(400, f"{HEADER} must be at most {MAX_KEY_LEN} characters")
+
+    ttl_sec = min(TTL_SEC, ttl_sec) if ttl_sec else TTL_SEC
+    k = (scope, key)
+    deadline = time.monotonic() + WAIT_SEC
+    while True:
+        hit = _memory_get(k)
+        if hit is not None:
+            hit = _replay(hit, fp)
+            return hit.body, hit.status_code, True
+        flight = _inflight.get(k)
+        if flight is None:
+            break
+        if flight.fingerprint != fp:
+            raise IdempotencyError(422, f"{HEADER} was already used with a different request")
+        # Same key in flight in this process: wait for it, then look again
+        # (its response if it succeeded, or the key is free to claim)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise IdempotencyError(409, f"a request with this {HEADER} is still in progress")
+        if flight.done.get_loop() is not asyncio.get_running_loop():
+            # Owner runs on another event loop (threaded test clients): poll
+            await asyncio.sleep(min(POLL_SEC, remaining))
+            continue
+        try:
+            await asyncio.wait_for(asyncio.shield(flight.done), remaining)
+        except asyncio.TimeoutError:
+            raise IdempotencyError(409, f"a request with this {HEADER} is still in progress")
+
+    flight = _Flight(fp, asyncio.get_running_loop().create_future())
+    _inflight[k] = flight
+    try:
+        if _use_pg():
+            stored = await _wait_pg(scope, key, fp, deadline, ttl_sec)
+            if stored is not None:
+                _memory_put(k, stored)
+                return stored.body, stored.status_code, True
+            claimed_pg = _use_pg()  # False if the claim hit a Postgres error
+        else:
+            claimed_pg = False
+
+        try:
+            body, status_code = await compute()
+        except BaseException:
+            if claimed_pg:
+                await _pg_call(_pg_release, scope, key, fp)
+            raise
+
+        stored = StoredResponse(fp, status_code, body, time.time() + ttl_sec)
+        _memory_put(k, stored)
+        if claimed_pg:
+            await _pg_call(_pg_store, scope, key, fp, stored)
+            with _lock:
+                _claims += 1
+                due = _claims % max(1, EVICT_EVERY) == 0
+            if due:
+                await _pg_call(_pg_evict)
+        return body, status_code, False
+    finally:
+        _inflight.pop(k, None)
+        if not flight.done.done():
+            flight.done.set_result(None)
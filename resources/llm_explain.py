@@ -0,0 +1,278 @@
+# resources/llm_explain.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Optional LLM paraphrase of the fare explanation (USE_LLM_EXPLANATION=1),
+#     kept off the request's critical path as far as possible
+#
+# Cache:
+#   - Keyed on (canonical pickup, canonical dropoff, fare bucket of
+#     LLM_EXPLAIN_FARE_BUCKET dollars); LRU-bounded (LLM_EXPLAIN_CACHE_MAX)
+#     with a TTL (LLM_EXPLAIN_CACHE_TTL_SEC)
+#   - The fare inside a cached sentence is stored as a placeholder and
+#     filled with the caller's exact fare, so every fare in a bucket
+#     reuses one LLM answer (answers that don't quote the fare verbatim
+#     are only reused for that same fare)
+#
+# Deadline:
+#   - Each call runs on a small pool and gets LLM_EXPLAIN_DEADLINE_SEC;
+#     on timeout the caller gets None (-> template copy) while the call
+#     finishes in the background and warms the cache. Concurrent requests
+#     for one key share a single call.
+#
+# Mode (LLM_EXPLAIN_MODE):
+#   - "inline" (default): the booking/quote waits up to the deadline
+#   - "deferred": nothing waits on the LLM; responses use a cached paraphrase
+#     or the template, bookings get the paraphrase generated in the
+#     background and stored on the job (defer_explanation), and quotes just
+#     warm the cache for the booking that usually follows
+#
+# Provider (LLM_EXPLAIN_PROVIDER):
+#   - "openai" (default): langchain ChatOpenAI, OPENAI_MODEL
+#   - "fake": local FakeFareLLM (LLM_FAKE_LATENCY_MS), for tests/benchmarks
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from resources.geo_utils import canonicalize_address
+
+USE_LLM = os.getenv("USE_LLM_EXPLANATION", "0") == "1"
+MODE = os.getenv("LLM_EXPLAIN_MODE", "inline").lower()
+DEFERRED = MODE == "deferred"
+PROVIDER = os.getenv("LLM_EXPLAIN_PROVIDER", "openai").lower()
+DEADLINE_SEC = float(os.getenv("LLM_EXPLAIN_DEADLINE_SEC", "2.0"))
+CACHE_MAX = int(os.getenv("LLM_EXPLAIN_CACHE_MAX", "2048"))
+CACHE_TTL_SEC = float(os.getenv("LLM_EXPLAIN_CACHE_TTL_SEC", "86400"))
+FARE_BUCKET = Decimal(os.getenv("LLM_EXPLAIN_FARE_BUCKET", "1.00"))
+WORKERS = int(os.getenv("LLM_EXPLAIN_WORKERS", "4"))
+FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "800"))
+
+_FARE_SLOT = "\x00fare\x00"
+
+_PROMPT = ("Explain in one sentence why the estimated fare from {pickup} to {dropoff} is ${fare}. "
+           "Be friendly and clear, with no formulas.")
+
+
+class _Reply:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+class FakeFareLLM:
+    """Stands in for the prompt | llm chain: same invoke() shape, fixed latency, no network."""
+
+    def __init__(self, latency_ms: float = FAKE_LATENCY_MS) -> None:
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def invoke(self, inputs: Dict[str, str]) -> _Reply:
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000.0)
+        return _Reply(
+            f"Your ride from {inputs['pickup']} to {inputs['dropoff']} comes to about ${inputs['fare']}, "
+            "based on the distance and current demand."
+        )
+
+
+def _build_chain():
+    if PROVIDER == "fake":
+        return FakeFareLLM()
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import ChatPromptTemplate
+    llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0,
+                     timeout=DEADLINE_SEC * 4, max_retries=0)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You write short, polished fare explanations for riders."),
+        ("human", _PROMPT),
+    ])
+    return prompt | llm
+
+
+# Optional LLM (only used if USE_LLM=1 and init succeeds)
+fare_chain = None
+if USE_LLM:
+    try:
+        fare_chain = _build_chain()
+    except Exception:
+        fare_chain = None  # fail-soft: stick with template
+
+
+class ExplanationCache:
+    """LRU + TTL map of key -> (expires_at, text with fare placeholder, fare it was written for)."""
+
+    def __init__(self, max_size: int = CACHE_MAX, ttl_sec: float = CACHE_TTL_SEC) -> None:
+        self.max_size, self.ttl_sec = max_size, ttl_sec
+        self._data: "OrderedDict[Tuple[str, str, int], Tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Tuple[str, str, int], fare: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            exp, text, written_for = item
+            if _FARE_SLOT not in text and written_for != fare:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return text.replace(_FARE_SLOT, fare)
+
+    def put(self, key: Tuple[str, str, int], text: str, fare: str) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_sec, text.replace(f"${fare}", f"${_FARE_SLOT}"), fare)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+CACHE = ExplanationCache()
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="llm-explain")
+_inflight: Dict[Tuple[str, str, int], Future] = {}
+_inflight_lock = threading.Lock()
+_counters = {"calls": 0, "timeouts": 0, "errors": 0, "deferred": 0}
+
+
+def cache_key(pickup: str, dropoff: str, fare: Decimal) -> Tuple[str, str, int]:
+    return canonicalize_address(pickup), canonicalize_address(dropoff), int(fare // FARE_BUCKET)
+
+
+def _call(chain, key: Tuple[str, str, int], pickup: str, dropoff: str, fare: str) -> Optional[str]:
+    try:
+        res = chain.invoke({"pickup": pickup or "the pickup", "dropoff": dropoff or "the destination", "fare": fare})
+        text = (getattr(res, "content", "") or "").strip()
+        if text:
+            CACHE.put(key, text, fare)  # even if the caller already gave up waiting
+        return text or None
+    except Exception:
+        _counters["errors"] += 1
+        return None
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def submit_explanation(pickup: str, dropoff: str, fare: Decimal, chain=None) -> Optional[Future]:
+    """Start (or join) the LLM call for this key; None when no LLM is configured."""
+    chain = chain or fare_chain
+    if chain is None:
+        return None
+    key = cache_key(pickup, dropoff, fare)
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is None:
+            _counters["calls"] += 1
+            fut = _pool.submit(_call, chain, key, pickup, dropoff, f"{fare:.2f}")
+            _inflight[key] = fut
+    return fut
+
+
+def llm_explanation(
+    pickup: str,
+    dropoff: str,
+    fare: Decimal,
+    deadline_sec: float = DEADLINE_SEC,
+    chain=None,
+) -> Optional[str]:
+    """
+    LLM paraphrase for this trip + fare: cached, else one call bounded by
+    `deadline_sec`. None means "use the template" (no LLM, timeout, error).
+    """
+    if (chain or fare_chain) is None:
+        return None
+    fare_str = f"{fare:.2f}"
+    cached = CACHE.get(cache_key(pickup, dropoff, fare), fare_str)
+    if cached is not None:
+        return cached
+    fut = submit_explanation(pickup, dropoff, fare, chain)
+    try:
+        fut.result(timeout=deadline_sec)
+    except FutureTimeout:
+        _counters["timeouts"] += 1
+        return None
+    # Read back through the cache: a shared call may have been for another
+    # fare in the bucket, and the cache puts this caller's fare in
+    return CACHE.get(cache_key(pickup, dropoff, fare), fare_str)
+
+
+async def llm_explanation_async(
+    pickup: str,
+    dropoff: str,
+    fare: Decimal,
+    deadline_sec: float = DEADLINE_SEC,
+    chain=None,
+) -> Optional[str]:
+    """llm_explanation for async callers: awaits the pool call, never blocks the loop."""
+    if (chain or fare_chain) is None:
+        return None
+    fare_str = f"{fare:.2f}"
+    cached = CACHE.get(cache_key(pickup, dropoff, fare), fare_str)
+    if cached is not None:
+        return cached
+    fut = submit_explanation(pickup, dropoff, fare, chain)
+    try:
+        # shield: giving up on the wait must not cancel the shared call
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), timeout=deadline_sec)
+    except asyncio.TimeoutError:
+        _counters["timeouts"] += 1
+        return None
+    return CACHE.get(cache_key(pickup, dropoff, fare), fare_str)
+
+
+def cached_explanation(pickup: str, dropoff: str, fare: Decimal) -> Optional[str]:
+    """Cached paraphrase for this trip + fare, or None; never calls the LLM."""
+    return CACHE.get(cache_key(pickup, dropoff, fare), f"{fare:.2f}")
+
+
+def defer_explanation(
+    pickup: str,
+    dropoff: str,
+    fare: Decimal,
+    on_done: Callable[[Optional[str]], None],
+    chain=None,
+) -> bool:
+    """
+    Generate the paraphrase in the background and hand it to `on_done`
+    (None on error) from a pool thread. False when no LLM is configured.
+    """
+    fut = submit_explanation(pickup, dropoff, fare, chain)
+    if fut is None:
+        return False
+    key, fare_str = cache_key(pickup, dropoff, fare), f"{fare:.2f}"
+
+    def _done(_: Future) -> None:
+        try:
+            on_done(CACHE.get(key, fare_str))
+        except Exception:
+            _counters["errors"] += 1  # fail-soft: the job keeps the template
+
+    _counters["deferred"] += 1
+    fut.add_done_callback(_done)
+    return True
+
+
+def explain_stats() -> Dict[str, Any]:
+    return {"enabled": fare_chain is not None, "provider": PROVIDER, "mode": MODE,
+            **_counters, "cache": CACHE.stats()}
@@ -0,0 +1,151 @@
+# resources/quote_token.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Short-lived signed quote tokens: /quote and /fare/estimate hand one
+#     out, /book/ride accepts it and reuses the quoted coordinates, miles
+#     and fare instead of re-geocoding and re-pricing the trip
+#
+# Token:
+#   - base64url(JSON payload) + "." + HMAC-SHA256 hex (same shape as the
+#     driver tokens in routes/auth.py), keyed by QUOTE_TOKEN_SECRET
+#     (falls back to JWT_SECRET); with neither set, tokens are off: none
+#     are issued and incoming ones are ignored (logged once)
+#   - Payload: canonical pickup/dropoff, their (lat, lng), miles, fare,
+#     expiry (QUOTE_TOKEN_TTL_SEC)
+#   - A token only counts for the same canonical addresses it was issued
+#     for; anything invalid, expired or mismatched is ignored and the
+#     booking prices the trip from scratch
+#   - On redeem, miles and fare must be finite and positive, and the fare
+#     within QUOTE_TOKEN_FARE_TOLERANCE of what calculate_base_fare gives
+#     for those miles now (time band / surge may move within the TTL)
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional, Tuple
+
+from resources.fare_engine import calculate_base_fare
+from resources.geo_utils import canonicalize_address
+from resources.zones import zone_of
+
+_SECRET = (os.getenv("QUOTE_TOKEN_SECRET") or os.getenv("JWT_SECRET") or "").encode()
+TTL_SEC = int(os.getenv("QUOTE_TOKEN_TTL_SEC", "600"))
+FARE_TOLERANCE = Decimal(os.getenv("QUOTE_TOKEN_FARE_TOLERANCE", "0.25"))
+
+_VERSION = 1
+
+_warned = False
+
+
+def _enabled() -> bool:
+    """False (warned about once) when no signing secret is configured."""
+    global _warned
+    if not _SECRET and not _warned:
+        _warned = True
+        logging.getLogger(__name__).warning(
+            "quote tokens disabled: set QUOTE_TOKEN_SECRET (or JWT_SECRET) to enable them"
+        )
+    return bool(_SECRET)
+
+
+def _finite(x: Any) -> Optional[float]:
+    try:
+        x = float(x)
+    except (TypeError, ValueError):
+        return None
+    return x if math.isfinite(x) else None
+
+
+def _sig(body: str) -> str:
+    # Domain-separated, so a quote token can never pass as another signed token
+    return hmac.new(_SECRET, b"quote." + body.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_quote_token(
+    pickup: str,
+    dropoff: str,
+    pickup_latlng: Tuple[float, float],
+    dropoff_latlng: Tuple[float, float],
+    miles: float,
+    fare: str,
+    ttl_sec: int = TTL_SEC,
+) -> Optional[Tuple[str, int]]:
+    """
+    Sign a quote -> (token, expires_at epoch seconds); None when tokens are
+    off or the miles aren't a positive distance (nothing redeemable).
+    """
+    if not _enabled() or not (_finite(miles) or 0.0) > 0:
+        return None
+    exp = int(time.time()) + ttl_sec
+    payload = {
+        "v": _VERSION,
+        "p": canonicalize_address(pickup),
+        "d": canonicalize_address(dropoff),
+        "pc": [round(pickup_latlng[0], 6), round(pickup_latlng[1], 6)],
+        "dc": [round(dropoff_latlng[0], 6), round(dropoff_latlng[1], 6)],
+        "mi": float(miles),
+        "f": str(fare),
+        "exp": exp,
+    }
+    body = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+    return f"{body}.{_sig(body)}", exp
+
+
+def verify_quote_token(token: str, pickup: str, dropoff: str) -> Optional[Dict[str, Any]]:
+    """Payload if the token is authentic, unexpired and for this trip; else None."""
+    if not _enabled():
+        return None
+    try:
+        body, sig = (token or "").rsplit(".", 1)
+        if not hmac.compare_digest(_sig(body), sig):
+            return None
+        payload = json.loads(base64.urlsafe_b64decode(body + "===").decode())
+    except Exception:
+        return None
+    if payload.get("v") != _VERSION or time.time() > float(payload.get("exp", 0)):
+        return None
+    if payload.get("p") != canonicalize_address(pickup) or payload.get("d") != canonicalize_address(dropoff):
+        return None
+    return payload
+
+
+def redeem_quote_token(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    State patch from a valid `quote_token` on the booking state: coordinates
+    for dispatch, miles + fare for explain_fare/create_job, and
+    `fare_quoted=True` so those steps don't recompute. {} if not valid.
+    """
+    token = state.get("quote_token")
+    if not token:
+        return {}
+    payload = verify_quote_token(token, state.get("pickup_location", ""), state.get("dropoff_location", ""))
+    if payload is None:
+        return {}
+    try:
+        (plat, plng), (dlat, dlng) = [[_finite(v) for v in payload[k]] for k in ("pc", "dc")]
+        miles, fare = _finite(payload["mi"]), Decimal(str(payload["f"]))
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        return {}
+    if None in (plat, plng, dlat, dlng, miles) or not (miles > 0 and fare.is_finite() and fare > 0):
+        return {}
+    expected = calculate_base_fare(miles, pickup_zone=zone_of(plat, plng), dropoff_zone=zone_of(dlat, dlng))
+    if abs(fare - expected) > expected * FARE_TOLERANCE:
+        return {}
+    return {
+        "pickup_lat": plat,
+        "pickup_lng": plng,
+        "dropoff_lat": dlat,
+        "dropoff_lng": dlng,
+        "estimated_miles": miles,
+        "fare_estimate": payload["f"],
+        "fare_quoted": True,
+    }
@@ -0,0 +1,267 @@
+# resources/rate_limiter.py
+# --------------------------------------------------------------
+# Purpose:
+#   - One global token bucket for Nominatim (usage policy ~1 req/s)
+#     shared by every uvicorn/gunicorn worker, so we stop getting
+#     throttled under load
+#   - Priority queue in front of it: booking lookups go ahead of
+#     speculative quote lookups
+#
+# Bucket backends (NOMINATIM_RATE_BACKEND):
+#   - "auto" (default): Postgres (advisory lock + rate_limit_buckets row),
+#     falling back to SQLite when Postgres is unreachable
+#   - "postgres" | "sqlite" (BEGIN IMMEDIATE file lock) | "local" (per process)
+#
+# Usage:
+#   with geocode_priority(PRIORITY_BOOKING):
+#       ...                      # geocodes in here jump the queue
+#   if NOMINATIM_LIMITER.acquire():
+#       ...                      # safe to call OSM now
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+# Lower number = served first
+PRIORITY_BOOKING = 0
+PRIORITY_QUOTE = 1
+PRIORITY_BACKGROUND = 2
+
+RATE_PER_SEC = float(os.getenv("NOMINATIM_RATE_PER_SEC", "1"))
+BURST = float(os.getenv("NOMINATIM_BURST", "1"))
+MAX_WAIT_SEC = float(os.getenv("NOMINATIM_MAX_WAIT_SEC", "8"))
+BACKEND = os.getenv("NOMINATIM_RATE_BACKEND", "auto").lower()
+SQLITE_PATH = os.getenv("NOMINATIM_RATE_SQLITE", "rate_limit.db")
+BUCKET_NAME = "nominatim"
+
+# Priority of geocodes issued from the current request/task
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("geocode_priority", default=PRIORITY_QUOTE)
+
+
+@contextmanager
+def geocode_priority(priority: int) -> Iterator[None]:
+    """Run the enclosed geocodes (including pool/async work started here) at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+# ----------------------------
+# Token bucket backends
+# Each take() returns 0.0 when a token was taken, else seconds to wait.
+# ----------------------------
+
+def _refill(tokens: float, elapsed: float, rate: float, burst: float) -> Tuple[float, float]:
+    tokens = min(burst, tokens + max(0.0, elapsed) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class _LocalBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate, self.burst = rate, burst
+        self.tokens, self.updated = burst, time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens, wait = _refill(self.tokens, now - self.updated, self.rate, self.burst)
+            self.updated = now
+            return wait
+
+
+class _SqliteBucket:
+    """Cross-process on one host: BEGIN IMMEDIATE serializes writers on the file."""
+
+    def __init__(self, path: str, name: str, rate: float, burst: float) -> None:
+        self.path, self.name, self.rate, self.burst = path, name, rate, burst
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self) -> float:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens, updated = (row[0], row[1]) if row else (self.burst, now)
+            tokens, wait = _refill(tokens, now - updated, self.rate, self.burst)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, tokens, now),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+
+class _PgBucket:
+    """Cross-host: a transaction-scoped advisory lock guards the bucket row."""
+
+    def __init__(self, name: str, rate: float, burst: float) -> None:
+        self.name, self.rate, self.burst = name, rate, burst
+        self.lock_key = zlib.crc32(f"rate_limit:{name}".encode())
+
+    def take(self) -> float:
+        with get_conn() as conn, conn.cursor() as cur:
+            try:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (self.lock_key,))
+                cur.execute(
+                    "SELECT tokens, extract(epoch FROM clock_timestamp()) - updated_at, "
+                    "extract(epoch FROM clock_timestamp()) "
+                    "FROM rate_limit_buckets WHERE name = %s",
+                    (self.name,),
+                )
+                row = cur.fetchone()
+                if row:
+                    tokens, wait = _refill(float(row[0]), float(row[1]), self.rate, self.burst)
+                    now = float(row[2])
+                else:
+                    tokens, wait = _refill(self.burst, 0.0, self.rate, self.burst)
+                    now = time.time()
+                cur.execute(
+                    """
+                    INSERT INTO rate_limit_buckets (name, tokens, updated_at)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (name) DO UPDATE
+                    SET tokens = EXCLUDED.tokens, updated_at = EXCLUDED.updated_at
+                    """,
+                    (self.name, tokens, now),
+                )
+                conn.commit()  # also releases the advisory lock
+                return wait
+            except Exception:
+                conn.rollback()
+                raise
+
+
+# ----------------------------
+# Priority-queued limiter
+# ----------------------------
+
+class RateLimiter:
+    """
+    Waiters queue by (priority, arrival); only the head of the queue talks to
+    the shared bucket, so a booking never waits behind queued quote lookups.
+    The bucket round trip (Postgres / SQLite) runs outside the condition's
+    lock: the head reserves the single take slot, calls the bucket unlocked,
+    then re-locks to record the grant or wait for a refill.
+    """
+
+    PG_RETRY_SEC = 60.0
+
+    def __init__(self, name: str = BUCKET_NAME, rate: float = RATE_PER_SEC, burst: float = BURST,
+                 backend: str = BACKEND) -> None:
+        self.rate = max(rate, 1e-6)
+        self.backend = backend
+        self._local = _LocalBucket(self.rate, max(1.0, burst))
+        self._sqlite: Optional[_SqliteBucket] = None
+        self._pg = _PgBucket(name, self.rate, max(1.0, burst)) if get_conn else None
+        self._name, self._burst = name, max(1.0, burst)
+        self._pg_retry_at = 0.0
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._taking = False  # a waiter is talking to the bucket (lock released)
+        self.granted = 0
+        self.timeouts = 0
+
+    def _take(self) -> float:
+        if self.backend in ("auto", "postgres") and self._pg and time.time() >= self._pg_retry_at:
+            try:
+                return self._pg.take()
+            except Exception:
+                self._pg_retry_at = time.time() + self.PG_RETRY_SEC
+        if self.backend in ("auto", "sqlite"):
+            try:
+                if self._sqlite is None:
+                    self._sqlite = _SqliteBucket(SQLITE_PATH, self._name, self.rate, self._burst)
+                return self._sqlite.take()
+            except Exception:
+                pass
+        return self._local.take()
+
+    def acquire(self, priority: Optional[int] = None, timeout: float = MAX_WAIT_SEC) -> bool:
+        """
+        Block until a request slot is granted (True) or `timeout` passes (False).
+        Priority defaults to the current `geocode_priority`.
+        """
+        ticket = (current_priority() if priority is None else priority, next(self._seq))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return False
+                    if self._queue[0] != ticket or self._taking:
+                        self._cond.wait(remaining)
+                        continue
+                    self._taking = True
+                    self._cond.release()
+                    try:
+                        wait = self._take()
+                    finally:
+                        self._cond.acquire()
+                        self._taking = False
+                        self._cond.notify_all()
+                    if wait <= 0:
+                        self.granted += 1
+                        return True
+                    # Sleep until a token refills; a higher-priority arrival
+                    # takes the head and we re-queue behind it.
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"queued": len(self._queue), "granted": self.granted, "timeouts": self.timeouts}
+
+
+# Shared limiter for every OSM/Nominatim call in this process
+NOMINATIM_LIMITER = RateLimiter()
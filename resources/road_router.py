@@ -0,0 +1,598 @@
+# resources/road_router.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Offline road routing: drive distance + duration between two
+#     points on a prebuilt road graph (e.g. a DFW OSM extract), so
+#     fares and ETAs follow highways instead of the straight line
+#   - No network call per quote; a query is a few milliseconds
+#
+# Graph file (ROAD_GRAPH_PATH, .npz written by `build` below):
+#   - lat, lng            node coordinates (degrees)
+#   - indptr, indices     forward adjacency (CSR, sorted by source)
+#   - miles, seconds      per-edge length and free-flow drive time
+#   The reverse adjacency for the backward search is derived at load.
+#
+#   - ch_*                contraction hierarchy (optional, see `contract`)
+#
+# Search (fastest path by drive time; miles summed along it):
+#   - Contraction hierarchy when the file has one: bidirectional upward
+#     Dijkstra with stall-on-demand, a few hundred nodes per query
+#   - Otherwise bidirectional A* with the symmetric "average" potential;
+#     heuristic = straight-line miles at the graph's top speed
+#     (admissible + consistent, so the result is still exact)
+#   - Endpoints snap to the nearest graph node via a grid index; the
+#     snap legs are added at ROAD_ACCESS_MPH
+#
+# Build from an OSM XML extract (osmium cat dfw.osm.pbf -o dfw.osm):
+#   python -m resources.road_router build dfw.osm resources/data/dfw_roads.npz
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from resources.geo_distance import MEAN_RADIUS_MI, lambert_miles
+
+GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH", "resources/data/dfw_roads.npz")
+SNAP_MAX_MI = float(os.getenv("ROAD_SNAP_MAX_MI", "2.0"))
+ACCESS_MPH = float(os.getenv("ROAD_ACCESS_MPH", "15"))
+
+# Witness searches during contraction settle at most this many nodes
+# (lower = faster build, a few more shortcuts; never affects correctness)
+CH_WITNESS_LIMIT = 60
+
+# Grid cell for snapping (degrees, ~0.7 mi of latitude)
+SNAP_CELL_DEG = 0.01
+# Keeps the haversine heuristic below the ellipsoidal edge lengths
+_HEURISTIC_SLACK = 0.995
+
+
+@dataclass(frozen=True)
+class DriveRoute:
+    """Drive distance and duration between two points (snap legs included)."""
+    miles: float
+    seconds: float
+
+    @property
+    def minutes(self) -> float:
+        return self.seconds / 60.0
+
+
+# ----------------------------
+# Graph + search
+# ----------------------------
+
+class RoadGraph:
+    """
+    Road graph in CSR form. Queries are thread-safe; `contract` is a build step.
+    """
+
+    CH_KEYS = tuple(f"ch_{d}_{k}" for d in ("up", "down") for k in ("indptr", "indices", "seconds", "miles"))
+
+    def __init__(self, lat, lng, indptr, indices, miles, seconds, ch: Optional[dict] = None) -> None:
+        self.lat = np.asarray(lat, dtype=float)
+        self.lng = np.asarray(lng, dtype=float)
+        n = len(self.lat)
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        miles = np.asarray(miles, dtype=float)
+        seconds = np.asarray(seconds, dtype=float)
+
+        # Reverse CSR (edges grouped by target) for the backward search
+        src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        rindptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=n), out=rindptr[1:])
+
+        # The hot loop is pure Python: plain lists index much faster than arrays
+        self._fwd = (indptr.tolist(), indices.tolist(), seconds.tolist(), miles.tolist())
+        self._bwd = (rindptr.tolist(), src[order].tolist(), seconds[order].tolist(), miles[order].tolist())
+        self._lat_r = np.radians(self.lat).tolist()
+        self._lng_r = np.radians(self.lng).tolist()
+        self._cos_lat = np.cos(np.radians(self.lat)).tolist()
+
+        # Fastest edge bounds the heuristic (seconds per mile)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mph = np.where(seconds > 0, miles / seconds * 3600.0, 0.0)
+        self.max_mph = float(mph.max()) if len(mph) else 65.0
+        self._sec_per_mi = 3600.0 * _HEURISTIC_SLACK / max(self.max_mph, 1.0)
+
+        # Snap grid: node ids sorted by cell
+        cells = self._cell(self.lat, self.lng)
+        self._grid_order = np.argsort(cells, kind="stable")
+        self._grid_cells = cells[self._grid_order]
+
+        self.nodes = n
+        self.edges = len(indices)
+        self.queries = 0
+        self.settled = 0
+
+        # Contraction hierarchy: "up" = edges to higher-ranked nodes (forward
+        # search), "down" = reversed edges from higher-ranked nodes (backward)
+        self._ch: Optional[Tuple[tuple, tuple]] = None
+        if ch is not None:
+            self._set_ch(ch)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with np.load(path) as z:
+            ch = {k: z[k] for k in cls.CH_KEYS} if all(k in z for k in cls.CH_KEYS) else None
+            return cls(z["lat"], z["lng"], z["indptr"], z["indices"], z["miles"], z["seconds"], ch=ch)
+
+    def save(self, path: str) -> None:
+        indptr, indices, seconds, miles = self._fwd
+        arrays = {
+            "lat": self.lat, "lng": self.lng,
+            "indptr": np.asarray(indptr, dtype=np.int64),
+            "indices": np.asarray(indices, dtype=np.int32),
+            "miles": np.asarray(miles, dtype=float),
+            "seconds": np.asarray(seconds, dtype=float),
+        }
+        if self._ch is not None:
+            for name, (ip, ix, sec, mi) in zip(("up", "down"), self._ch):
+                arrays[f"ch_{name}_indptr"] = np.asarray(ip, dtype=np.int64)
+                arrays[f"ch_{name}_indices"] = np.asarray(ix, dtype=np.int32)
+                arrays[f"ch_{name}_seconds"] = np.asarray(sec, dtype=float)
+                arrays[f"ch_{name}_miles"] = np.asarray(mi, dtype=float)
+        np.savez_compressed(path, **arrays)
+
+    @property
+    def has_ch(self) -> bool:
+        return self._ch is not None
+
+    def _set_ch(self, ch: dict) -> None:
+        self._ch = tuple(
+            tuple(np.asarray(ch[f"ch_{d}_{k}"]).tolist() for k in ("indptr", "indices", "seconds", "miles"))
+            for d in ("up", "down")
+        )
+
+    # ---- snapping ----
+
+    @staticmethod
+    def _cell(lat, lng):
+        row = np.floor(np.asarray(lat) / SNAP_CELL_DEG).astype(np.int64)
+        col = np.floor(np.asarray(lng) / SNAP_CELL_DEG).astype(np.int64)
+        return row * 100_000 + col
+
+    def snap(self, lat: float, lng: float, max_miles: float = SNAP_MAX_MI) -> Optional[Tuple[int, float]]:
+        """Nearest node within `max_miles` -> (node, miles), else None."""
+        rings = max(1, int(math.ceil(max_miles / (SNAP_CELL_DEG * 69.0 * 0.8))))
+        base = int(self._cell(lat, lng))
+        for ring in range(1, rings + 1):
+            ids: List[np.ndarray] = []
+            for dr in range(-ring, ring + 1):
+                lo = np.searchsorted(self._grid_cells, base + dr * 100_000 - ring, "left")
+                hi = np.searchsorted(self._grid_cells, base + dr * 100_000 + ring, "right")
+                if hi > lo:
+                    ids.append(self._grid_order[lo:hi])
+            if not ids:
+                continue
+            cand = np.concatenate(ids)
+            d = lambert_miles(lat, lng, self.lat[cand], self.lng[cand])
+            i = int(np.argmin(d))
+            if d[i] <= max_miles:
+                return int(cand[i]), float(d[i])
+            return None
+        return None
+
+    # ---- search ----
+
+    def _h(self, a: int, b: int) -> float:
+        """Lower bound on drive seconds between nodes a and b."""
+        la, lb = self._lat_r[a], self._lat_r[b]
+        s = math.sin((lb - la) / 2.0) ** 2 + self._cos_lat[a] * self._cos_lat[b] * math.sin(
+            (self._lng_r[b] - self._lng_r[a]) / 2.0) ** 2
+        return 2.0 * MEAN_RADIUS_MI * math.asin(min(1.0, math.sqrt(s))) * self._sec_per_mi
+
+    def shortest(self, s: int, t: int) -> Optional[Tuple[float, float]]:
+        """
+        Fastest path s -> t -> (seconds, miles), or None if unreachable.
+        """
+        self.queries += 1
+        if s == t:
+            return 0.0, 0.0
+        return self._ch_query(s, t) if self._ch is not None else self._astar(s, t)
+
+    def _astar(self, s: int, t: int) -> Optional[Tuple[float, float]]:
+        pot: Dict[int, float] = {}
+
+        def pf(v: int) -> float:
+            p = pot.get(v)
+            if p is None:
+                p = pot[v] = (self._h(v, t) - self._h(s, v)) / 2.0
+            return p
+
+        inf = float("inf")
+        dist = ({s: 0.0}, {t: 0.0})
+        dmiles = ({s: 0.0}, {t: 0.0})
+        heaps = ([(pf(s), s)], [(-pf(t), t)])
+        done = (set(), set())
+        sign = (1.0, -1.0)
+        best, meet = inf, -1
+        settled = 0
+
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            _, u = heapq.heappop(heaps[side])
+            if u in done[side]:
+                continue
+            done[side].add(u)
+            settled += 1
+
+            d_me, m_me, d_other = dist[side], dmiles[side], dist[1 - side]
+            indptr, indices, secs, mis = self._fwd if side == 0 else self._bwd
+            du, mu = d_me[u], m_me[u]
+            for i in range(indptr[u], indptr[u + 1]):
+                v = indices[i]
+                nd = du + secs[i]
+                if nd < d_me.get(v, inf):
+                    d_me[v] = nd
+                    m_me[v] = mu + mis[i]
+                    heapq.heappush(heaps[side], (nd + sign[side] * pf(v), v))
+                    other = d_other.get(v)
+                    if other is not None and nd + other < best:
+                        best, meet = nd + other, v
+
+        self.settled += settled
+        if meet < 0:
+            return None
+        return best, dmiles[0][meet] + dmiles[1][meet]
+
+    def _ch_query(self, s: int, t: int) -> Optional[Tuple[float, float]]:
+        inf = float("inf")
+        up, down = self._ch
+        graphs = (up, down)
+        dist = ({s: 0.0}, {t: 0.0})
+        dmiles = ({s: 0.0}, {t: 0.0})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        best, meet = inf, -1
+        settled = 0
+
+        while heaps[0] or heaps[1]:
+            if not heaps[1] or (heaps[0] and heaps[0][0][0] <= heaps[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            d, u = heapq.heappop(heaps[side])
+            if d >= best:
+                heaps[side].clear()  # this direction can't improve the answer
+                continue
+            d_me = dist[side]
+            if d > d_me[u]:
+                continue
+            settled += 1
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best, meet = d + other, u
+
+            # Stall-on-demand: a higher node already reaches u more cheaply
+            rip, rix, rsec, _ = graphs[1 - side]
+            if any(d_me.get(rix[i], inf) + rsec[i] < d for i in range(rip[u], rip[u + 1])):
+                continue
+
+            m_me = dmiles[side]
+            indptr, indices, secs, mis = graphs[side]
+            mu = m_me[u]
+            for i in range(indptr[u], indptr[u + 1]):
+                v = indices[i]
+                nd = d + secs[i]
+                if nd < d_me.get(v, inf):
+                    d_me[v] = nd
+                    m_me[v] = mu + mis[i]
+                    heapq.heappush(heaps[side], (nd, v))
+
+        self.settled += settled
+        if meet < 0:
+            return None
+        return best, dmiles[0][meet] + dmiles[1][meet]
+
+    def contract(self, witness_limit: int = CH_WITNESS_LIMIT) -> None:
+        """
+        Build the contraction hierarchy in place (offline; minutes for a metro
+        extract). Nodes are contracted in lazy edge-difference order; a
+        shortcut u->w replaces u->v->w unless a local witness search finds a
+        path at least as fast that avoids v.
+        """
+        n = self.nodes
+        inf = float("inf")
+        ip, ix, sc, mi = self._fwd
+        out: List[Dict[int, Tuple[float, float]]] = [{} for _ in range(n)]
+        inn: List[Dict[int, Tuple[float, float]]] = [{} for _ in range(n)]
+        for u in range(n):
+            for k in range(ip[u], ip[u + 1]):
+                v = ix[k]
+                e = out[u].get(v)
+                if v != u and (e is None or sc[k] < e[0]):
+                    out[u][v] = inn[v][u] = (sc[k], mi[k])
+
+        def witness(src: int, skip: int, limit: float, targets: int) -> Dict[int, float]:
+            dist = {src: 0.0}
+            heap = [(0.0, src)]
+            settled = 0
+            while heap:
+                d, x = heapq.heappop(heap)
+                if d > dist[x]:
+                    continue
+                settled += 1
+                if x in outs_v:
+                    targets -= 1
+                if d > limit or settled > witness_limit or targets <= 0:
+                    break
+                for y, (c, _) in out[x].items():
+                    nd = d + c
+                    if y != skip and nd < dist.get(y, inf):
+                        dist[y] = nd
+                        heapq.heappush(heap, (nd, y))
+            return dist
+
+        outs_v: Dict[int, Tuple[float, float]] = {}
+
+        def shortcuts(v: int) -> List[Tuple[int, int, float, float]]:
+            nonlocal outs_v
+            found = []
+            outs_v = outs = out[v]
+            if not outs:
+                return found
+            top = max(c for c, _ in outs.values())
+            for u, (cu, mu) in inn[v].items():
+                dist = witness(u, v, cu + top, len(outs))
+                for w, (cw, mw) in outs.items():
+                    if w != u and dist.get(w, inf) > cu + cw:
+                        found.append((u, w, cu + cw, mu + mw))
+            return found
+
+        def priority(v: int, added: list) -> int:
+            # Edge difference, spread over the graph by contracted-neighbour
+            # count and depth so the remaining core stays sparse
+            return 2 * (len(added) - len(inn[v]) - len(out[v])) + removed[v] + level[v]
+
+        removed = [0] * n
+        level = [0] * n
+        done = [False] * n
+        up: List[List[Tuple[int, float, float]]] = [[] for _ in range(n)]
+        down: List[List[Tuple[int, float, float]]] = [[] for _ in range(n)]
+        heap = [(priority(v, shortcuts(v)), v) for v in range(n)]
+        heapq.heapify(heap)
+
+        while heap:
+            _, v = heapq.heappop(heap)
+            if done[v]:
+                continue
+            added = shortcuts(v)
+            prio = priority(v, added)
+            if heap and prio > heap[0][0]:
+                heapq.heappush(heap, (prio, v))  # lazy update: not the cheapest any more
+                continue
+
+            done[v] = True
+            neighbours = set(out[v]) | set(inn[v])
+            for w, (c, m) in out[v].items():
+                up[v].append((w, c, m))
+                del inn[w][v]
+            for u, (c, m) in inn[v].items():
+                down[v].append((u, c, m))
+                del out[u][v]
+            out[v], inn[v] = {}, {}
+            for u, w, c, m in added:
+                e = out[u].get(w)
+                if e is None or c < e[0]:
+                    out[u][w] = inn[w][u] = (c, m)
+            for x in neighbours:
+                removed[x] += 1
+                level[x] = max(level[x], level[v] + 1)
+
+        ch = {}
+        for name, adj in (("up", up), ("down", down)):
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum([len(a) for a in adj], out=indptr[1:])
+            flat = [e for a in adj for e in a]
+            ch[f"ch_{name}_indptr"] = indptr
+            ch[f"ch_{name}_indices"] = np.array([e[0] for e in flat], dtype=np.int64)
+            ch[f"ch_{name}_seconds"] = np.array([e[1] for e in flat], dtype=float)
+            ch[f"ch_{name}_miles"] = np.array([e[2] for e in flat], dtype=float)
+        self._set_ch(ch)
+
+    def route(self, a: Tuple[float, float], b: Tuple[float, float]) -> Optional[DriveRoute]:
+        """
+        Drive route between two (lat, lng) points, or None when either end is
+        off the graph or no path exists (callers fall back to straight-line).
+        """
+        sa = self.snap(*a)
+        sb = self.snap(*b)
+        if sa is None or sb is None:
+            return None
+        found = self.shortest(sa[0], sb[0])
+        if found is None:
+            return None
+        seconds, miles = found
+        access = sa[1] + sb[1]
+        return DriveRoute(miles + access, seconds + access / max(ACCESS_MPH, 1.0) * 3600.0)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "nodes": self.nodes,
+            "edges": self.edges,
+            "max_mph": round(self.max_mph, 1),
+            "hierarchy": self._ch is not None,
+            "queries": self.queries,
+            "avg_settled": round(self.settled / self.queries, 1) if self.queries else 0.0,
+        }
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+
+_graph: Optional[RoadGraph] = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get_road_graph() -> Optional[RoadGraph]:
+    """
+    The graph at ROAD_GRAPH_PATH, loaded once per process; None when the file
+    is missing or unreadable (road routing is then simply unavailable).
+    """
+    global _graph, _loaded
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                try:
+                    _graph = RoadGraph.load(GRAPH_PATH) if os.path.exists(GRAPH_PATH) else None
+                except Exception:
+                    _graph = None
+                _loaded = True
+    return _graph
+
+
+def set_road_graph(graph: Optional[RoadGraph]) -> None:
+    """Install a graph directly (tests, scripts, hot swaps)."""
+    global _graph, _loaded
+    with _load_lock:
+        _graph, _loaded = graph, True
+
+
+def drive_route(a: Tuple[float, float], b: Tuple[float, float]) -> Optional[DriveRoute]:
+    """Drive route between (lat, lng) points on the shared graph, or None."""
+    g = get_road_graph()
+    return g.route(a, b) if g is not None else None
+
+
+# ----------------------------
+# Builder (OSM XML -> .npz)
+# ----------------------------
+
+# Free-flow speeds (mph) when a way has no usable maxspeed tag
+HIGHWAY_MPH: Dict[str, float] = {
+    "motorway": 65, "motorway_link": 45, "trunk": 55, "trunk_link": 40,
+    "primary": 45, "primary_link": 35, "secondary": 40, "secondary_link": 30,
+    "tertiary": 35, "tertiary_link": 25, "unclassified": 30, "residential": 25,
+    "living_street": 15, "service": 15,
+}
+
+
+def _maxspeed_mph(tag: Optional[str]) -> Optional[float]:
+    if not tag:
+        return None
+    parts = tag.replace("mph", " mph").split()
+    try:
+        v = float(parts[0])
+    except (ValueError, IndexError):
+        return None
+    return v if "mph" in parts else v / 1.609344
+
+
+def _iter_osm(path: str) -> Iterator[Tuple[str, dict, list]]:
+    import xml.etree.ElementTree as ET
+
+    for _, el in ET.iterparse(path, events=("end",)):
+        if el.tag == "node":
+            yield "node", dict(el.attrib), []
+            el.clear()
+        elif el.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in el.findall("tag")}
+            refs = [int(nd.get("ref")) for nd in el.findall("nd")]
+            yield "way", tags, refs
+            el.clear()
+
+
+def build_from_osm(path: str) -> RoadGraph:
+    """
+    Build a drivable graph from an OSM XML file. Chains of shape points are
+    collapsed so only intersections and way ends become graph nodes.
+    """
+    coords: Dict[int, Tuple[float, float]] = {}
+    ways: List[Tuple[List[int], float, int]] = []
+    for kind, attrs, refs in _iter_osm(path):
+        if kind == "node":
+            coords[int(attrs["id"])] = (float(attrs["lat"]), float(attrs["lon"]))
+            continue
+        hw = attrs.get("highway")
+        if hw not in HIGHWAY_MPH or attrs.get("access") in ("no", "private") or len(refs) < 2:
+            continue
+        mph = _maxspeed_mph(attrs.get("maxspeed")) or HIGHWAY_MPH[hw]
+        oneway = attrs.get("oneway")
+        if oneway == "-1":
+            refs, direction = refs[::-1], 1
+        elif oneway in ("yes", "true", "1") or attrs.get("junction") == "roundabout" or hw == "motorway":
+            direction = 1
+        else:
+            direction = 2
+        ways.append((refs, mph, direction))
+
+    # Graph nodes: way ends + nodes shared by more than one way position
+    uses: Dict[int, int] = {}
+    for refs, _, _ in ways:
+        for r in refs:
+            uses[r] = uses.get(r, 0) + 1
+        uses[refs[0]] += 1
+        uses[refs[-1]] += 1
+    node_id: Dict[int, int] = {}
+    src: List[int] = []
+    dst: List[int] = []
+    miles: List[float] = []
+    seconds: List[float] = []
+
+    def nid(ref: int) -> int:
+        i = node_id.get(ref)
+        if i is None:
+            i = node_id[ref] = len(node_id)
+        return i
+
+    for refs, mph, direction in ways:
+        refs = [r for r in refs if r in coords]
+        if len(refs) < 2:
+            continue
+        pts = np.array([coords[r] for r in refs])
+        seg = lambert_miles(pts[:-1, 0], pts[:-1, 1], pts[1:, 0], pts[1:, 1])
+        start, acc = refs[0], 0.0
+        for j in range(1, len(refs)):
+            acc += float(seg[j - 1])
+            if uses.get(refs[j], 0) < 2 and j < len(refs) - 1:
+                continue
+            a, b = nid(start), nid(refs[j])
+            if a != b:
+                sec = acc / mph * 3600.0
+                src.append(a); dst.append(b); miles.append(acc); seconds.append(sec)
+                if direction == 2:
+                    src.append(b); dst.append(a); miles.append(acc); seconds.append(sec)
+            start, acc = refs[j], 0.0
+
+    n = len(node_id)
+    lat = np.empty(n)
+    lng = np.empty(n)
+    for ref, i in node_id.items():
+        lat[i], lng[i] = coords[ref]
+    src_a = np.asarray(src, dtype=np.int64)
+    order = np.argsort(src_a, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src_a, minlength=n), out=indptr[1:])
+    return RoadGraph(
+        lat, lng, indptr,
+        np.asarray(dst, dtype=np.int64)[order],
+        np.asarray(miles)[order],
+        np.asarray(seconds)[order],
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("usage: python -m resources.road_router build <extract.osm> <out.npz>")
+        sys.exit(2)
+    t0 = time.perf_counter()
+    g = build_from_osm(sys.argv[2])
+    print(f"{g.nodes} nodes, {g.edges} edges; contracting...")
+    g.contract()
+    g.save(sys.argv[3])
+    print(f"-> {sys.argv[3]} ({time.perf_counter() - t0:.1f}s)")
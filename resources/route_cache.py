@@ -0,0 +1,95 @@
+# resources/route_cache.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Bounded memo of trip distances keyed on canonical (A, B)
+#     so hot pairs (airport <-> downtown) skip the distance math
+#
+# Features:
+#   - Keys carry the distance model ("geodesic" / "road"); symmetric only
+#     when the model is (geodesic: A->B == B->A; roads have one-ways)
+#   - LRU eviction (ROUTE_CACHE_MAX) + TTL (ROUTE_CACHE_TTL_SEC)
+#   - Hit/miss/eviction counters
+#   - Thread-safe; per worker process
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX", "10000"))
+TTL_SEC = float(os.getenv("ROUTE_CACHE_TTL_SEC", "86400"))
+
+
+class RouteCache:
+    """
+    LRU + TTL map of (origin, destination[, model]) -> miles.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl_sec: float = TTL_SEC) -> None:
+        self._data: "OrderedDict[Tuple[str, ...], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max(1, max_entries)
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(a: str, b: str, symmetric: bool = True, model: str = "geodesic") -> Tuple[str, ...]:
+        if symmetric and b < a:
+            a, b = b, a
+        return (model, a, b)
+
+    def get(self, a: str, b: str, symmetric: bool = True, model: str = "geodesic") -> Optional[float]:
+        k = self.key(a, b, symmetric, model)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(k)
+            if entry is None:
+                self.misses += 1
+                return None
+            miles, expires_at = entry
+            if expires_at <= now:
+                del self._data[k]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(k)
+            self.hits += 1
+            return miles
+
+    def put(self, a: str, b: str, miles: float, symmetric: bool = True, model: str = "geodesic") -> None:
+        k = self.key(a, b, symmetric, model)
+        with self._lock:
+            self._data[k] = (float(miles), time.monotonic() + self.ttl_sec)
+            self._data.move_to_end(k)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Shared instance used by estimate_miles (and everything that calls it:
+# the fare nodes, quotes, and db.writer._compute_fare_fallback)
+ROUTES = RouteCache()
@@ -0,0 +1,257 @@
+# resources/surge.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Per-zone surge multiplier from live supply (available drivers) and
+#     demand (open, unassigned jobs), read in O(1) by fare_engine
+#
+# Counters (Postgres `zone_counters`: zone, drivers, open_jobs):
+#   - Maintained incrementally: every driver availability flip and every
+#     job that opens / gets assigned / closes applies a +-1 delta in the
+#     same transaction as the change itself (record_counts); nothing
+#     rescans drivers or jobs on the hot path
+#   - Drivers count in the zone of their home_base (what dispatch uses);
+#     a job counts in its pickup zone while `jobs.open_zone` is set
+#   - Initial fill / reconciliation (full recount, offline):
+#       python -m resources.surge rebuild
+#
+# In-process mirror:
+#   - Each worker keeps the counters + compiled multipliers in lists;
+#     its own deltas apply once their transaction commits (apply_counts),
+#     and the whole table (<= one row
+#     per zone) is re-read in the background every SURGE_SYNC_SEC to pick
+#     up other workers' changes and heal any drift
+#
+# Multiplier (pickup zone; 1 outside the zoned area):
+#   ratio = open_jobs / max(drivers, 1)
+#   surge = 1 + SURGE_SENSITIVITY x (ratio - SURGE_THRESHOLD), only when
+#           open_jobs >= SURGE_MIN_JOBS, capped at SURGE_MAX and rounded
+#           to SURGE_STEP so quotes don't flicker
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from resources import zones
+
+try:
+    from db.pg import get_conn
+except Exception:
+    get_conn = None
+
+ENABLED = os.getenv("SURGE_ENABLED", "1") == "1"
+SYNC_SEC = float(os.getenv("SURGE_SYNC_SEC", "5"))
+MIN_JOBS = int(os.getenv("SURGE_MIN_JOBS", "2"))
+THRESHOLD = Decimal(os.getenv("SURGE_THRESHOLD", "1.0"))
+SENSITIVITY = Decimal(os.getenv("SURGE_SENSITIVITY", "0.25"))
+MAX_SURGE = Decimal(os.getenv("SURGE_MAX", "2.0"))
+STEP = Decimal(os.getenv("SURGE_STEP", "0.05"))
+
+ONE = Decimal("1")
+
+
+def surge_for(drivers: int, open_jobs: int) -> Decimal:
+    """Multiplier for one zone's counts."""
+    if open_jobs < MIN_JOBS:
+        return ONE
+    ratio = Decimal(open_jobs) / max(drivers, 1)
+    if ratio <= THRESHOLD:
+        return ONE
+    m = min(MAX_SURGE, ONE + SENSITIVITY * (ratio - THRESHOLD))
+    return max(ONE, ((m / STEP).to_integral_value(rounding=ROUND_HALF_UP) * STEP).quantize(STEP))
+
+
+def driver_zone(lat: Optional[float], lng: Optional[float]) -> int:
+    """Zone a driver's supply counts in (OUTSIDE_ZONE without a home_base)."""
+    if lat is None or lng is None:
+        return zones.OUTSIDE_ZONE
+    return zones.zone_of(float(lat), float(lng))
+
+
+class SurgeBoard:
+    """Counters + multipliers per zone id (0..N_ZONES); one per process."""
+
+    def __init__(self) -> None:
+        n = zones.N_ZONES + 1
+        self.drivers: List[int] = [0] * n
+        self.open_jobs: List[int] = [0] * n
+        self.multiplier: List[Decimal] = [ONE] * n
+        self.active = False  # any zone surging
+        self.synced_at = 0.0
+        self.syncs = 0
+        self._lock = threading.Lock()
+
+    def _recompute(self, zone: int) -> None:
+        if zone == zones.OUTSIDE_ZONE or not ENABLED:
+            return
+        self.multiplier[zone] = surge_for(max(0, self.drivers[zone]), max(0, self.open_jobs[zone]))
+
+    def apply(self, zone: int, drivers: int = 0, open_jobs: int = 0) -> None:
+        """Local delta (this worker's own change, before the next sync)."""
+        with self._lock:
+            self.drivers[zone] += drivers
+            self.open_jobs[zone] += open_jobs
+            self._recompute(zone)
+            self.active = self.active or self.multiplier[zone] != ONE
+
+    def load(self, rows: Iterable[Tuple[int, int, int]]) -> None:
+        """Replace every counter with a snapshot of the table."""
+        n = zones.N_ZONES + 1
+        drivers, jobs = [0] * n, [0] * n
+        for zone, d, j in rows:
+            if 0 <= zone < n:
+                drivers[zone], jobs[zone] = int(d), int(j)
+        with self._lock:
+            self.drivers, self.open_jobs = drivers, jobs
+            for z in range(zones.N_ZONES):
+                self._recompute(z)
+            self.active = any(m != ONE for m in self.multiplier)
+            self.synced_at = time.time()
+            self.syncs += 1
+
+    def stats(self) -> Dict[str, object]:
+        surging = [
+            {"zone": z, "drivers": self.drivers[z], "open_jobs": self.open_jobs[z], "multiplier": str(m)}
+            for z, m in enumerate(self.multiplier) if m != ONE
+        ]
+        return {
+            "enabled": ENABLED,
+            "drivers": sum(self.drivers),
+            "open_jobs": sum(self.open_jobs),
+            "surging_zones": surging,
+            "synced_at": self.synced_at,
+            "syncs": self.syncs,
+        }
+
+
+# ----------------------------
+# Postgres counters
+# ----------------------------
+
+_BUMP_SQL = """
+    INSERT INTO zone_counters (zone, drivers, open_jobs)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (zone) DO UPDATE
+    SET drivers    = zone_counters.drivers + EXCLUDED.drivers,
+        open_jobs  = zone_counters.open_jobs + EXCLUDED.open_jobs,
+        updated_at = now()
+"""
+
+
+# (zone, drivers, open_jobs) written by record_counts, mirrored by apply_counts
+CountDelta = Tuple[int, int, int]
+
+
+def record_counts(cur, zone: int, drivers: int = 0, open_jobs: int = 0) -> Optional[CountDelta]:
+    """
+    Apply a counter delta inside the caller's transaction (commit is the
+    caller's). Returns the delta (None if empty) for the caller to pass to
+    apply_counts once that commit succeeded, so a rollback never leaks
+    into this process's mirror.
+    """
+    if not (drivers or open_jobs):
+        return None
+    cur.execute(_BUMP_SQL, (int(zone), int(drivers), int(open_jobs)))
+    return int(zone), int(drivers), int(open_jobs)
+
+
+async def record_counts_async(cur, zone: int, drivers: int = 0, open_jobs: int = 0) -> Optional[CountDelta]:
+    """record_counts on an async (psycopg 3) cursor."""
+    if not (drivers or open_jobs):
+        return None
+    await cur.execute(_BUMP_SQL, (int(zone), int(drivers), int(open_jobs)))
+    return int(zone), int(drivers), int(open_jobs)
+
+
+def apply_counts(*deltas: Optional[CountDelta]) -> None:
+    """Mirror committed record_counts deltas in this process (None skipped)."""
+    board = get_board()
+    for delta in deltas:
+        if delta is not None:
+            zone, drivers, open_jobs = delta
+            board.apply(zone, drivers, open_jobs)
+
+
+def _read_counters() -> List[Tuple[int, int, int]]:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT zone, drivers, open_jobs FROM zone_counters")
+        return cur.fetchall() or []
+
+
+def rebuild_counters() -> Dict[str, int]:
+    """
+    Recount from drivers + jobs (full scan; initial fill or after manual
+    edits). Holds the counters table lock so concurrent deltas queue behind
+    the recount instead of being lost.
+    """
+    counts: Dict[int, List[int]] = {}
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("LOCK TABLE zone_counters IN EXCLUSIVE MODE")
+        cur.execute(
+            """
+            SELECT ST_Y(home_base::geometry), ST_X(home_base::geometry)
+            FROM drivers WHERE is_available = true
+            """
+        )
+        for lat, lng in cur.fetchall() or []:
+            counts.setdefault(driver_zone(lat, lng), [0, 0])[0] += 1
+        cur.execute("SELECT open_zone, count(*) FROM jobs WHERE open_zone IS NOT NULL GROUP BY 1")
+        for zone, n in cur.fetchall() or []:
+            counts.setdefault(int(zone), [0, 0])[1] += int(n)
+        cur.execute("DELETE FROM zone_counters")
+        for zone, (d, j) in counts.items():
+            cur.execute(_BUMP_SQL, (zone, d, j))
+        conn.commit()
+    get_board().load((z, d, j) for z, (d, j) in counts.items())
+    return {"zones": len(counts), "drivers": sum(c[0] for c in counts.values()),
+            "open_jobs": sum(c[1] for c in counts.values())}
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+
+_board: Optional[SurgeBoard] = None
+_board_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def _sync() -> None:
+    try:
+        get_board().load(_read_counters())
+    except Exception:
+        get_board().synced_at = time.time()  # DB down: keep the mirror, retry next period
+    finally:
+        _sync_lock.release()
+
+
+def get_board() -> SurgeBoard:
+    """This process's mirror; kicks off a background re-sync when it's stale."""
+    global _board
+    if _board is None:
+        with _board_lock:
+            if _board is None:
+                _board = SurgeBoard()
+    if ENABLED and get_conn is not None and time.time() - _board.synced_at > SYNC_SEC \
+            and _sync_lock.acquire(blocking=False):
+        threading.Thread(target=_sync, name="surge-sync", daemon=True).start()
+    return _board
+
+
+def surge_multiplier(zone: Optional[int]) -> Decimal:
+    """Current multiplier for a pickup zone (1 when unknown or disabled)."""
+    if zone is None or not ENABLED:
+        return ONE
+    return get_board().multiplier[zone]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("usage: python -m resources.surge rebuild")
+        sys.exit(2)
+    print(rebuild_counters())
@@ -0,0 +1,219 @@
+# resources/zone_matrix.py
+# --------------------------------------------------------------
+# Purpose:
+#   - Precomputed zone x zone matrix of typical trip miles and fares
+#     (zones from resources/zones.py) for O(1) "fast quotes": once both
+#     addresses are geocoded, a quote is two array reads
+#
+# Files (ZONE_MATRIX_DIR, memory-mapped read-only by every worker):
+#   - miles.npy       float32 (N, N)  centroid-to-centroid miles under the
+#                     distance model (geodesic, or road when built with it);
+#                     the diagonal is the mean trip inside one zone
+#   - fare_cents.npy  int32   (N, N)  fares for those miles, with the
+#                     pickup/dropoff zone rules of resources/fare_rules.py
+#                     (time bands and surge are applied at lookup time)
+#   - meta.json       zoning, distance model, and the rates / rule version /
+#                     rule-table digest used
+#
+# Refresh:
+#   - Fares are recomputed (vectorized, milliseconds) whenever the
+#     current rates, fare rule version or compiled zone / airport /
+#     minimum-fare tables differ from meta.json (checked
+#     on every get_zone_matrix, so hot-reloaded rules reprice it); miles
+#     are rebuilt if the zoning changes
+#   - Files are replaced atomically, so readers never see a torn matrix
+#   - Road-model miles need the offline build:
+#       python -m resources.zone_matrix build [--model road]
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from resources import zones
+from resources import fare_engine
+from resources.geo_distance import many_to_many
+from resources.road_router import drive_route
+
+MATRIX_DIR = os.getenv("ZONE_MATRIX_DIR", "zone_matrix")
+
+# Mean distance between two uniform random points in a unit square
+_MEAN_INTRA_SQUARE = 0.5214
+
+
+def _zoning() -> Dict[str, object]:
+    return {"bbox": [zones.LAT0, zones.LAT1, zones.LNG0, zones.LNG1], "cell_deg": zones.CELL_DEG}
+
+
+def _rates() -> Dict[str, str]:
+    rules = fare_engine.current_rules()
+    return {
+        "version": rules.version,
+        "base": str(rules.base),
+        "per_mile": str(rules.per_mile),
+        "multiplier": str(rules.multiplier),
+        "tables": rules.tables_digest,
+    }
+
+
+def build_miles(model: str = "geodesic") -> np.ndarray:
+    """Typical miles for every zone pair -> (N, N) float32."""
+    lats, lngs = zones.zone_centers()
+    miles = many_to_many(lats, lngs, lats, lngs)
+    if model == "road":
+        # One graph search per pair: minutes for a metro grid, offline only
+        for i in range(zones.N_ZONES):
+            for j in range(zones.N_ZONES):
+                if i != j:
+                    r = drive_route((lats[i], lngs[i]), (lats[j], lngs[j]))
+                    if r is not None:
+                        miles[i, j] = r.miles
+    # Diagonal: side of a zone (mean of its lat/lng extents) x mean in-square distance
+    lat_mi = zones.CELL_DEG * 69.05
+    lng_mi = lat_mi * np.cos(np.radians(lats))
+    np.fill_diagonal(miles, _MEAN_INTRA_SQUARE * np.sqrt(lat_mi * lng_mi))
+    return np.round(miles, 2).astype(np.float32)
+
+
+def _price(miles: np.ndarray) -> np.ndarray:
+    # Back to the 2-decimal values the float32 cells stand for, so pricing
+    # matches calculate_base_fare on the miles the lookup returns
+    n = np.shape(miles)[0]
+    pickup, dropoff = np.divmod(np.arange(n * n), n)
+    cents = fare_engine.fare_cents_array(
+        np.round(np.asarray(miles, dtype=float), 2), pickup, dropoff, dynamic=False,
+    )
+    return cents.reshape(np.shape(miles)).astype(np.int32)
+
+
+def _save(path: str, arr: np.ndarray) -> None:
+    # Write next to the target, then swap: open memmaps keep the old inode
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, path)
+
+
+def _read_meta(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception:
+        return None
+
+
+def build(model: str = "geodesic", directory: str = MATRIX_DIR) -> None:
+    """Rebuild miles and fares from scratch."""
+    os.makedirs(directory, exist_ok=True)
+    miles = build_miles(model)
+    _save(os.path.join(directory, "miles.npy"), miles)
+    _save(os.path.join(directory, "fare_cents.npy"), _price(miles))
+    _write_meta(os.path.join(directory, "meta.json"),
+                {**_zoning(), "model": model, "rates": _rates(), "built_at": time.time()})
+
+
+def refresh_fares(directory: str = MATRIX_DIR) -> None:
+    """Reprice the existing miles matrix with the current rates and rules."""
+    meta = _read_meta(directory) or {}
+    miles = np.load(os.path.join(directory, "miles.npy"), mmap_mode="r")
+    _save(os.path.join(directory, "fare_cents.npy"), _price(miles))
+    _write_meta(os.path.join(directory, "meta.json"), {**meta, "rates": _rates(), "priced_at": time.time()})
+
+
+class ZoneMatrix:
+    """Read-only view over the memory-mapped matrices."""
+
+    def __init__(self, directory: str = MATRIX_DIR) -> None:
+        self.meta = _read_meta(directory) or {}
+        self.miles = np.load(os.path.join(directory, "miles.npy"), mmap_mode="r")
+        self.fare_cents = np.load(os.path.join(directory, "fare_cents.npy"), mmap_mode="r")
+        self.model = self.meta.get("model", "geodesic")
+        self.hits = 0
+
+    def lookup(self, pickup: Tuple[float, float], dropoff: Tuple[float, float]) -> Optional[Tuple[float, Decimal]]:
+        """(miles, fare) for two (lat, lng) points, or None outside the zoned area."""
+        zp, zd = zones.zone_of(*pickup), zones.zone_of(*dropoff)
+        if zp == zones.OUTSIDE_ZONE or zd == zones.OUTSIDE_ZONE:
+            return None
+        self.hits += 1
+        miles = round(float(self.miles[zp, zd]), 2)
+        if fare_engine.dynamic_factor(zp) != 1:
+            # Time band or surge in effect: the stored fare has neither
+            return miles, fare_engine.calculate_base_fare(miles, pickup_zone=zp, dropoff_zone=zd)
+        return miles, Decimal(int(self.fare_cents[zp, zd])) / 100
+
+    def stats(self) -> Dict[str, object]:
+        return {"zones": zones.N_ZONES, "model": self.model, "rates": self.meta.get("rates"), "hits": self.hits}
+
+
+_matrix: Optional[ZoneMatrix] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def _open(directory: str = MATRIX_DIR) -> Optional[ZoneMatrix]:
+    """
+    Open the matrix, (re)building what's stale first. Geodesic matrices are
+    cheap and built on demand; a stale road matrix is left to the offline
+    build and fast quotes are disabled until then.
+    """
+    meta = _read_meta(directory)
+    zoning_ok = meta is not None and all(meta.get(k) == v for k, v in _zoning().items())
+    if not zoning_ok:
+        if meta is not None and meta.get("model") == "road":
+            return None
+        build("geodesic", directory)
+    elif meta.get("rates") != _rates():
+        refresh_fares(directory)
+    return ZoneMatrix(directory)
+
+
+def get_zone_matrix() -> Optional[ZoneMatrix]:
+    """
+    Shared matrix for this process (opened once, repriced when the rates or
+    fare rules change), or None if unavailable.
+    """
+    global _matrix, _loaded
+    if _loaded and _matrix is not None and _matrix.meta.get("rates") != _rates():
+        return reload_zone_matrix()
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                try:
+                    _matrix = _open()
+                except Exception:
+                    _matrix = None
+                _loaded = True
+    return _matrix
+
+
+def reload_zone_matrix() -> Optional[ZoneMatrix]:
+    """Re-check rates/zoning and reopen (e.g. after a fare change)."""
+    global _loaded
+    with _lock:
+        _loaded = False
+    return get_zone_matrix()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("usage: python -m resources.zone_matrix build [--model geodesic|road]")
+        sys.exit(2)
+    model = sys.argv[sys.argv.index("--model") + 1] if "--model" in sys.argv else "geodesic"
+    t0 = time.perf_counter()
+    build(model)
+    print(f"{zones.N_ZONES}x{zones.N_ZONES} {model} matrix -> {MATRIX_DIR} ({time.perf_counter() - t0:.1f}s)")
@@ -0,0 +1,71 @@
+# resources/zones.py
+# --------------------------------------------------------------
+# Purpose:
+#   - One shared zoning of the service area, so every per-zone table
+#     (ETA speed profiles, ...) indexes the same cells
+#
+# Layout:
+#   - Square lat/lng grid over ZONE_BBOX (lat0,lat1,lng0,lng1; default
+#     DFW) with ZONE_CELL_DEG cells (0.05 deg ~ 3.5 mi)
+#   - Zone id = row * COLS + col; points outside the box map to
+#     OUTSIDE_ZONE (= N_ZONES), so tables carry N_ZONES + 1 rows
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Tuple
+
+import numpy as np
+
+_bbox = [float(x) for x in os.getenv("ZONE_BBOX", "32.55,33.25,-97.55,-96.55").split(",")]
+LAT0, LAT1, LNG0, LNG1 = _bbox
+CELL_DEG = float(os.getenv("ZONE_CELL_DEG", "0.05"))
+
+ROWS = max(1, int(math.ceil((LAT1 - LAT0) / CELL_DEG - 1e-9)))
+COLS = max(1, int(math.ceil((LNG1 - LNG0) / CELL_DEG - 1e-9)))
+N_ZONES = ROWS * COLS
+OUTSIDE_ZONE = N_ZONES
+
+
+def zone_of(lat: float, lng: float) -> int:
+    """Zone id for one point (pure Python: this sits on hot paths)."""
+    r = int((lat - LAT0) // CELL_DEG)
+    c = int((lng - LNG0) // CELL_DEG)
+    if 0 <= r < ROWS and 0 <= c < COLS:
+        return r * COLS + c
+    return OUTSIDE_ZONE
+
+
+def zone_sql(lat: str, lng: str) -> str:
+    """
+    SQL expression computing zone_of for two SQL float expressions (same
+    grid constants), for statements that bucket rows by zone in the database.
+    """
+    r = f"floor(({lat} - ({LAT0!r})) / {CELL_DEG!r})"
+    c = f"floor(({lng} - ({LNG0!r})) / {CELL_DEG!r})"
+    return (f"(CASE WHEN {r} >= 0 AND {r} < {ROWS} AND {c} >= 0 AND {c} < {COLS} "
+            f"THEN ({r} * {COLS} + {c})::int ELSE {OUTSIDE_ZONE} END)")
+
+
+def zones_of(lats, lngs) -> np.ndarray:
+    """Vectorized zone_of -> int array."""
+    r = np.floor((np.asarray(lats, dtype=float) - LAT0) / CELL_DEG).astype(np.int64)
+    c = np.floor((np.asarray(lngs, dtype=float) - LNG0) / CELL_DEG).astype(np.int64)
+    inside = (r >= 0) & (r < ROWS) & (c >= 0) & (c < COLS)
+    return np.where(inside, r * COLS + c, OUTSIDE_ZONE)
+
+
+def zone_center(zone: int) -> Tuple[float, float]:
+    """(lat, lng) of a zone's centre (the box centre for OUTSIDE_ZONE)."""
+    if not 0 <= zone < N_ZONES:
+        return (LAT0 + LAT1) / 2.0, (LNG0 + LNG1) / 2.0
+    r, c = divmod(zone, COLS)
+    return LAT0 + (r + 0.5) * CELL_DEG, LNG0 + (c + 0.5) * CELL_DEG
+
+
+def zone_centers() -> Tuple[np.ndarray, np.ndarray]:
+    """Centres of every in-box zone, ordered by zone id -> (lats, lngs)."""
+    r, c = np.divmod(np.arange(N_ZONES), COLS)
+    return LAT0 + (r + 0.5) * CELL_DEG, LNG0 + (c + 0.5) * CELL_DEG
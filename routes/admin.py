@@ -12,7 +12,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from db.driver_registry import set_driver_availability
+from db.driver_registry import set_driver_availability, update_driver_availability
+from db.writer import close_open_job
+from resources.surge import apply_counts, driver_zone, record_counts
 from db.pg import get_conn
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -49,8 +51,17 @@ def _insert_driver(d: SeedDriver) -> int:
     Upsert a driver by email.
     If lng/lat provided, update home_base too.
     Returns the id of the inserted/updated row.
+    Surge supply counters follow the driver's old -> new (availability, zone).
     """
     with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT is_available, ST_Y(home_base::geometry), ST_X(home_base::geometry)
+            FROM drivers WHERE email = %s FOR UPDATE
+            """,
+            (d.email,),
+        )
+        prev = cur.fetchone()
         if d.lng is not None and d.lat is not None:
             cur.execute(
                 """
@@ -62,7 +73,7 @@ def _insert_driver(d: SeedDriver) -> int:
                     plate = EXCLUDED.plate,
                     is_available = EXCLUDED.is_available,
                     home_base = EXCLUDED.home_base
-                RETURNING id
+                RETURNING id, is_available, ST_Y(home_base::geometry), ST_X(home_base::geometry)
                 """,
                 (d.name, d.vehicle, d.plate, d.email, d.is_available, d.lng, d.lat),
             )
@@ -76,13 +87,19 @@ def _insert_driver(d: SeedDriver) -> int:
                     vehicle = EXCLUDED.vehicle,
                     plate = EXCLUDED.plate,
                     is_available = EXCLUDED.is_available
-                RETURNING id
+                RETURNING id, is_available, ST_Y(home_base::geometry), ST_X(home_base::geometry)
                 """,
                 (d.name, d.vehicle, d.plate, d.email, d.is_available),
             )
-        new_id = cur.fetchone()[0]
+        new_id, available, lat, lng = cur.fetchone()
+        deltas = []
+        if prev and prev[0]:
+            deltas.append(record_counts(cur, driver_zone(prev[1], prev[2]), drivers=-1))
+        if available:
+            deltas.append(record_counts(cur, driver_zone(lat, lng), drivers=1))
         conn.commit()
-        return int(new_id)
+    apply_counts(*deltas)
+    return int(new_id)
 
 
 # ============================================================
@@ -264,8 +281,21 @@ def admin_reset_availability():
     Set ALL drivers to available = true.
     """
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("UPDATE drivers SET is_available = true")
+        # Only the drivers that actually flip move the surge counters
+        cur.execute(
+            """
+            UPDATE drivers SET is_available = true
+            WHERE is_available IS DISTINCT FROM true
+            RETURNING ST_Y(home_base::geometry), ST_X(home_base::geometry)
+            """
+        )
+        freed: Dict[int, int] = {}
+        for lat, lng in cur.fetchall() or []:
+            zone = driver_zone(lat, lng)
+            freed[zone] = freed.get(zone, 0) + 1
+        deltas = [record_counts(cur, zone, drivers=n) for zone, n in freed.items()]
         conn.commit()
+    apply_counts(*deltas)
     return {"ok": True}
 
 
@@ -330,8 +360,15 @@ def admin_clear_jobs():
     Delete ALL jobs (careful!). Drivers table is NOT touched.
     """
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("DELETE FROM jobs")
+        cur.execute(
+            """
+            WITH gone AS (DELETE FROM jobs RETURNING open_zone)
+            SELECT open_zone, count(*) FROM gone WHERE open_zone IS NOT NULL GROUP BY 1
+            """
+        )
+        deltas = [record_counts(cur, zone, open_jobs=-int(n)) for zone, n in cur.fetchall() or []]
         conn.commit()
+    apply_counts(*deltas)
     return {"ok": True, "message": "all jobs deleted"}
 
 
@@ -386,12 +423,15 @@ def admin_complete_job(job_id: int):
         driver_id = row[0]
 
         # If no driver was assigned (edge case), just flip claimed to false
+        freed = None
         if driver_id is not None:
-            # 2) free the driver
-            cur.execute("UPDATE drivers SET is_available = true WHERE id = %s", (driver_id,))
+            # 2) free the driver (moves the surge supply counter)
+            freed = update_driver_availability(cur, driver_id, True)
 
-        # 3) mark job not-claimed anymore (completed/closed)
+        # 3) mark job not-claimed anymore (completed/closed); no longer open demand
+        closed = close_open_job(cur, job_id)
         cur.execute("UPDATE jobs SET claimed = false WHERE id = %s", (job_id,))
         conn.commit()
+    apply_counts(freed, closed)
 
     return {"ok": True, "job_id": job_id, "driver_id": driver_id, "driver_available": True}
@@ -3,24 +3,60 @@
 # POST /book/ride
 # GET  /book/history
 # - Validates input
+# - Accepts an optional quote_token from /quote or /fare/estimate: when valid,
+#   the quoted coordinates, miles and fare are reused (no re-geocode/re-price)
 # - Persists the job to DB first (so dispatcher can update it)
 # - Runs the LangGraph pipeline (generate -> explain -> dispatch)
 # - Returns a concise rider-friendly payload (incl. fare fields)
 # - Notifications are non-blocking (file log + operator email + driver email)
 # - NEW: Auto-issue a short-lived DRIVER PIN (stored in DB; not returned)
+# - The fare explanation is stored on the job with the PIN; with
+#   LLM_EXPLAIN_MODE=deferred the response carries the template and
+#   explanation_status="pending" until the paraphrase lands on the job
+#   (GET /jobs/status, GET /jobs/explanation/stream)
+# - BOOKING_ASYNC (0 | 1 | auto; default 0): run the whole booking on the
+#   event loop (psycopg 3 pool, async geocoder, LangGraph ainvoke) instead
+#   of holding a threadpool slot for it; opt-in, auto = when psycopg 3 is
+#   installed
+# - BOOKING_COMMIT=single: price first, then insert the job, reserve and
+#   assign the driver and store the driver PIN in one statement / one
+#   transaction (db/booking_commit.py) instead of the step-by-step writes
+#   ("steps", default). DRIVER_PIN_MODE=same needs the job id first, so
+#   it always uses "steps".
+# - Idempotency-Key header (resources/idempotency.py): a retried request
+#   with the same key gets the first response back (Idempotent-Replayed:
+#   true) instead of a second booking; a duplicate arriving mid-booking
+#   waits for that booking's response
+# - BOOKING_INTAKE=queue: validate, insert the job + its booking_queue row
+#   in one transaction and answer 202 with job_id / pin right away;
+#   dispatch workers (dispatch/intake_worker.py) price, dispatch, PIN and
+#   notify it (dispatch_queued). Progress: GET /jobs/status,
+#   GET /jobs/status/stream. Falls back to booking inline if the queue
+#   insert fails.
 # -------------------------------------------------------------------
 
 from __future__ import annotations
 
-from typing import List, Dict, Any
-from fastapi import APIRouter, Query, BackgroundTasks, status
+from typing import List, Dict, Any, Optional, Tuple
+from fastapi import APIRouter, Query, BackgroundTasks, Header, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from state import (
     BookingInput,
     booking_input_to_state,
     merge_state,
 )
-from graph import run_booking_flow
+from graph import (
+    run_booking_commit_flow,
+    run_booking_commit_flow_async,
+    run_booking_flow,
+    run_booking_flow_async,
+)
+from resources.rate_limiter import geocode_priority, PRIORITY_BOOKING
+from resources.quote_token import redeem_quote_token
+from resources import idempotency
 
 # ✅ Notifications (all are fail-soft; they won’t break the request)
 from notifications.notifier import notify_operator
@@ -46,6 +82,31 @@ try:
 except Exception:
     get_conn = None  # in-memory fallback case
 
+# Async twins (psycopg 3); without them bookings run on the threadpool
+try:
+    from db.apg import AVAILABLE as _ASYNC_DB, aget_conn
+    from db.writer import create_job_async
+except Exception:
+    _ASYNC_DB, aget_conn, create_job_async = False, None, None
+
+# Intake queue (BOOKING_INTAKE=queue); workers may run in another process
+try:
+    from db.booking_queue import enqueue_booking, enqueue_booking_async, queued_assignment
+    from dispatch.dispatcher import dispatch_queued_booking, resume_assigned
+    from dispatch.intake_worker import wake as wake_intake_workers
+except Exception:
+    enqueue_booking = enqueue_booking_async = queued_assignment = None
+    dispatch_queued_booking = resume_assigned = None
+
+    def wake_intake_workers() -> None:
+        pass
+
+_ASYNC_MODE = os.getenv("BOOKING_ASYNC", "0").lower()
+USE_ASYNC = _ASYNC_MODE == "1" or (_ASYNC_MODE == "auto" and bool(_ASYNC_DB))
+SINGLE_COMMIT = (os.getenv("BOOKING_COMMIT", "steps").lower() == "single"
+                 and os.getenv("DRIVER_PIN_MODE", "separate").lower() != "same")
+INTAKE_QUEUE = os.getenv("BOOKING_INTAKE", "sync").lower() == "queue"
+
 router = APIRouter(prefix="/book", tags=["book"])
 
 # Dev-only memory fallback store
@@ -65,6 +126,19 @@ def _persist_booking(state: Dict[str, Any]) -> str:
             # DB failed; fall back to memory
             pass
 
+    return _persist_in_memory(state)
+
+
+async def _persist_booking_async(state: Dict[str, Any]) -> str:
+    if create_job_async and _ASYNC_DB:
+        try:
+            return str(await create_job_async(state))
+        except Exception:
+            pass
+    return _persist_in_memory(state)
+
+
+def _persist_in_memory(state: Dict[str, Any]) -> str:
     job_id = f"JOB-{len(_FALLBACK_BOOKINGS) + 1:06d}"
     row = {**state, "job_id": job_id}
     _FALLBACK_BOOKINGS.append(row)
@@ -80,112 +154,289 @@ def _list_bookings(limit: int, offset: int) -> List[Dict[str, Any]]:
     return _FALLBACK_BOOKINGS[offset: offset + limit]
 
 
-@router.post("/ride", status_code=status.HTTP_201_CREATED)
-def create_ride(payload: BookingInput, background: BackgroundTasks):
-    """
-    Create a new ride:
-      1) validate & build state
-      2) persist to DB to get job_id (so dispatch can update it)
-      3) add a short numeric pin (string; keeps leading zeros)
-      4) run the booking graph (generate -> explain -> dispatch)
-      5) auto-issue a short-lived DRIVER PIN (stored in DB; hidden from rider)
-      6) enqueue notifications (file log + operator email + driver email if assigned)
-      7) return a concise rider-facing response (incl. fare fields)
-    """
-    # 1) Start state from request
+def _start_state(payload: BookingInput) -> Dict[str, Any]:
+    # Start state from request; a valid quote token carries coords, miles and fare
+    # (so persisting, pricing and dispatch below skip recomputing them)
     state = booking_input_to_state(payload)
+    return merge_state(state, redeem_quote_token(state))
+
 
-    # 2) Persist first so dispatcher can update jobs table (needs job_id)
-    job_id_str = _persist_booking(state)
+def _with_ids(state: Dict[str, Any], job_id_str: str) -> Dict[str, Any]:
     state["job_id"] = job_id_str
+    # Stable 4–6 digit PIN for tracking (string to keep leading zeros)
+    state["pin"] = (str(abs(hash(f"{job_id_str}:{state.get('phone_number', '')}")))[-6:]).zfill(4)[:6]
+    return state
 
-    # 3) Stable 4–6 digit PIN for tracking (string to keep leading zeros)
-    pin = (str(abs(hash(f"{job_id_str}:{state.get('phone_number', '')}")))[-6:]).zfill(4)[:6]
-    state["pin"] = pin
 
-    # 4) Run the pipeline (generate_booking -> explain_fare -> dispatch)
-    #    If anything raises, return graceful response and keep any fare fields we already computed.
-    try:
-        state = run_booking_flow(state)
-    except Exception as e:
-        state = merge_state(
-            state,
-            {
-                "dispatch_info": f"⚠️ Booking saved, but dispatch temporarily unavailable: {e.__class__.__name__}",
-                "driver_name": None,
-                "vehicle": None,
-                "plate": None,
-                "eta_minutes": None,
-            },
-        )
+def _dispatch_failed(state: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+    # Graceful response that keeps any fare fields we already computed
+    return merge_state(
+        state,
+        {
+            "dispatch_info": f"⚠️ Booking saved, but dispatch temporarily unavailable: {e.__class__.__name__}",
+            "driver_name": None,
+            "vehicle": None,
+            "plate": None,
+            "eta_minutes": None,
+        },
+    )
 
-    # 5) NEW: Auto-issue a short-lived DRIVER PIN (separate from rider PIN)
-    #    - Controlled by env:
-    #        DRIVER_PIN_MODE: "separate" (default) | "same"
-    #        DRIVER_PIN_TTL_MINUTES: default "30"
-    #    - Stored in jobs.driver_pin / jobs.driver_pin_expires
-    try:
-        mode = os.getenv("DRIVER_PIN_MODE", "separate").lower()
-        ttl_min = int(os.getenv("DRIVER_PIN_TTL_MINUTES", "30"))
 
-        if mode == "same":
-            driver_pin = str(pin).zfill(6)[:6]
-        else:
-            # 000000–999999 as a string, zero-padded to 6
-            driver_pin = f"{secrets.randbelow(1_000_000):06d}"
+# Auto-issued DRIVER PIN (separate from rider PIN)
+#   - Controlled by env:
+#       DRIVER_PIN_MODE: "separate" (default) | "same"
+#       DRIVER_PIN_TTL_MINUTES: default "30"
+#   - Stored in jobs.driver_pin / jobs.driver_pin_expires
+#   - Same UPDATE stores the fare explanation; COALESCE keeps a deferred
+#     LLM paraphrase that was written first
+_DRIVER_PIN_SQL = """
+    UPDATE jobs
+       SET driver_pin = %s,
+           driver_pin_expires = %s,
+           fare_explanation = COALESCE(fare_explanation, %s),
+           explanation_status = COALESCE(explanation_status, %s)
+     WHERE id = %s
+"""
+
+
+def _new_driver_pin(pin: str) -> Tuple[str, datetime]:
+    mode = os.getenv("DRIVER_PIN_MODE", "separate").lower()
+    ttl_min = int(os.getenv("DRIVER_PIN_TTL_MINUTES", "30"))
+
+    if mode == "same":
+        driver_pin = str(pin).zfill(6)[:6]
+    else:
+        # 000000–999999 as a string, zero-padded to 6
+        driver_pin = f"{secrets.randbelow(1_000_000):06d}"
+
+    return driver_pin, datetime.now(timezone.utc) + timedelta(minutes=ttl_min)
+
+
+def _driver_pin_params(state: Dict[str, Any], driver_pin: str, expires_at: datetime) -> tuple:
+    return (driver_pin, expires_at, state.get("fare_explanation"),
+            state.get("explanation_status"), int(state["job_id"]))
 
-        expires_at = datetime.now(timezone.utc) + timedelta(minutes=ttl_min)
+
+def _keep_driver_pin(state: Dict[str, Any], driver_pin: str, expires_at: datetime) -> None:
+    # In-memory mode: store on the state row so you can inspect if needed (not returned)
+    state["driver_pin"] = driver_pin
+    state["driver_pin_expires"] = expires_at.isoformat()
+    state["driver_pin_issued"] = True
+
+
+def _issue_driver_pin(state: Dict[str, Any]) -> None:
+    try:
+        driver_pin, expires_at = _new_driver_pin(state["pin"])
 
         # Only attempt DB update if we have a DB connection helper and numeric id
-        if get_conn and job_id_str.isdigit():
+        if get_conn and state["job_id"].isdigit():
             with get_conn() as conn, conn.cursor() as cur:
-                cur.execute(
-                    """
-                    UPDATE jobs
-                       SET driver_pin = %s,
-                           driver_pin_expires = %s
-                     WHERE id = %s
-                    """,
-                    (driver_pin, expires_at, int(job_id_str)),
-                )
+                cur.execute(_DRIVER_PIN_SQL, _driver_pin_params(state, driver_pin, expires_at))
                 conn.commit()
             state["driver_pin_issued"] = True
         else:
-            # In-memory mode: store on the state row so you can inspect if needed (not returned)
-            state["driver_pin"] = driver_pin
-            state["driver_pin_expires"] = expires_at.isoformat()
-            state["driver_pin_issued"] = True
+            _keep_driver_pin(state, driver_pin, expires_at)
     except Exception:
         # Never break booking flow because of driver-pin issuance
         state["driver_pin_issued"] = False
 
-    # 6) Background notifications (best-effort; never block the response)
-    #    - operator file log
-    #    - operator email (if EMAIL_* configured)
-    #    - driver email (only if a driver was assigned; also requires EMAIL_* configured)
-    def _notify_async(s: Dict[str, Any]):
-        try:
-            notify_operator(s)
-        except Exception:
-            pass
-        try:
-            notify_operator_email(s)
-        except Exception:
-            pass
-        try:
-            if s.get("driver_name"):
-                # notify_driver_email uses DRIVER_EMAIL env by default (or you can pass a specific address)
-                notify_driver_email(s)
-        except Exception:
-            pass
 
-    background.add_task(_notify_async, dict(state))
+async def _issue_driver_pin_async(state: Dict[str, Any]) -> None:
+    try:
+        driver_pin, expires_at = _new_driver_pin(state["pin"])
+        if aget_conn and _ASYNC_DB and state["job_id"].isdigit():
+            async with aget_conn() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(_DRIVER_PIN_SQL, _driver_pin_params(state, driver_pin, expires_at))
+                await conn.commit()
+            state["driver_pin_issued"] = True
+        else:
+            _keep_driver_pin(state, driver_pin, expires_at)
+    except Exception:
+        state["driver_pin_issued"] = False
+
+
+def _book(payload: BookingInput) -> Dict[str, Any]:
+    """Steps 1-5 on blocking I/O (runs on the threadpool)."""
+    state = _start_state(payload)
+    # Persist first so dispatcher can update jobs table (needs job_id)
+    state = _with_ids(state, _persist_booking(state))
+    # Geocodes issued by the booking jump ahead of speculative quote lookups
+    try:
+        with geocode_priority(PRIORITY_BOOKING):
+            state = run_booking_flow(state)
+    except Exception as e:
+        state = _dispatch_failed(state, e)
+    _issue_driver_pin(state)
+    return state
 
-    # 7) Return a concise rider-friendly payload, including fare info
-    #    (Intentionally DO NOT include driver_pin in this response.)
+
+async def _book_async(payload: BookingInput) -> Dict[str, Any]:
+    """Steps 1-5 on the event loop: psycopg 3 pool, async geocoder, ainvoke."""
+    state = _start_state(payload)
+    state = _with_ids(state, await _persist_booking_async(state))
+    try:
+        with geocode_priority(PRIORITY_BOOKING):
+            state = await run_booking_flow_async(state)
+    except Exception as e:
+        state = _dispatch_failed(state, e)
+    await _issue_driver_pin_async(state)
+    return state
+
+
+def _before_single_commit(payload: BookingInput) -> Dict[str, Any]:
+    state = _start_state(payload)
+    driver_pin, expires_at = _new_driver_pin("")
+    state["driver_pin"], state["driver_pin_expires"] = driver_pin, expires_at.isoformat()
+    return state
+
+
+def _after_single_commit(state: Dict[str, Any], error: Exception | None) -> Dict[str, Any]:
+    if error is not None:
+        state = _dispatch_failed(state, error)
+    if state.get("job_id"):
+        state["driver_pin_issued"] = True
+        return _with_ids(state, state["job_id"])
+    # Commit never happened (DB down): keep the booking in memory, as _persist_booking does
+    state = _with_ids(state, _persist_in_memory(state))
+    state["driver_pin_issued"] = True
+    return state
+
+
+def _book_single(payload: BookingInput) -> Dict[str, Any]:
+    """Steps 1-5 with the single-statement commit (runs on the threadpool)."""
+    state, error = _before_single_commit(payload), None
+    try:
+        with geocode_priority(PRIORITY_BOOKING):
+            state = run_booking_commit_flow(state)
+    except Exception as e:
+        error = e
+    return _after_single_commit(state, error)
+
+
+async def _book_single_async(payload: BookingInput) -> Dict[str, Any]:
+    state, error = _before_single_commit(payload), None
+    try:
+        with geocode_priority(PRIORITY_BOOKING):
+            state = await run_booking_commit_flow_async(state)
+    except Exception as e:
+        error = e
+    return _after_single_commit(state, error)
+
+
+def _queue_booking(payload: BookingInput) -> Dict[str, Any] | None:
+    """Insert + enqueue (threadpool); None if the queue is unavailable."""
+    if enqueue_booking is None:
+        return None
+    try:
+        return enqueue_booking(_start_state(payload), _with_ids)
+    except Exception:
+        return None
+
+
+async def _queue_booking_async(payload: BookingInput) -> Dict[str, Any] | None:
+    if not (USE_ASYNC and enqueue_booking_async):
+        return await run_in_threadpool(_queue_booking, payload)
+    try:
+        return await enqueue_booking_async(_start_state(payload), _with_ids)
+    except Exception:
+        return None
+
+
+def dispatch_queued(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Worker side of BOOKING_INTAKE=queue (dispatch/intake_worker.py): steps
+    4-6 for a job that is already persisted. Safe to re-run: a job that
+    already has a driver (an earlier attempt assigned it) is finished from
+    that assignment without dispatching or notifying again, and a new
+    assignment commits together with the queue row's completion. Graph
+    errors propagate so the worker can retry the booking.
+    """
+    existing = queued_assignment(int(state["job_id"]))
+    if existing is not None:
+        return resume_assigned(state, existing)
+    task = state.get("task")
+    with geocode_priority(PRIORITY_BOOKING):
+        # Price only (the graph ends after explain_fare), then the queue's own dispatch step
+        state = run_booking_flow({**state, "task": "estimate_fare"})
+        state, fresh = dispatch_queued_booking({**state, "task": task})
+    if fresh:
+        _issue_driver_pin(state)
+        _notify_async(dict(state))
+    return state
+
+
+# Background notifications (best-effort; never block the response)
+#   - operator file log
+#   - operator email (if EMAIL_* configured)
+#   - driver email (only if a driver was assigned; also requires EMAIL_* configured)
+def _notify_async(s: Dict[str, Any]):
+    try:
+        notify_operator(s)
+    except Exception:
+        pass
+    try:
+        notify_operator_email(s)
+    except Exception:
+        pass
+    try:
+        if s.get("driver_name"):
+            # notify_driver_email uses DRIVER_EMAIL env by default (or you can pass a specific address)
+            notify_driver_email(s)
+    except Exception:
+        pass
+
+
+@router.post("/ride", status_code=status.HTTP_201_CREATED)
+async def create_ride(
+    payload: BookingInput,
+    background: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+):
+    """
+    Create a new ride:
+      1) validate & build state
+      2) persist to DB to get job_id (so dispatch can update it)
+      3) add a short numeric pin (string; keeps leading zeros)
+      4) run the booking graph (generate -> explain -> dispatch)
+      5) auto-issue a short-lived DRIVER PIN (stored in DB; hidden from rider)
+      6) enqueue notifications (file log + operator email + driver email if assigned)
+      7) return a concise rider-facing response (incl. fare fields)
+    Steps 1-5 run on the event loop when USE_ASYNC, else on the threadpool;
+    with SINGLE_COMMIT, steps 2 and 5 and the dispatch writes are one statement.
+    With an Idempotency-Key, steps 1-6 run once per key; retries replay step 7.
+    With INTAKE_QUEUE, only steps 1-3 run here (202); workers do 4-6.
+    """
+    async def _run() -> Tuple[Dict[str, Any], int]:
+        queued = await _queue_booking_async(payload) if INTAKE_QUEUE else None
+        if queued is not None:
+            wake_intake_workers()
+            return jsonable_encoder(_intake_response(queued)), status.HTTP_202_ACCEPTED
+        if USE_ASYNC:
+            state = await (_book_single_async if SINGLE_COMMIT else _book_async)(payload)
+        else:
+            state = await run_in_threadpool(_book_single if SINGLE_COMMIT else _book, payload)
+        background.add_task(_notify_async, dict(state))
+        return jsonable_encoder(_ride_response(state)), status.HTTP_201_CREATED
+
+    try:
+        body, code, replayed = await idempotency.run_once(
+            "book.ride", idempotency_key, idempotency.fingerprint(payload.model_dump(mode="json")), _run,
+        )
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if replayed or code != status.HTTP_201_CREATED:
+        headers = {idempotency.REPLAY_HEADER: "true"} if replayed else None
+        return JSONResponse(body, status_code=code, headers=headers)
+    return body
+
+
+def _ride_response(state: Dict[str, Any]) -> Dict[str, Any]:
+    # Return a concise rider-friendly payload, including fare info
+    # (Intentionally DO NOT include driver_pin in this response.)
     return {
-        "job_id": job_id_str,
-        "pin": pin,
+        "job_id": state["job_id"],
+        "pin": state["pin"],
         "dispatch_info": state.get("dispatch_info"),
         "driver_name": state.get("driver_name"),
         "vehicle": state.get("vehicle"),
@@ -194,7 +445,24 @@ def create_ride(payload: BookingInput, background: BackgroundTasks):
         # Fare fields computed by nodes/explain_fare.py
         "fare_estimate": state.get("fare_estimate"),
         "fare_explanation": state.get("fare_explanation"),
+        "explanation_status": state.get("explanation_status"),
+        "estimated_miles": state.get("estimated_miles"),
+        "fare_quoted": bool(state.get("fare_quoted")),
+    }
+
+
+def _intake_response(state: Dict[str, Any]) -> Dict[str, Any]:
+    # Accepted, not yet dispatched: fare is only known for a quoted booking
+    job_id = state["job_id"]
+    return {
+        "job_id": job_id,
+        "pin": state["pin"],
+        "status": "queued",
+        "fare_estimate": state.get("fare_estimate"),
         "estimated_miles": state.get("estimated_miles"),
+        "fare_quoted": bool(state.get("fare_quoted")),
+        "status_url": f"/jobs/status?job_id={job_id}",
+        "stream_url": f"/jobs/status/stream?job_id={job_id}",
     }
 
 
@@ -2,7 +2,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
-from resources.geo_utils import estimate_miles
+from resources.geo_utils import estimate_miles_async
 
 router = APIRouter(tags=["distance"])
 
@@ -11,6 +11,6 @@ class DistanceReq(BaseModel):
     dropoff: str = Field(..., min_length=2)
 
 @router.post("/distance")
-def calculate_distance(body: DistanceReq):
-    miles = estimate_miles(body.pickup, body.dropoff)
+async def calculate_distance(body: DistanceReq):
+    miles = await estimate_miles_async(body.pickup, body.dropoff)
     return {"miles": miles}
@@ -1,9 +1,17 @@
 # routes/fare_api.py
 # -------------------------------------------------------------------
-# GET /fare/estimate?pickup=...&dropoff=...[&explain=true]
+# GET /fare/estimate?pickup=...&dropoff=...[&explain=true][&fast=true]
 # - Validates query params
 # - Reuses explain_fare_fn (single source of truth)
+# - fast=true answers from the precomputed zone matrix when it can
 # - Returns miles, fare (as string), and optional explanation
+# - Includes a signed quote_token that /book/ride accepts to book at this fare
+#
+# GET /fare/rules
+# - Fare rule set in effect (version, rates, reload counters)
+#
+# GET /fare/surge
+# - Live per-zone supply/demand counters and the zones currently surging
 # -------------------------------------------------------------------
 
 # routes/fare_api.py
@@ -12,7 +20,9 @@ from __future__ import annotations
 from typing import Optional, Dict, Any
 from fastapi import APIRouter, Query
 
-from resources.fare_helpers import get_fare_quote
+from resources.fare_engine import rules_stats
+from resources.fare_helpers import get_fare_quote, FAST_QUOTE_DEFAULT
+from resources.surge import get_board
 
 router = APIRouter(prefix="/fare", tags=["fare"])
 
@@ -21,9 +31,20 @@ def estimate_fare(
     pickup: str = Query(..., min_length=2, description="Pickup location"),
     dropoff: str = Query(..., min_length=2, description="Dropoff location"),
     explain: Optional[bool] = Query(True, description="Include natural-language explanation"),
+    fast: Optional[bool] = Query(None, description="Answer from the zone x zone matrix (approximate, O(1))"),
 ) -> Dict[str, Any]:
-    result = get_fare_quote(pickup, dropoff)
+    result = get_fare_quote(pickup, dropoff, fast=FAST_QUOTE_DEFAULT if fast is None else fast)
     if not explain:
         result.pop("fare_explanation", None)
     return result
 
+
+
+@router.get("/rules", summary="Fare rule set in effect")
+def fare_rules() -> Dict[str, Any]:
+    return rules_stats()
+
+
+@router.get("/surge", summary="Per-zone surge multipliers")
+def fare_surge() -> Dict[str, Any]:
+    return get_board().stats()
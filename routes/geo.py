@@ -0,0 +1,47 @@
+# routes/geo.py
+# -------------------------------------------------------------------
+# GET /geo/stats
+# - Geocode cache hit-rate counters (per worker process)
+# - Shows how many lookups were answered by the LRU, gazetteer,
+#   durable cache, and how many still went to OSM
+# - Route-pair distance memo stats
+# - Nominatim rate limiter queue/grant counters
+# - Distance model in effect + road graph size/query counters
+#
+# GET /geo/suggest?q=...
+# - Address autocomplete from already-geocoded / previously booked
+#   addresses (resources/address_index.py)
+# -------------------------------------------------------------------
+from __future__ import annotations
+
+from typing import Dict, Any
+from fastapi import APIRouter, Query
+
+from resources.geo_utils import geocode_stats, distance_model
+from resources.road_router import get_road_graph
+from resources.address_index import suggest
+from resources.route_cache import ROUTES
+from resources.rate_limiter import NOMINATIM_LIMITER
+
+router = APIRouter(prefix="/geo", tags=["geo"])
+
+
+@router.get("/stats", summary="Geocode cache hit-rate counters")
+def geo_stats() -> Dict[str, Any]:
+    graph = get_road_graph()
+    return {
+        "ok": True,
+        "stats": geocode_stats(),
+        "routes": ROUTES.stats(),
+        "rate_limiter": NOMINATIM_LIMITER.stats(),
+        "distance_model": distance_model(),
+        "road_graph": graph.stats() if graph is not None else None,
+    }
+
+
+@router.get("/suggest", summary="Address autocomplete from known addresses")
+def geo_suggest(
+    q: str = Query(..., min_length=1, max_length=200, description="Partial address"),
+    limit: int = Query(8, ge=1, le=20),
+) -> Dict[str, Any]:
+    return {"ok": True, "q": q, "suggestions": suggest(q, limit)}
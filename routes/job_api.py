@@ -1,12 +1,35 @@
 # routes/job_api.py
 from __future__ import annotations
+import asyncio
+import json
+import os
+import time
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, Any
 
 router = APIRouter(prefix="/jobs", tags=["Jobs"])
 
 from db.job_board import claim_job, complete_job
-from db.reader import get_job
+from db.reader import get_job, get_job_explanation
+
+# SSE for deferred fare explanations (LLM_EXPLAIN_MODE=deferred)
+STREAM_POLL_SEC = float(os.getenv("LLM_EXPLAIN_STREAM_POLL_SEC", "0.5"))
+STREAM_MAX_SEC = float(os.getenv("LLM_EXPLAIN_STREAM_MAX_SEC", "30"))
+
+# SSE for queued bookings (BOOKING_INTAKE=queue)
+STATUS_STREAM_POLL_SEC = float(os.getenv("BOOKING_STATUS_STREAM_POLL_SEC", "1"))
+STATUS_STREAM_MAX_SEC = float(os.getenv("BOOKING_STATUS_STREAM_MAX_SEC", "120"))
+
+# Intake queue row (db/booking_queue.py); absent table / no queue -> no block
+try:
+    from db.booking_queue import get_intake
+except Exception:
+    get_intake = None
+
+# booking_queue.status -> rider-facing status while the job has no driver
+_INTAKE_STATUS = {"queued": "queued", "running": "dispatching", "failed": "dispatch_failed"}
 
 # optional driver email notification on claim
 try:
@@ -55,19 +78,35 @@ def complete(job_id: int = Query(..., ge=1)):
 def job_status(job_id: int = Query(..., ge=1)):
     """
     Returns a rider/driver-friendly status block.
+    Queued bookings (BOOKING_INTAKE=queue) report queued -> dispatching ->
+    assigned / pending_dispatch (no driver free) / dispatch_failed.
     """
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    return _status_body(job, _intake(job_id))
+
+
+def _intake(job_id: int) -> Dict[str, Any] | None:
+    if get_intake is None:
+        return None
+    try:
+        return get_intake(job_id)
+    except Exception:
+        return None  # queue table not migrated / DB hiccup: plain job status
+
 
+def _status_body(job: Dict[str, Any], intake: Dict[str, Any] | None) -> Dict[str, Any]:
     if job.get("completed_at"):
         state = "completed"
     elif job.get("claimed"):
         state = "assigned"
+    elif intake and intake.get("status") in _INTAKE_STATUS:
+        state = _INTAKE_STATUS[intake["status"]]
     else:
         state = "pending_dispatch"
 
-    return {
+    body = {
         "job_id": job["id"],
         "status": state,
         "summary": {
@@ -79,10 +118,106 @@ def job_status(job_id: int = Query(..., ge=1)):
             "currency": "USD"
         },
         "driver": {
-            "name": job.get("driver_name") if state != "pending_dispatch" else None
+            "name": job.get("driver_name") if state in ("assigned", "completed") else None
         },
+        "explanation": _explanation_block(job),
         "timestamps": {
             "posted_at": job.get("posted_at"),
             "completed_at": job.get("completed_at")
         }
     }
+    if intake:
+        result = intake.get("result") or {}
+        body["dispatch"] = {
+            "queue_status": intake.get("status"),
+            "attempts": intake.get("attempts"),
+            "info": result.get("dispatch_info"),
+            "vehicle": result.get("vehicle"),
+            "plate": result.get("plate"),
+            "eta_minutes": result.get("eta_minutes"),
+            "error": intake.get("last_error") if intake.get("status") == "failed" else None,
+        }
+    return body
+
+
+def _load_status(job_id: int) -> Dict[str, Any] | None:
+    job = get_job(job_id)
+    return _status_body(job, _intake(job_id)) if job else None
+
+
+@router.get("/status/stream")
+async def status_stream(job_id: int = Query(..., ge=1)):
+    """
+    Server-sent events for a queued booking: a `status` event (the
+    GET /jobs/status body) now and on every change, until the booking
+    leaves queued / dispatching (or after BOOKING_STATUS_STREAM_MAX_SEC),
+    then the stream closes.
+    """
+    try:
+        body = await run_in_threadpool(_load_status, job_id)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to load job")
+    if not body:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        current, last = body, None
+        deadline = time.monotonic() + STATUS_STREAM_MAX_SEC
+        yield "retry: 2000\n\n"
+        while True:
+            data = json.dumps(current, default=str)
+            if data != last:
+                yield f"event: status\ndata: {data}\n\n"
+                last = data
+            if current["status"] not in ("queued", "dispatching") or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(STATUS_STREAM_POLL_SEC)
+            try:
+                current = await run_in_threadpool(_load_status, job_id) or current
+            except Exception:
+                pass  # DB hiccup: keep polling until the deadline
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _explanation_block(job: Dict[str, Any]) -> Dict[str, Any]:
+    # pending = LLM paraphrase still being generated; text is then the template
+    return {"status": job.get("explanation_status"), "text": job.get("fare_explanation")}
+
+
+@router.get("/explanation/stream")
+async def explanation_stream(job_id: int = Query(..., ge=1)):
+    """
+    Server-sent events: one `explanation` event with {job_id, status, text}
+    once the job's fare explanation is final (or after LLM_EXPLAIN_STREAM_MAX_SEC,
+    still "pending"), then the stream closes.
+    """
+    try:
+        job = await run_in_threadpool(get_job_explanation, job_id)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to load job")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        row = job
+        deadline = time.monotonic() + STREAM_MAX_SEC
+        yield "retry: 2000\n\n"
+        while row.get("explanation_status") == "pending" and time.monotonic() < deadline:
+            await asyncio.sleep(STREAM_POLL_SEC)
+            try:
+                row = await run_in_threadpool(get_job_explanation, job_id) or row
+            except Exception:
+                pass  # DB hiccup: keep polling until the deadline
+        data = json.dumps({"job_id": job_id, **_explanation_block(row)})
+        yield f"event: explanation\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
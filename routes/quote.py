@@ -1,18 +1,79 @@
 # routes/quote.py
 from __future__ import annotations
 
-from fastapi import APIRouter
+import json
+import os
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
 
-from resources.fare_helpers import get_fare_quote
+from resources import idempotency
+from resources.quote_token import TTL_SEC as QUOTE_TOKEN_TTL_SEC
+from resources.fare_helpers import get_fare_quote, iter_fare_quotes_batch, FAST_QUOTE_DEFAULT
 
 router = APIRouter(prefix="/quote", tags=["quote"])
 
+# Upper bound on pairs per /quote/batch request
+BATCH_MAX_PAIRS = int(os.getenv("QUOTE_BATCH_MAX_PAIRS", "1000"))
+
 class QuoteInput(BaseModel):
     pickup_location: str = Field(..., examples=["Times Square, NYC"])
     dropoff_location: str = Field(..., examples=["JFK Airport"])
 
 @router.post("", summary="Get a fare quote without booking")
-def get_quote(payload: QuoteInput) -> Dict[str, Any]:
-    return get_fare_quote(payload.pickup_location, payload.dropoff_location)
+async def get_quote(
+    payload: QuoteInput,
+    fast: Optional[bool] = Query(None, description="Answer from the zone x zone matrix (approximate, O(1))"),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+) -> Dict[str, Any]:
+    """
+    With an Idempotency-Key, a retry gets the first quote (same fare and
+    quote_token) back instead of a fresh one, for as long as that token is
+    valid; after that the key runs again and issues a new one.
+    """
+    fast = FAST_QUOTE_DEFAULT if fast is None else fast
+
+    async def _run() -> Tuple[Dict[str, Any], int]:
+        quote = await run_in_threadpool(
+            get_fare_quote, payload.pickup_location, payload.dropoff_location, fast=fast,
+        )
+        return jsonable_encoder(quote), 200
+
+    try:
+        body, code, replayed = await idempotency.run_once(
+            "quote", idempotency_key, idempotency.fingerprint({**payload.model_dump(), "fast": fast}), _run,
+            ttl_sec=QUOTE_TOKEN_TTL_SEC,
+        )
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if replayed:
+        return JSONResponse(body, status_code=code, headers={idempotency.REPLAY_HEADER: "true"})
+    return body
+
+
+class QuoteBatchInput(BaseModel):
+    pairs: List[QuoteInput] = Field(..., min_length=1, max_length=BATCH_MAX_PAIRS)
+    explain: bool = Field(True, description="Include the rider-friendly explanation per pair")
+
+
+@router.post("/batch", summary="Fare quotes for many pickup/dropoff pairs (NDJSON stream)")
+def get_quote_batch(payload: QuoteBatchInput) -> StreamingResponse:
+    """
+    One request instead of N: unique addresses are geocoded once and results
+    stream back as newline-delimited JSON, one object per pair as soon as
+    both its addresses resolve (completion order; `index` is the input
+    position). `fallback: true` marks pairs priced at the default distance
+    because an address couldn't be placed within QUOTE_BATCH_DEADLINE_SEC.
+    """
+    pairs = [(p.pickup_location, p.dropoff_location) for p in payload.pairs]
+
+    def _lines():
+        for item in iter_fare_quotes_batch(pairs, explain=payload.explain):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
@@ -33,18 +33,28 @@ class BookingState(TypedDict, total=False):
     ride_time: NotRequired[str]                    # ISO string or natural text pre-normalization
     rider_name: NotRequired[str]
     phone_number: NotRequired[str]                 # store as string to avoid locale/format loss
+    quote_token: NotRequired[str]                  # signed /quote result (resources/quote_token.py)
 
     # ---- Derived / normalized input ----
     ride_time_iso: NotRequired[str]                # normalized ISO8601 timestamp string
 
+    # ---- Geocoded endpoints (from a redeemed quote token) ----
+    pickup_lat: NotRequired[float]
+    pickup_lng: NotRequired[float]
+    dropoff_lat: NotRequired[float]
+    dropoff_lng: NotRequired[float]
+
     # ---- Booking output ----
     booking_request: NotRequired[str]              # LLM-composed summary or user-facing draft
 
     # ---- Fare logic ----
     estimated_miles: NotRequired[float]           # prefer float for quick math; DB can store Decimal
+    miles_fallback: NotRequired[bool]             # estimated_miles is FALLBACK_MILES (endpoint not placed)
     fare_estimate: NotRequired[str]               # e.g., "$23.50" or "23.50 USD"
     fare_notes: NotRequired[str]
     fare_explanation: NotRequired[str]
+    fare_quoted: NotRequired[bool]                # miles/fare come from a valid quote token
+    explanation_status: NotRequired[str]          # template | llm | pending (deferred LLM paraphrase)
 
     # ---- Dispatch logic ----
     dispatch_info: NotRequired[str]
@@ -53,6 +63,8 @@ class BookingState(TypedDict, total=False):
     plate: NotRequired[str]
     eta_minutes: NotRequired[int]                 # non-negative
     pin: NotRequired[str]                         # store as STRING to preserve leading zeros
+    driver_pin: NotRequired[str]                  # driver PIN (never returned to the rider)
+    driver_pin_expires: NotRequired[str]          # ISO timestamp
 
     # ---- Feedback ----
     feedback_rating: NotRequired[int]             # 1..5
@@ -82,6 +94,7 @@ class BookingInput(BaseModel):
     ride_time: constr(min_length=1, strip_whitespace=True)               # accept natural text; normalize later
     rider_name: constr(min_length=1, strip_whitespace=True)
     phone_number: PhoneStr
+    quote_token: Optional[constr(max_length=1024, strip_whitespace=True)] = None  # from /quote; reuses its fare
 
 class FareInfo(BaseModel):
     """Derived fare info from fare engine or distance service."""
@@ -168,6 +181,7 @@ def booking_input_to_state(b: BookingInput) -> BookingState:
         "ride_time": b.ride_time,              # keep raw; normalize later in a node
         "rider_name": b.rider_name,
         "phone_number": b.phone_number,
+        **({"quote_token": b.quote_token} if b.quote_token else {}),
         "created_at": now_iso(),
         "updated_at": now_iso(),
     }